@@ -0,0 +1,341 @@
+"""
+Benchmarks for the structures in suffixarray/ and tries/ on synthetic
+texts. Every text is generated from a seed, so a run can be repeated
+exactly on another revision and the results compared line by line.
+Results are written as one JSON object per structure, generator and size
+
+    python benchmark.py --sizes 1000 100000 --generators dna > results.jsonl
+
+Structures are capped by the memory their construction needs, see
+SIZE_CAPS, and sizes above their cap are reported as skipped. Every run
+happens in its own process, so one which crashes, is killed for using
+too much memory or takes longer than --timeout is reported as an error
+and the others carry on
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.append(os.path.join(ROOT, "suffixarray"))
+sys.path.append(os.path.join(ROOT, "tries"))
+
+from FMIndex import FMIndex
+from SuffixArray import SuffixArray
+from SuffixArrayEfficient import SuffixArrayEfficient
+from SuffixArraySearch import SuffixArraySearch
+from SuffixTreeEfficient import SuffixTreeEfficient
+from SuffixTrie import SuffixTrie
+from Trie import Trie
+
+DEFAULT_SIZES = [10**3, 10**4, 10**5, 10**6, 10**7, 10**8]
+
+WORDS = ("the of and to in is was he for it with as his on be at by had "
+         "not are but from or have an they which one you were her all she "
+         "there would their we him been has when who will more no if out "
+         "so said what up its about into than them can only other new some "
+         "could time these two may then do first any my now such like our "
+         "over man me even most made after also did many before must "
+         "through back years where much your way well down should because "
+         "each just those people how too little state good very make world "
+         "still own see men work long get here between both life being "
+         "under never day same another know while last might us great old "
+         "year off come since against go came right used take three").split()
+
+def uniform_text(size, rng):
+    """ Characters drawn uniformly from A-Z """
+    return "".join(rng.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZ", k=size))
+
+def dna_text(size, rng):
+    """
+    ACGT in blocks of 1000, about a tenth of which are copies, some
+    mutated, of part of an earlier block, like the repeats of a genome
+    """
+    parts, length = [], 0
+    while length < size:
+        if parts and rng.random() < 0.1:
+            source = rng.choice(parts)
+            start = rng.randrange(len(source))
+            copy = list(source[start:start+rng.randint(50, 500)])
+            for _ in range(len(copy) // 50):
+                copy[rng.randrange(len(copy))] = rng.choice("ACGT")
+            part = "".join(copy)
+        else:
+            part = "".join(rng.choices("ACGT", k=1000))
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+def repetitive_text(size, rng):
+    """ A single repeated character, the worst case for most builds """
+    return "A" * size
+
+def natural_text(size, rng):
+    """ Words from a fixed vocabulary with Zipf like frequencies """
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    parts, length = [], 0
+    while length < size:
+        words = rng.choices(WORDS, weights, k=1000)
+        part = " ".join(words) + " "
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+GENERATORS = {
+    "uniform": uniform_text,
+    "dna": dna_text,
+    "repetitive": repetitive_text,
+    "natural": natural_text,
+}
+
+def alphabet(text):
+    return "".join(sorted(set(text)))
+
+def build_fm_index(text, patterns):
+    return FMIndex(text, alpha=alphabet(text))
+
+def build_suffix_array(text, patterns):
+    return SuffixArray(text)
+
+def build_suffix_array_efficient(text, patterns):
+    return SuffixArrayEfficient(text, alpha=alphabet(text)).build_suffix_array()
+
+def build_suffix_array_sais(text, patterns):
+    return SuffixArrayEfficient(text, alpha=alphabet(text)).build_suffix_array_sais()
+
+def build_suffix_array_search(text, patterns):
+    st = SuffixTreeEfficient(text, alpha=alphabet(text))
+    return SuffixArraySearch(st.text, st.suffix_array, st.lcp_array, st.alpha)
+
+def build_suffix_tree(text, patterns, compact=False):
+    st = SuffixTreeEfficient(text, alpha=alphabet(text), compact=compact)
+    st.create_suffix_tree()
+    return st
+
+def build_compact_suffix_tree(text, patterns):
+    return build_suffix_tree(text, patterns, compact=True)
+
+def build_suffix_trie(text, patterns):
+    return SuffixTrie(text, compressed=True)
+
+def build_trie(text, patterns):
+    return Trie(patterns)
+
+def build_weighted_trie(text, patterns):
+    # Entries are the 10 character blocks of the text, later ones heavier
+    entries = [text[i:i+10] for i in range(0, len(text), 10)]
+    return Trie(entries, weights=list(range(len(entries))))
+
+def find_pattern(structure, pattern, text):
+    return structure.find_pattern(pattern)
+
+def locate_pattern(structure, pattern, text):
+    return structure.locate(pattern)
+
+def match_pattern(structure, pattern, text):
+    return structure.match([pattern])
+
+def match_window(structure, pattern, text):
+    return structure.match_all(text)
+
+def complete_prefix(structure, pattern, text):
+    return structure.complete(pattern[:3])
+
+# name: (build(text, patterns), query(structure, pattern, window) or None)
+STRUCTURES = {
+    "FMIndex": (build_fm_index, locate_pattern),
+    "SuffixArray": (build_suffix_array, None),
+    "SuffixArrayEfficient": (build_suffix_array_efficient, None),
+    "SuffixArrayEfficient.sais": (build_suffix_array_sais, None),
+    "SuffixArraySearch": (build_suffix_array_search, find_pattern),
+    "SuffixTreeEfficient": (build_suffix_tree, find_pattern),
+    "SuffixTreeEfficient.compact": (build_compact_suffix_tree, find_pattern),
+    "SuffixTrie.compressed": (build_suffix_trie, match_pattern),
+    "Trie": (build_trie, match_window),
+    "Trie.complete": (build_weighted_trie, complete_prefix),
+}
+
+# Largest text size run for each structure, so that no single build
+# needs more than about 1 GB. The comments give the peak resident memory
+# of a build at the cap, measured on the dna and repetitive texts, or
+# extrapolated from 10**5 for the structures which grow linearly.
+# SuffixArray keeps every suffix, so it grows quadratically: 48 MB at
+# 10**4 but 4.8 GB at 10**5
+SIZE_CAPS = {
+    "FMIndex": 10**7,                       # 1 GB
+    "SuffixArray": 10**4,                   # 48 MB
+    "SuffixArrayEfficient": 10**6,          # 150 MB
+    "SuffixArrayEfficient.sais": 10**7,     # 1 GB
+    "SuffixArraySearch": 10**7,             # 1.2 GB
+    "SuffixTreeEfficient": 10**6,           # 860 MB
+    "SuffixTreeEfficient.compact": 10**6,   # 250 MB
+    "SuffixTrie.compressed": 10**6,         # 840 MB
+    "Trie": 10**8,                          # patterns only
+    "Trie.complete": 10**6,                 # 210 MB
+}
+
+def sample_queries(text, count, length, rng):
+    """
+    Returns count (pattern, window) pairs. Patterns are substrings of the
+    text, windows are the stretch of text a Trie query matches against
+    """
+    queries = []
+    for _ in range(count):
+        start = rng.randrange(max(1, len(text) - length))
+        window = rng.randrange(max(1, len(text) - 1000))
+        queries.append((text[start:start+length], text[window:window+1000]))
+    return queries
+
+def percentile(values, fraction):
+    """ Nearest rank percentile of already sorted values """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(name, generator, size, args):
+    """
+    Benchmarks one structure on one text in a new process, returning the
+    result record
+    """
+    record = {
+        "structure": name,
+        "generator": generator,
+        "size": size,
+        "seed": args.seed,
+        "revision": args.revision,
+        "python": platform.python_version(),
+    }
+    if size > SIZE_CAPS[name] and not args.no_caps:
+        record["skipped"] = "size above cap of " + str(SIZE_CAPS[name])
+        return record
+
+    command = [sys.executable, os.path.abspath(__file__),
+               "--case", name, generator, str(size),
+               "--queries", str(args.queries),
+               "--pattern-length", str(args.pattern_length),
+               "--seed", str(args.seed)]
+    if args.no_memory:
+        command.append("--no-memory")
+    try:
+        result = subprocess.run(command, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        record["error"] = "Timeout after " + str(args.timeout) + " seconds"
+        return record
+    if result.returncode < 0:
+        record["error"] = "Killed by signal " + str(-result.returncode)
+    elif result.returncode != 0:
+        # The last line of the traceback, like RecursionError: ...
+        lines = result.stderr.decode(errors="replace").strip().splitlines()
+        record["error"] = lines[-1] if lines else \
+            "Exit status " + str(result.returncode)
+    else:
+        record.update(json.loads(result.stdout))
+    return record
+
+def run_case(name, generator, size, args):
+    """
+    Builds and queries one structure in this process, and prints its
+    measurements as JSON. The text and queries are generated again from
+    the seed, so they are the same in every process
+    """
+    rng = random.Random(args.seed)
+    text = GENERATORS[generator](size, rng)
+    queries = sample_queries(text, args.queries, args.pattern_length, rng)
+    record = {}
+    measure(record, STRUCTURES[name], text, queries, args)
+    print(json.dumps(record))
+
+def measure(record, structure_type, text, queries, args):
+    """ Adds the build, query and memory measurements to record """
+    build, query = structure_type
+    patterns = sorted(set(pattern for pattern, _ in queries))
+
+    start = time.perf_counter()
+    structure = build(text, patterns)
+    record["build_seconds"] = time.perf_counter() - start
+
+    if query is not None:
+        latencies = []
+        for pattern, window in queries:
+            start = time.perf_counter()
+            query(structure, pattern, window)
+            latencies.append(time.perf_counter() - start)
+        total = sum(latencies)
+        latencies.sort()
+        record["queries"] = len(latencies)
+        record["query_seconds"] = total
+        record["queries_per_second"] = len(latencies) / total if total else None
+        for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            value = percentile(latencies, fraction)
+            record["latency_" + label + "_us"] = value * 1e6
+
+    # Tracing allocations slows the build down, so memory is measured on
+    # a second build rather than the timed one
+    del structure
+    if not args.no_memory:
+        tracemalloc.start()
+        try:
+            structure = build(text, patterns)
+            record["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--structures", nargs="+", choices=sorted(STRUCTURES),
+                        default=sorted(STRUCTURES))
+    parser.add_argument("--generators", nargs="+", choices=sorted(GENERATORS),
+                        default=sorted(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=1000,
+                        help="number of queries per structure")
+    parser.add_argument("--pattern-length", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to append results to, "
+                        "standard output by default")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the second build measuring peak memory")
+    parser.add_argument("--no-caps", action="store_true",
+                        help="run every size, ignoring SIZE_CAPS")
+    parser.add_argument("--timeout", type=float, default=3600,
+                        help="seconds after which a run is stopped")
+    # Used by run to benchmark a single structure in a child process
+    parser.add_argument("--case", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        name, generator, size = args.case
+        run_case(name, generator, int(size), args)
+        return
+
+    args.revision = revision()
+
+    out = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for size in args.sizes:
+            for generator in args.generators:
+                for name in args.structures:
+                    record = run(name, generator, size, args)
+                    out.write(json.dumps(record, sort_keys=True) + "\n")
+                    out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == "__main__":
+    main()
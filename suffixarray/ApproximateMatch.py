@@ -0,0 +1,90 @@
+"""
+Banded edit distance for approximate searches walking a tree. A pattern
+is aligned against a string growing one character at a time, such as the
+path from the root of a suffix tree or trie, and only the 2k+1 cells of
+the dynamic programming row that can still be within k edits are kept.
+A branch can be pruned as soon as every cell of its band is above k
+"""
+
+def first_band(pattern, k):
+    """
+    Returns the band for the empty string: band[j] is the edit distance
+    between pattern[:i] and the string, for i = depth - k + j. Cells
+    outside of the pattern, and distances above k, are k + 1
+    """
+    return [i if 0 <= i <= len(pattern) else k + 1 for i in range(-k, k + 1)]
+
+def next_band(band, depth, symbol, pattern, k):
+    """
+    Returns the band for the string of length depth + 1 made of the
+    string of band followed by symbol
+    """
+    width = 2 * k + 1
+    new = [k + 1] * width
+    start = depth + 1 - k
+    # new[j] is left at k + 1 for pattern positions outside the pattern
+    left = k + 1
+    for j in range(max(0, -start), min(width, len(pattern) - start + 1)):
+        i = start + j
+        if i == 0:
+            best = depth + 1
+        else:
+            # Substitution or match, then a symbol or a pattern character
+            # left unaligned
+            best = band[j] + (pattern[i-1] != symbol)
+            if j + 1 < width and band[j+1] < best:
+                best = band[j+1] + 1
+            if left < best:
+                best = left + 1
+        if best > k:
+            best = k + 1
+        new[j] = left = best
+    return new
+
+def band_at(band, depth, i, k):
+    """ Returns the distance of pattern[:i] in band, k + 1 if outside it """
+    j = i - depth + k
+    if 0 <= j < len(band):
+        return band[j]
+    return k + 1
+
+def first_state(pattern, k, edits):
+    """
+    Returns the state of an approximate search of pattern for the empty
+    string: a band with edits, otherwise the number of mismatches
+    """
+    return first_band(pattern, k) if edits else 0
+
+def advance(state, depth, symbol, pattern, k, edits):
+    """
+    Returns (state, distance, pruned) for the string of length depth of
+    state followed by symbol. distance is that of the whole pattern, k + 1
+    if it is over k or the pattern is longer than the string with
+    mismatches. pruned tells that no longer string can be within k
+    """
+    if edits:
+        state = next_band(state, depth, symbol, pattern, k)
+        return (state, band_at(state, depth + 1, len(pattern), k),
+                min(state) > k)
+    state += symbol != pattern[depth]
+    distance = state if depth + 1 == len(pattern) else k + 1
+    return state, distance, state > k
+
+def approximate_distance(pattern, text, k, edits=False):
+    """
+    Returns the fewest mismatches, or edits, between pattern and a prefix
+    of text (of the same length for mismatches), None if more than k
+    """
+    if not edits:
+        if len(text) < len(pattern):
+            return None
+        mismatches = sum(1 for a, b in zip(pattern, text) if a != b)
+        return mismatches if mismatches <= k else None
+    band = first_band(pattern, k)
+    best = band_at(band, 0, len(pattern), k)
+    for depth in range(min(len(text), len(pattern) + k)):
+        band = next_band(band, depth, text[depth], pattern, k)
+        best = min(best, band_at(band, depth + 1, len(pattern), k))
+        if min(band) > k:
+            break
+    return best if best <= k else None
@@ -0,0 +1,99 @@
+"""
+Answers batches of find_pattern queries with a pool of worker processes.
+The index is written once into shared memory in the SuffixArrayIndex
+format, followed by its LCP-LR arrays, and every worker searches it in
+place with a SuffixArraySearch, so neither the tree nor the index is
+pickled for each task and nothing is computed again per worker
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+from SuffixArrayIndex import SuffixArrayIndex
+from SuffixArraySearch import SuffixArraySearch
+
+# Set in each worker process by _attach_index
+_shared = None
+_search = None
+
+def _lcp_lr_views(buffer, offset, index):
+    """ The left and right LCP-LR arrays stored after index from offset """
+    size = len(index) * index.int_width
+    typecode = SuffixArrayIndex.TYPECODES[index.int_width]
+    return (buffer[offset:offset+size].cast(typecode),
+            buffer[offset+size:offset+2*size].cast(typecode))
+
+def _attach_index(name, offset):
+    global _shared, _search
+    # Workers share the resource tracker of the process which created the
+    # block, so only its unlink in close frees the block
+    _shared = shared_memory.SharedMemory(name=name)
+    index = SuffixArrayIndex(_shared.buf)
+    left_lcp, right_lcp = _lcp_lr_views(_shared.buf, offset, index)
+    # The alphabet saved with the index orders the characters as the
+    # suffix array does
+    _search = SuffixArraySearch(index.text, index.suffix_array,
+                                index.lcp_array, index.alpha,
+                                left_lcp, right_lcp)
+
+def _find_pattern(pattern):
+    return _search.find_pattern(pattern)
+
+class BatchQueryExecutor(object):
+    """
+    Built from anything holding text, suffix_array and lcp_array, like a
+    SuffixTreeEfficient. workers defaults to the number of CPUs, and
+    chunk_size is the number of patterns sent to a worker at a time.
+    Call close, or use it as a context manager, to stop the workers and
+    free the shared memory
+    """
+    def __init__(self, tree, workers=None, chunk_size=1024):
+        self.chunk_size = chunk_size
+        self._pool = None
+        terminal = getattr(tree, "terminal", "$")
+        alpha = getattr(tree, "alpha", "")
+        n = len(tree.suffix_array)
+        offset = SuffixArrayIndex.size(n, len(tree.lcp_array), terminal, alpha)
+        width = SuffixArrayIndex.integer_width(n)
+        self._shared = shared_memory.SharedMemory(create=True,
+                                                  size=offset + 2 * n * width)
+        try:
+            SuffixArrayIndex.write(self._shared.buf, tree.text,
+                                   tree.suffix_array, tree.lcp_array,
+                                   terminal, alpha)
+            # Computed once here, the workers only attach views of them
+            with SuffixArrayIndex(self._shared.buf) as index:
+                left_lcp, right_lcp = _lcp_lr_views(self._shared.buf, offset,
+                                                    index)
+                with left_lcp, right_lcp:
+                    SuffixArraySearch.compute_lcp_lr(index.lcp_array,
+                                                     left_lcp, right_lcp)
+            self._pool = multiprocessing.Pool(workers,
+                                              initializer=_attach_index,
+                                              initargs=(self._shared.name,
+                                                        offset))
+        except Exception:
+            self._shared.close()
+            self._shared.unlink()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def find_patterns(self, patterns):
+        """
+        Returns the locations of every pattern, as find_pattern would,
+        in the same order as patterns
+        """
+        return self._pool.map(_find_pattern, patterns, self.chunk_size)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._shared.close()
+            self._shared.unlink()
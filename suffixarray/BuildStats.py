@@ -0,0 +1,65 @@
+"""
+Opt-in statistics about how an index was built. Pass a BuildStats as
+stats to SuffixArrayEfficient or SuffixTreeEfficient to record the wall
+time of every construction phase along with counters such as the number
+of doubling rounds or tree nodes. Without one, the builds only check
+once per phase that stats is None
+"""
+
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+class BuildStats(object):
+    """
+    phases maps a phase name to its total wall time in seconds, counters
+    maps a counter name to its value. Sizes in bytes are approximate,
+    from sys.getsizeof. If given, callback(stats, kind, name, value) is
+    called whenever a phase ends (kind "phase", value its duration) and
+    whenever a counter is recorded (kind "counter")
+    """
+    def __init__(self, callback=None):
+        self.phases = {}
+        self.counters = {}
+        self.callback = callback
+
+    def __str__(self):
+        lines = []
+        for name, seconds in self.phases.items():
+            lines.append(name + ": " + "%.6f" % seconds + "s")
+        for name, value in self.counters.items():
+            lines.append(name + ": " + str(value))
+        return "\n".join(lines)
+
+    @contextmanager
+    def phase(self, name):
+        """ Times the body of a with statement as phase name """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            self.phases[name] = self.phases.get(name, 0) + seconds
+            if self.callback is not None:
+                self.callback(self, "phase", name, seconds)
+
+    def record(self, name, value):
+        self.counters[name] = value
+        if self.callback is not None:
+            self.callback(self, "counter", name, value)
+
+    def as_dict(self):
+        return {"phases": dict(self.phases), "counters": dict(self.counters)}
+
+def phase(stats, name):
+    """ stats.phase(name), or a context doing nothing if stats is None """
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
+
+def list_size(values):
+    """ Approximate size in bytes of a list of ints or an array """
+    size = sys.getsizeof(values)
+    if isinstance(values, list):
+        size += sum(map(sys.getsizeof, values))
+    return size
@@ -0,0 +1,124 @@
+"""
+FM-index of a string: the Burrows-Wheeler transform of the text with a
+sampled rank structure and a sampled suffix array. Patterns are counted
+with backward search in O( |P| ) rank queries and located by walking
+back to the nearest sampled suffix, without keeping the suffix array
+"""
+
+from array import array
+
+from SuffixArrayEfficient import SuffixArrayEfficient
+
+class FMIndex(object):
+    """
+    - bwt[i] is the character before the i-th smallest suffix
+    - C[c] is the number of characters in the text smaller than c
+    - occ[c][k] is the number of c in bwt[:k*occ_rate], between two
+      checkpoints the count is finished with str.count
+    - the suffix array is kept for every text position which is a
+      multiple of sa_rate, sampled[i] is set for the rows holding one
+      and samples holds them in row order
+    Larger rates use less memory but make rank and locate slower
+    """
+    def __init__(self, text, terminal="$", sa_rate=32, occ_rate=64,
+                 alpha=None, suffix_array=None):
+        """
+        suffix_array can be given if it was already built, otherwise it
+        is built with SuffixArrayEfficient, see there for alpha
+        """
+        if sa_rate < 1 or occ_rate < 1:
+            raise ValueError("Sampling rates must be positive")
+        self.terminal = terminal
+        self.sa_rate = sa_rate
+        self.occ_rate = occ_rate
+        if suffix_array is None:
+            builder = SuffixArrayEfficient(text, terminal, alpha=alpha)
+            suffix_array = builder.build_suffix_array_sais()
+            alpha = builder.alpha
+        elif alpha is None:
+            alpha = terminal + "".join(sorted(set(text) - {terminal}))
+        else:
+            alpha = terminal + alpha.replace(terminal, "")
+        text = text + terminal
+        self.length = len(text)
+
+        self.bwt = "".join([text[suffix - 1] for suffix in suffix_array])
+        # C follows the order of the suffix array, the terminal first,
+        # which need not be the order of the characters in Python
+        self.C = {}
+        total = 0
+        for c in alpha:
+            count = self.bwt.count(c)
+            if count:
+                self.C[c] = total
+                total += count
+
+        self.occ = {}
+        for c in self.C:
+            checkpoints = array("l", [0])
+            for start in range(0, self.length, occ_rate):
+                checkpoints.append(checkpoints[-1] +
+                                   self.bwt.count(c, start, start + occ_rate))
+            self.occ[c] = checkpoints
+
+        self.sampled = bytearray(self.length)
+        self.samples = array("l")
+        for row, suffix in enumerate(suffix_array):
+            if suffix % sa_rate == 0:
+                self.sampled[row] = 1
+                self.samples.append(suffix)
+        self.sampled_before = array("l", [0])
+        for start in range(0, self.length, occ_rate):
+            self.sampled_before.append(self.sampled_before[-1] +
+                self.sampled.count(1, start, start + occ_rate))
+
+    def __len__(self):
+        return self.length
+
+    def _rank(self, c, i):
+        """ Returns the number of c in bwt[:i] """
+        k = i // self.occ_rate
+        return self.occ[c][k] + self.bwt.count(c, k * self.occ_rate, i)
+
+    def _range(self, pattern):
+        """
+        Backward search: returns the range [top, bottom) of suffix array
+        rows starting with pattern, which is empty if it does not occur
+        """
+        if len(pattern) == 0:
+            return 0, 0
+        top, bottom = 0, self.length
+        for c in reversed(pattern):
+            if c not in self.C:
+                return 0, 0
+            top = self.C[c] + self._rank(c, top)
+            bottom = self.C[c] + self._rank(c, bottom)
+            if top >= bottom:
+                return 0, 0
+        return top, bottom
+
+    def count(self, pattern):
+        """ Returns the number of occurrences of pattern in the text """
+        top, bottom = self._range(pattern)
+        return bottom - top
+
+    def locate(self, pattern):
+        """
+        Returns where pattern occurs in the text, in suffix array order.
+        Each occurrence takes fewer than sa_rate steps back through the
+        text to reach a sampled suffix
+        """
+        top, bottom = self._range(pattern)
+        return [self._suffix(row) for row in range(top, bottom)]
+
+    def _suffix(self, row):
+        """ Returns the text position of the suffix at row """
+        steps = 0
+        while not self.sampled[row]:
+            c = self.bwt[row]
+            row = self.C[c] + self._rank(c, row)
+            steps += 1
+        k = row // self.occ_rate
+        index = self.sampled_before[k] + \
+            self.sampled.count(1, k * self.occ_rate, row)
+        return self.samples[index] + steps
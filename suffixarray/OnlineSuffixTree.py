@@ -0,0 +1,232 @@
+"""
+Online construction of a SuffixTree with Ukkonen's algorithm. Text can
+be appended to the tree at any time with extend, which costs amortized
+constant time per character instead of rebuilding the whole tree
+"""
+
+from ApproximateMatch import approximate_distance
+from SuffixTreeEfficient import SuffixTreeEfficient
+from SuffixTreeNode import SuffixTreeNode
+
+class OnlineSuffixTree(SuffixTreeEfficient):
+    """
+    No terminal is appended to the text, so the tree is implicit: the
+    last self.remainder suffixes of the text are prefixes of other
+    suffixes and have no leaf of their own yet. Leaves have an open edge,
+    edge_end is None and their label runs to the end of the text.
+    The text is kept as a list of characters, which extend appends to,
+    and joined into self.text the first time it is read after each
+    extend. There is no suffix array, so save_index and
+    find_patterns_parallel raise a TypeError
+    """
+    def __init__(self, text="", cache=None):
+        """
+        cache is an optional QueryCache, see SuffixTreeEfficient, cleared
+        whenever the text is extended
+        """
+        self.compact = False
+        self.stats = None
+        self.cache = None
+        self.terminal = None
+        self._chars = []
+        self._text = ""
+        self.suffix_array = None
+        self.lcp_array = None
+        self.root = SuffixTreeNode(None, 0, -1, -1)
+        self.active_node = self.root
+        self.active_edge = 0
+        self.active_length = 0
+        self.remainder = 0
+        self.extend(text)
+        self.cache = cache
+
+    def __str__(self):
+        return "Text:" + self.text
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self._chars)
+        return self._text
+
+    def create_suffix_tree(self):
+        """ The tree is built as text is added, there is nothing to do """
+        pass
+
+    def save_index(self, path):
+        raise TypeError("save_index is not supported by an OnlineSuffixTree, "
+                        "build a SuffixTreeEfficient of its text to save")
+
+    def find_patterns_parallel(self, patterns, workers=None, chunk_size=1024):
+        raise TypeError("find_patterns_parallel is not supported by an "
+                        "OnlineSuffixTree, use find_patterns")
+
+    def lcp(self, i, j):
+        """
+        There is no suffix array to query while the text grows, so the
+        suffixes are compared directly
+        """
+        return self._lcp_of_suffixes(self.text, i, j, 0)
+
+    def _edge_end(self, node):
+        if node.edge_end is None:
+            return len(self.text) - 1
+        return node.edge_end
+
+    def extend(self, chunk):
+        """ Appends chunk to the text and adds its suffixes to the tree """
+        if self.cache is not None:
+            self.cache.clear()
+        start = len(self._chars)
+        self._chars.extend(chunk)
+        if len(chunk) != 0:
+            self._text = None
+        for i in range(start, len(self._chars)):
+            self._add_character(i)
+
+    def _add_character(self, i):
+        """
+        Ukkonen phase i: makes every suffix of text[:i+1] present in the
+        tree. The active point (active_node, active_edge, active_length)
+        is where the longest suffix still implicit ends, and remainder is
+        the number of suffixes still to be inserted
+        """
+        text, c = self._chars, self._chars[i]
+        self.remainder += 1
+        last_new_node = None
+        while self.remainder > 0:
+            if self.active_length == 0:
+                self.active_edge = i
+            edge_char = text[self.active_edge]
+            child = self.active_node.children.get(edge_char)
+
+            if child is None:
+                # No edge starts with c, add a leaf to the active node
+                self._new_open_leaf(self.active_node, i)
+                if last_new_node is not None:
+                    last_new_node.suffix_link = self.active_node
+                    last_new_node = None
+            else:
+                end = i if child.edge_end is None else child.edge_end
+                edge_length = end - child.edge_start + 1
+                if self.active_length >= edge_length:
+                    # Walk down to the child and retry from there
+                    self.active_edge += edge_length
+                    self.active_length -= edge_length
+                    self.active_node = child
+                    continue
+
+                if text[child.edge_start + self.active_length] == c:
+                    # c already follows the active point, every shorter
+                    # suffix is implicitly in the tree too
+                    if last_new_node is not None and self.active_node != self.root:
+                        last_new_node.suffix_link = self.active_node
+                    self.active_length += 1
+                    break
+
+                # Split the edge at the active point and hang a leaf there
+                split = SuffixTreeNode(self.active_node,
+                        self.active_node.string_depth + self.active_length,
+                        child.edge_start,
+                        child.edge_start + self.active_length - 1
+                        )
+                self.active_node.children[edge_char] = split
+                child.edge_start += self.active_length
+                child.parent = split
+                split.children[text[child.edge_start]] = child
+                self._new_open_leaf(split, i)
+                if last_new_node is not None:
+                    last_new_node.suffix_link = split
+                last_new_node = split
+
+            self.remainder -= 1
+            if self.active_node == self.root and self.active_length > 0:
+                self.active_length -= 1
+                self.active_edge = i - self.remainder + 1
+            elif self.active_node != self.root:
+                self.active_node = self.active_node.suffix_link or self.root
+
+    def _new_open_leaf(self, node, i):
+        leaf = SuffixTreeNode(node, None, i, None)
+        leaf.occurs = i - self.remainder + 1
+        node.children[self._chars[i]] = leaf
+        return leaf
+
+    def _implicit_copy(self):
+        """
+        Returns (start, shift): the suffixes without a leaf are those of
+        the string spelled by the active point, text[-remainder:], which
+        also occurs at start, the suffix of a leaf. An occurrence at
+        start + j that ends within that copy is then also one at
+        start + j + shift, shift being the distance between the copies
+        """
+        node = self.active_node
+        if self.active_length != 0:
+            child = node.children[self._chars[self.active_edge]]
+        else:
+            child = next(iter(node.children.values()))
+        # Every edge starts where its label follows the path to its
+        # parent in the suffix of some leaf
+        start = child.edge_start - node.string_depth
+        return start, len(self._chars) - self.remainder - start
+
+    def _implicit_occurrences(self, occurrences, length):
+        """
+        Yields where the substrings of the given length at occurrences,
+        leaves found in the tree, occur again in the suffixes without a
+        leaf. Those occurring inside the copy of the active point at
+        start are moved by shift, again as long as they stay inside it,
+        so this takes time in the number of occurrences found instead of
+        in the number of suffixes without a leaf
+        """
+        if self.remainder == 0:
+            return
+        start, shift = self._implicit_copy()
+        last = start + self.remainder - length
+        for found in sorted(occurrences):
+            while start <= found <= last:
+                found += shift
+                yield found
+
+    def iter_pattern(self, pattern):
+        """
+        Yields the indices where pattern occurs, those in the tree and
+        then those in the suffixes which have no leaf yet
+        """
+        found = []
+        for index in SuffixTreeEfficient.iter_pattern(self, pattern):
+            found.append(index)
+            yield index
+        yield from self._implicit_occurrences(found, len(pattern))
+
+    def _find_pattern_approximate(self, pattern, k, edits):
+        """
+        Suffixes without a leaf starting more than len(pattern) + k
+        characters before the end of the text are within k of pattern
+        as the copy of them found in the tree is, see
+        _implicit_occurrences. The few starting later are compared
+        directly against pattern
+        """
+        best = dict(SuffixTreeEfficient._find_pattern_approximate(
+            self, pattern, k, edits))
+        if len(pattern) == 0:
+            return []
+        end = len(pattern) + (k if edits else 0)
+        for index, distance in list(best.items()):
+            for copy in self._implicit_occurrences([index], end):
+                best[copy] = distance
+        text = self.text
+        first = max(len(text) - self.remainder, len(text) - end + 1)
+        for suffix in range(first, len(text)):
+            distance = approximate_distance(pattern, text[suffix:suffix+end],
+                                            k, edits)
+            if distance is not None and distance < best.get(suffix, k + 1):
+                best[suffix] = distance
+        return sorted(best.items())
+
+    def count_pattern(self, pattern):
+        """
+        Leaf counts are not kept up to date while the tree grows, so the
+        occurrences are counted one by one
+        """
+        return sum(1 for _ in self.iter_pattern(pattern))
@@ -0,0 +1,191 @@
+"""
+Text over A, C, G and T packed at 2 bits per base, with any other
+character (a terminal, N, ...) kept in a sorted exception list. Indexing
+and slicing give back str, so a PackedDNA can stand in for the str text
+of SuffixArrayEfficient, SuffixTreeEfficient and SuffixTrie, while lcp
+compares whole words of bases at a time
+"""
+
+import re
+from array import array
+from bisect import bisect_left
+
+BASES = "ACGT"
+_CODES = {ord(base): code for code, base in enumerate(BASES)}
+_NOT_BASE = re.compile("[^ACGT]")
+# The 4 bases packed in every byte value, and for the k-th base of a byte
+# the table shifting a code into its place
+_DECODE = ["".join(BASES[(byte >> shift) & 3] for shift in (6, 4, 2, 0))
+           for byte in range(256)]
+_SHIFTS = [bytes((code << shift) & 0xff for code in range(256))
+           for shift in (6, 4, 2, 0)]
+# For the k-th base of a byte the table giving its code
+_UNPACK = [bytes((byte >> shift) & 3 for byte in range(256))
+           for shift in (6, 4, 2, 0)]
+
+class PackedDNA(object):
+    """
+    Base i is stored in byte i // 4 of data, most significant bits
+    first, so a run of bytes read as a big-endian integer holds the bases
+    in text order. Exceptions are stored as A in data, their positions
+    and characters are in exception_positions and exception_chars
+    """
+    BASES = BASES
+    # Bases compared at once by lcp
+    WORD = 64
+    # Bases unpacked at once by characters
+    CHUNK = 1 << 20
+
+    def __init__(self, text=""):
+        self.length = 0
+        self.data = bytearray()
+        self.exception_positions = array("q")
+        self.exception_chars = []
+        self.extend(text)
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self._decode(0, self.length)
+
+    def __repr__(self):
+        return "PackedDNA(" + repr(str(self)) + ")"
+
+    def __add__(self, other):
+        packed = PackedDNA()
+        packed.length = self.length
+        packed.data = bytearray(self.data)
+        packed.exception_positions = array("q", self.exception_positions)
+        packed.exception_chars = list(self.exception_chars)
+        packed.extend(str(other))
+        return packed
+
+    def __iter__(self):
+        for start in range(0, self.length, 4096):
+            yield from self._decode(start, min(start + 4096, self.length))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                return str(self)[key]
+            return self._decode(start, max(start, stop))
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError("PackedDNA index out of range")
+        index = bisect_left(self.exception_positions, key)
+        if index < len(self.exception_positions) and \
+                self.exception_positions[index] == key:
+            return self.exception_chars[index]
+        return self.BASES[(self.data[key >> 2] >> (6 - 2 * (key & 3))) & 3]
+
+    def extend(self, text):
+        """ Appends the characters of the str text """
+        for match in _NOT_BASE.finditer(text):
+            self.exception_positions.append(self.length + match.start())
+            self.exception_chars.append(match.group())
+        codes = _NOT_BASE.sub("A", text).translate(_CODES)
+        codes = codes.encode("latin-1")
+
+        # Repack the bases of a partly filled last byte with the new ones
+        used = self.length & 3
+        if used:
+            last = self.data.pop()
+            codes = bytes((last >> (6 - 2 * k)) & 3 for k in range(used)) + codes
+        self.length += len(text)
+        codes += bytes(-len(codes) % 4)
+
+        packed = 0
+        for k in range(4):
+            part = codes[k::4].translate(_SHIFTS[k])
+            packed |= int.from_bytes(part, "big")
+        self.data += packed.to_bytes(len(codes) // 4, "big")
+
+    def codes(self, start=0, stop=None):
+        """
+        Returns a bytearray with the 2 bit code of every base from start
+        to stop, in the order of BASES. Exceptions have the code of A
+        """
+        if stop is None or stop > self.length:
+            stop = self.length
+        first = start >> 2
+        data = self.data[first:(stop + 3) >> 2]
+        codes = bytearray(4 * len(data))
+        for k in range(4):
+            codes[k::4] = data.translate(_UNPACK[k])
+        return codes[start - 4 * first:stop - 4 * first]
+
+    def characters(self):
+        """ Returns the set of the characters in the text """
+        present = set()
+        positions = self.exception_positions
+        index = 0
+        for start in range(0, self.length, self.CHUNK):
+            stop = min(start + self.CHUNK, self.length)
+            codes = self.codes(start, stop)
+            # Exceptions are not the A stored in their place
+            while index < len(positions) and positions[index] < stop:
+                codes[positions[index] - start] = len(self.BASES)
+                index += 1
+            present.update(codes)
+        return {self.BASES[code] for code in present
+                if code < len(self.BASES)} | set(self.exception_chars)
+
+    def _decode(self, start, stop):
+        """ Returns the characters from start to stop as a str """
+        if start >= stop:
+            return ""
+        chunk = self.data[start >> 2:((stop - 1) >> 2) + 1]
+        offset = start & 3
+        text = "".join(map(_DECODE.__getitem__, chunk))
+        text = text[offset:offset + stop - start]
+        first = bisect_left(self.exception_positions, start)
+        last = bisect_left(self.exception_positions, stop)
+        if first == last:
+            return text
+        chars = list(text)
+        for index in range(first, last):
+            chars[self.exception_positions[index] - start] = \
+                self.exception_chars[index]
+        return "".join(chars)
+
+    def _codes(self, start, count):
+        """ Returns the 2 bit codes of count bases from start as one integer """
+        first = start >> 2
+        end = (start + count + 3) >> 2
+        value = int.from_bytes(self.data[first:end], "big")
+        value >>= 2 * (4 * (end - first) - (start & 3) - count)
+        return value & ((1 << (2 * count)) - 1)
+
+    def _next_exception(self, position):
+        index = bisect_left(self.exception_positions, position)
+        if index < len(self.exception_positions):
+            return self.exception_positions[index]
+        return self.length
+
+    def lcp(self, i, j, equal=0, other=None):
+        """
+        Returns the length of the longest common prefix of the suffix at
+        i of this text and the suffix at j of other, this text if None,
+        knowing their first equal characters match. Runs of bases are
+        compared WORD at a time, exceptions one at a time
+        """
+        if other is None:
+            other = self
+        k = max(0, equal)
+        while i + k < self.length and j + k < other.length:
+            a, b = i + k, j + k
+            stop_a, stop_b = self._next_exception(a), other._next_exception(b)
+            if stop_a == a or stop_b == b:
+                if self[a] != other[b]:
+                    return k
+                k += 1
+                continue
+            count = min(self.WORD, stop_a - a, stop_b - b)
+            diff = self._codes(a, count) ^ other._codes(b, count)
+            if diff:
+                return k + count - (diff.bit_length() + 1) // 2
+            k += count
+        return k
@@ -0,0 +1,133 @@
+"""
+Prefix doubling spread over a pool of worker processes. The suffix
+array, the ranks and the sort keys live in one shared memory block which
+every worker maps, so a round only sends the workers the ranges of the
+suffix array they have to sort
+"""
+
+import multiprocessing
+from array import array
+from multiprocessing import shared_memory
+
+TYPECODE = "q"
+WIDTH = array(TYPECODE).itemsize
+
+# Set in each worker process by _attach_arrays
+_shared = None
+_order = None
+_rank = None
+_keys = None
+
+def _views(buffer, n):
+    """ Splits the shared block into the order, rank and keys arrays """
+    view = buffer[:3*n*WIDTH].cast(TYPECODE)
+    return view[:n], view[n:2*n], view[2*n:]
+
+def _attach_arrays(name, n):
+    global _shared, _order, _rank, _keys
+    _shared = shared_memory.SharedMemory(name=name)
+    _order, _rank, _keys = _views(_shared.buf, n)
+
+def _gather_keys(task):
+    """
+    First phase of a round: the key of the suffix at position p of the
+    order is the rank of the suffix L characters after it. Only ranks are
+    read, so every worker sees the ranks of the previous round
+    """
+    L, groups = task
+    n = len(_order)
+    order, rank, keys = _order, _rank, _keys
+    for start, end in groups:
+        for p in range(start, end):
+            keys[p] = rank[(order[p] + L) % n]
+
+def _sort_groups(task):
+    """
+    Second phase of a round: sorts every group by its keys and gives the
+    suffixes of each new group the position where that group starts as
+    rank. A group only reads and writes its own range of the order and
+    keys, and the ranks of its own suffixes. Returns the new groups which
+    still hold more than one suffix
+    """
+    _, groups = task
+    order, rank, keys = _order, _rank, _keys
+    unsorted = []
+    for start, end in groups:
+        pairs = sorted(zip(keys[start:end].tolist(), order[start:end].tolist()))
+        order[start:end] = array(TYPECODE, [suffix for _, suffix in pairs])
+        head = start
+        for p in range(start, end):
+            key, suffix = pairs[p - start]
+            if key != pairs[head - start][0]:
+                if p - head > 1:
+                    unsorted.append((head, p))
+                head = p
+            rank[suffix] = head
+        if end - head > 1:
+            unsorted.append((head, end))
+    return unsorted
+
+def _split(groups, parts):
+    """
+    Packs consecutive groups into at most about parts tasks of similar
+    total size. A group is never split, so a large group is a task alone
+    """
+    total = sum(end - start for start, end in groups)
+    target = max(1, total // parts)
+    tasks, current, size = [], [], 0
+    for group in groups:
+        current.append(group)
+        size += group[1] - group[0]
+        if size >= target:
+            tasks.append(current)
+            current, size = [], 0
+    if current:
+        tasks.append(current)
+    return tasks
+
+def prefix_doubling(order, classes, workers=None, tasks_per_worker=4):
+    """
+    Refines order, the cyclic shifts sorted by their first character,
+    with classes their character classes, into the suffix array. Like
+    build_suffix_array every round doubles the length L the shifts are
+    sorted by, but only the groups of shifts still tied are sorted again.
+    Groups are handed out as tasks, tasks_per_worker per worker and
+    round, so workers finishing early pick up more work
+    """
+    n = len(order)
+    if n == 0:
+        return []
+    workers = workers or multiprocessing.cpu_count()
+    shared = shared_memory.SharedMemory(create=True, size=3*n*WIDTH)
+    views = _views(shared.buf, n)
+    try:
+        shared_order, shared_rank, _ = views
+        shared_order[:] = array(TYPECODE, order)
+
+        # The rank of a shift is where its group starts in the order
+        groups, head = [], 0
+        for p in range(n):
+            if p > 0 and classes[order[p]] != classes[order[p-1]]:
+                if p - head > 1:
+                    groups.append((head, p))
+                head = p
+            shared_rank[order[p]] = head
+        if n - head > 1:
+            groups.append((head, n))
+
+        with multiprocessing.Pool(workers, initializer=_attach_arrays,
+                                  initargs=(shared.name, n)) as pool:
+            L = 1
+            while groups and L < n:
+                tasks = [(L, part) for part in
+                         _split(groups, workers * tasks_per_worker)]
+                pool.map(_gather_keys, tasks)
+                groups = [group for unsorted in pool.map(_sort_groups, tasks)
+                          for group in unsorted]
+                L = 2 * L
+        return shared_order.tolist()
+    finally:
+        for view in views:
+            view.release()
+        shared.close()
+        shared.unlink()
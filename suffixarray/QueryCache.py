@@ -0,0 +1,117 @@
+"""
+Bounded cache of query results. Pass a QueryCache as cache to
+SuffixTreeEfficient, OnlineSuffixTree or Trie to keep the results of
+repeated queries instead of walking the index again. The index clears
+its cache whenever it is rebuilt or changed, so a cache should belong
+to a single index
+"""
+
+import sys
+from collections import OrderedDict
+
+def _size(value):
+    """ Approximate size in bytes of value and the tuples or lists in it """
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(map(_size, value))
+    return size
+
+class QueryCache(object):
+    """
+    Results are kept while their approximate size in bytes, keys
+    included, fits in max_bytes, then evicted
+    - "lru": the least recently used first
+    - "lfu": the least frequently used first, the least recently used
+      of those if several were used as often
+    Entries are kept in one ordered dict per use count, oldest first. With
+    lru every entry stays in the same one. hits, misses, evictions and
+    invalidations count what their name says since the cache was created
+    """
+    POLICIES = ("lru", "lfu")
+
+    def __init__(self, max_bytes=64 * 2**20, policy="lru"):
+        if policy not in self.POLICIES:
+            raise ValueError("Unknown cache policy: " + str(policy))
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # key -> [value, size, uses] and uses -> OrderedDict of keys
+        self._entries = {}
+        self._by_uses = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """ Returns the value cached for key, default if there is none """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.policy == "lru":
+            self._by_uses[entry[2]].move_to_end(key)
+        else:
+            self._unlink(key, entry[2])
+            entry[2] += 1
+            self._by_uses.setdefault(entry[2], OrderedDict())[key] = None
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        Caches value for key, evicting entries until it fits. Returns
+        False if value alone is larger than max_bytes and was not cached
+        """
+        if key in self._entries:
+            self._discard(key)
+        size = _size(key) + _size(value)
+        if size > self.max_bytes:
+            return False
+        while self.bytes + size > self.max_bytes:
+            self._evict()
+        uses = 0 if self.policy == "lru" else 1
+        self._entries[key] = [value, size, uses]
+        self._by_uses.setdefault(uses, OrderedDict())[key] = None
+        self.bytes += size
+        return True
+
+    def clear(self):
+        """ Drops every entry, counted as an invalidation """
+        self._entries.clear()
+        self._by_uses.clear()
+        self.bytes = 0
+        self.invalidations += 1
+
+    def as_dict(self):
+        return {"policy": self.policy, "max_bytes": self.max_bytes,
+                "bytes": self.bytes, "entries": len(self._entries),
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations}
+
+    def _unlink(self, key, uses):
+        keys = self._by_uses[uses]
+        del keys[key]
+        if len(keys) == 0:
+            del self._by_uses[uses]
+
+    def _discard(self, key):
+        _, size, uses = self._entries.pop(key)
+        self._unlink(key, uses)
+        self.bytes -= size
+
+    def _evict(self):
+        """ Evicts the oldest entry among those used the fewest times """
+        keys = self._by_uses[min(self._by_uses)]
+        key = next(iter(keys))
+        self._discard(key)
+        self.evictions += 1
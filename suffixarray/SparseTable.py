@@ -0,0 +1,33 @@
+"""
+Range minimum queries in constant time after O( n log(n) ) preprocessing.
+Used over an LCP array, the minimum of a range is the longest common
+prefix of the two suffixes at its ends in the suffix array
+"""
+
+from array import array
+
+class SparseTable(object):
+    """
+    levels[k][i] is the minimum of values[i:i+2**k]. A range is covered
+    by the two, possibly overlapping, runs of the largest power of two
+    fitting in it, so a query looks at exactly two entries
+    """
+    def __init__(self, values):
+        self.levels = [array("l", values)]
+        length = 1
+        while 2 * length <= len(values):
+            prev = self.levels[-1]
+            self.levels.append(array("l", map(min, prev[:len(prev) - length],
+                                              prev[length:])))
+            length = 2 * length
+
+    def __len__(self):
+        return len(self.levels[0])
+
+    def query(self, start, end):
+        """ Returns the minimum of values[start:end], which must not be empty """
+        if not 0 <= start < end <= len(self):
+            raise IndexError("Invalid range: " + str((start, end)))
+        k = (end - start).bit_length() - 1
+        level = self.levels[k]
+        return min(level[start], level[end - (1 << k)])
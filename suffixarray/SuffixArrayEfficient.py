@@ -1,35 +1,93 @@
 # python3
 import sys
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from BuildStats import list_size, phase
+from PackedDNA import PackedDNA
 
 """
 Contains source code for efficiently creating a Suffix Array
 for a long string. For a string S, this builds a Suffix Array
-in time O( |S| log(s) ) using O(|S|) memory
+in time O( |S| log(s) ) using O(|S|) memory, or in time O( |S| )
+using induced sorting (SA-IS)
 """
 
 class SuffixArrayEfficient(object):
 
-    def __init__(self, text, terminal="$", custom_alpha=False):
+    BACKENDS = ("python", "numpy")
+
+    def __init__(self, text, terminal="$", custom_alpha=False, backend="python",
+                 alpha=None, stats=None):
         """
+        text is a str, a PackedDNA handled like a str, or any sequence
+        of integers such as bytes, a bytearray, a memoryview, an mmap or
+        an array. A sequence is indexed in place, through a memoryview
+        when it supports one. The terminal is added to a str, but only
+        implied after the last element of a PackedDNA or a sequence, so
+        neither is copied. An mmap can only be closed once self.text is
+        released
         Alphabet must be in order such that the smallest value
         character is furthest left in the string and values
         continue increasing as we progress right
+        alpha can be given to use an alphabet other than the default one,
+        the terminal is put in front of it if it is not already there.
+        Otherwise the alphabet of a str is the terminal and A-Z if that
+        covers the text, or with custom_alpha or when it does not, the
+        terminal and the sorted characters of the text. The alphabet of a
+        sequence is the terminal followed by its sorted distinct values,
+        or by those of alpha, a str alpha giving the code point of every
+        character after its terminal is removed
+        backend selects how the doubling rounds are run: "python" uses
+        plain lists, "numpy" does each round as whole-array operations
+        and requires numpy to be installed
+        stats is an optional BuildStats the builds record their phases in
         """
-        self.text = text + terminal
-        if not custom_alpha:
-            self.alpha = terminal + "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        if backend not in self.BACKENDS:
+            raise ValueError("Unknown backend: " + str(backend))
+        if backend == "numpy" and np is None:
+            raise ImportError("The numpy backend requires numpy")
+        self.backend = backend
+        self.stats = stats
+        self.terminal = terminal
+        self._ranks = None
+        if isinstance(text, (str, PackedDNA)):
+            if isinstance(text, PackedDNA):
+                self.text = text
+                characters = text.characters()
+            else:
+                self.text = text + terminal
+                characters = set(text)
+            if alpha is not None:
+                self.alpha = terminal + alpha.replace(terminal, "")
+            elif not custom_alpha and \
+                    characters <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
+                self.alpha = terminal + "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+            else:
+                self.alpha = terminal + "".join(sorted(characters - {terminal}))
         else:
-            self.alpha = self._get_custom_alpha()
+            try:
+                self.text = memoryview(text)
+            except TypeError:
+                self.text = text
+            if isinstance(self.text, memoryview) and \
+                    (self.text.ndim != 1 or self.text.format == "c"):
+                self.text = self.text.cast("B")
+            if alpha is None:
+                values = sorted(set(self.text))
+            elif isinstance(alpha, str):
+                values = [ord(c) for c in alpha.replace(terminal, "")]
+            else:
+                values = list(alpha)
+            self.alpha = (terminal,) + tuple(values)
+        self.length = len(self.text) + (0 if isinstance(text, str) else 1)
 
     def __str__(self):
-        return "Suffix Array for text:" + self.text
-
-    def _get_custom_alpha(self):
-        """
-        Gets a custom character set from the user via command line
-        """
-        print("Please enter your custom alphabet set:")
-        return ''.join(list(set(input(""))))
+        return "Suffix Array for text:" + str(self.text)
 
     def build_suffix_array(self):
         """
@@ -39,15 +97,183 @@ class SuffixArrayEfficient(object):
         in text where the i-th lexicographically smallest
         suffix of text starts.
         """
-        order = self._sort_characters()
-        classes = self._compute_character_classes(order)
+        if self.backend == "numpy":
+            return self._build_suffix_array_numpy()
+        with phase(self.stats, "sort_characters"):
+            order = self._sort_characters()
+            classes = self._compute_character_classes(order)
         L = 1
-        while L < len(self.text):
-            order = self._sort_characters_doubled(L, order, classes)
-            classes = self._update_classes(order, classes, L)
-            L = 2 * L
+        rounds = 0
+        with phase(self.stats, "doubling"):
+            while L < self.length:
+                order = self._sort_characters_doubled(L, order, classes)
+                classes = self._update_classes(order, classes, L)
+                L = 2 * L
+                rounds += 1
+        self._record_suffix_array(order, doubling_rounds=rounds)
+        return order
+
+    def _record_suffix_array(self, order, **counters):
+        if self.stats is None:
+            return
+        for name, value in counters.items():
+            self.stats.record(name, value)
+        self.stats.record("suffix_array_bytes", list_size(order))
+
+    def build_suffix_array_parallel(self, workers=None):
+        """
+        Same result as build_suffix_array, with the doubling rounds
+        spread over workers processes (all CPUs by default), see
+        ParallelSuffixArray
+        """
+        from ParallelSuffixArray import prefix_doubling
+        with phase(self.stats, "sort_characters"):
+            order = self._sort_characters()
+            classes = self._compute_character_classes(order)
+        with phase(self.stats, "parallel_doubling"):
+            order = prefix_doubling(order, classes, workers)
+        self._record_suffix_array(order)
+        return order
+
+    def build_suffix_array_sais(self):
+        """
+        Builds the same suffix array as build_suffix_array, but in linear
+        time using induced sorting (SA-IS). The terminal must be the
+        smallest character of the alphabet and occur only at the end
+        of the text
+        """
+        ranks = self._character_ranks()
+        if ranks.count(0) != 1:
+            raise ValueError("Terminal must occur only at the end of the text")
+        self._sais_levels = 0
+        with phase(self.stats, "sais"):
+            order = self._sais(ranks, len(self.alpha))
+        self._record_suffix_array(order, sais_levels=self._sais_levels)
         return order
 
+    def _sais(self, s, alpha_size):
+        """
+        Sorts the suffixes of s, a list of integers smaller than alpha_size
+        ending in a unique smallest 0. Suffixes are classified as S-type
+        (smaller than the next suffix) or L-type (larger). The leftmost
+        S-type suffixes of each S run (LMS) are sorted first, from which
+        the order of all the other suffixes is induced
+        For example
+        - Suppose s = "ABABAA$"
+        - types = [S, L, S, L, L, L, S]
+        - LMS suffixes = [2, 6]
+        """
+        n = len(s)
+        self._sais_levels += 1
+        if n == 1:
+            return [0]
+
+        s_type = bytearray(n)
+        s_type[n-1] = 1
+        for i in range(n-2, -1, -1):
+            if s[i] < s[i+1] or (s[i] == s[i+1] and s_type[i+1]):
+                s_type[i] = 1
+        is_lms = bytearray(n)
+        lms = []
+        for i in range(1, n):
+            if s_type[i] and not s_type[i-1]:
+                is_lms[i] = 1
+                lms.append(i)
+
+        count = [0] * alpha_size
+        for c in s:
+            count[c] += 1
+
+        # Induce an order from the unsorted LMS suffixes, this is enough
+        # to sort the LMS substrings (LMS suffix up to the next LMS suffix)
+        order = self._induce_sort(s, s_type, lms, count)
+
+        # Name the LMS substrings by their rank, equal substrings share
+        # a name
+        names = [0] * n
+        name = 0
+        prev = None
+        for suffix in order:
+            if not is_lms[suffix]:
+                continue
+            if prev is not None and \
+                    not self._lms_substrings_equal(s, s_type, is_lms, prev, suffix):
+                name += 1
+            names[suffix] = name
+            prev = suffix
+
+        # If every name is unique the LMS suffixes are already sorted,
+        # otherwise sort them by recursing on the string of names
+        if name + 1 < len(lms):
+            reduced = [names[suffix] for suffix in lms]
+            sorted_lms = [lms[i] for i in self._sais(reduced, name + 1)]
+        else:
+            sorted_lms = [0] * len(lms)
+            for suffix in lms:
+                sorted_lms[names[suffix]] = suffix
+
+        return self._induce_sort(s, s_type, sorted_lms, count)
+
+    def _induce_sort(self, s, s_type, lms, count):
+        """
+        Places the LMS suffixes at the ends of their buckets, then
+        induces the L-type suffixes left to right from the bucket
+        heads and the S-type suffixes right to left from the bucket tails
+        """
+        n = len(s)
+        order = [-1] * n
+
+        tails = self._bucket_tails(count)
+        for suffix in reversed(lms):
+            c = s[suffix]
+            tails[c] -= 1
+            order[tails[c]] = suffix
+
+        heads = self._bucket_heads(count)
+        for i in range(n):
+            j = order[i] - 1
+            if j >= 0 and not s_type[j]:
+                c = s[j]
+                order[heads[c]] = j
+                heads[c] += 1
+
+        tails = self._bucket_tails(count)
+        for i in range(n-1, -1, -1):
+            j = order[i] - 1
+            if j >= 0 and s_type[j]:
+                c = s[j]
+                tails[c] -= 1
+                order[tails[c]] = j
+
+        return order
+
+    def _bucket_heads(self, count):
+        heads, total = [0] * len(count), 0
+        for c in range(len(count)):
+            heads[c] = total
+            total += count[c]
+        return heads
+
+    def _bucket_tails(self, count):
+        tails, total = [0] * len(count), 0
+        for c in range(len(count)):
+            total += count[c]
+            tails[c] = total
+        return tails
+
+    def _lms_substrings_equal(self, s, s_type, is_lms, i, j):
+        """
+        Checks if the LMS substrings starting at i and j have the same
+        characters and types up to and including their next LMS position
+        """
+        k = 0
+        while True:
+            if s[i+k] != s[j+k] or s_type[i+k] != s_type[j+k]:
+                return False
+            if k > 0 and (is_lms[i+k] or is_lms[j+k]):
+                return is_lms[i+k] and is_lms[j+k]
+            k += 1
+
     def _sort_characters(self):
         """
         Returns a list containing mappings of letter index to its position
@@ -62,31 +288,29 @@ class SuffixArrayEfficient(object):
         - The character at index 0 will be located at index 2 of sorted array
         - If we look at the sorted array of our original text, ["B", "C", "D"]
         this is true
+        Characters are replaced by their rank in the alphabet, so this is a
+        counting sort over small integers
         """
-        order = [0] * len(self.alpha)
-        count = {letter: 0 for letter in self.alpha}
+        ranks = self._character_ranks()
+        order = [0] * len(ranks)
+        count = [0] * len(self.alpha)
 
-        # Store the count of each unique letter in the text
-        for i in range(0, len(self.text)):
-            if self.text[i] in count:
-                count[self.text[i]] += 1
-            else:
-                count[self.text[i]] = 0
+        # Store the count of each rank in the text
+        for rank in ranks:
+            count[rank] += 1
 
         # Modify count so that it stores the element at each index stores
         # the sum of previous counts
-        for i, letter in enumerate(self.alpha):
-            if i == 0:
-                continue
-            count[letter] = count[letter] + count[self.alpha[i-1]]
+        for i in range(1, len(count)):
+            count[i] = count[i] + count[i-1]
 
         # Copy resulting location to output list
-        for i in range(len(self.text)-1, -1, -1):
-            c = self.text[i]
+        for i in range(len(ranks)-1, -1, -1):
+            c = ranks[i]
             count[c] = count[c] - 1
             order[count[c]] = i
 
-        return order[:len(self.text)]
+        return order
 
     def _compute_character_classes(self, order):
         """
@@ -114,10 +338,11 @@ class SuffixArrayEfficient(object):
           because text[3] == text[1]
             classes = [1, 2, 1, 2, 1, 1, 0]
         """
-        classes = [0] * len(self.text)
+        ranks = self._character_ranks()
+        classes = [0] * len(ranks)
         classes[order[0]] = 0
-        for i in range(1, len(self.text)):
-            if self.text[order[i]] != self.text[order[i-1]]:
+        for i in range(1, len(ranks)):
+            if ranks[order[i]] != ranks[order[i-1]]:
                 classes[order[i]] = classes[order[i-1]] + 1
             else:
                 classes[order[i]] = classes[order[i-1]]
@@ -130,13 +355,14 @@ class SuffixArrayEfficient(object):
         stabley so that if their first halves are the same, they
         preserve the order they were in from the second half
         """
-        count, new_order = [0] * len(self.text), [0] * len(self.text)
-        for i in range(0, len(self.text)):
+        n = self.length
+        count, new_order = [0] * n, [0] * n
+        for i in range(0, n):
             count[classes[i]] = count[classes[i]] + 1
-        for i in range(1, len(self.text)):
+        for i in range(1, n):
             count[i] = count[i] + count[i-1]
-        for i in range(len(self.text)-1, -1, -1):
-            start = (order[i] - L + len(self.text)) % len(self.text)
+        for i in range(n-1, -1, -1):
+            start = (order[i] - L + n) % n
             cl = classes[start]
             count[cl] = count[cl] - 1
             new_order[count[cl]] = start
@@ -164,3 +390,129 @@ class SuffixArrayEfficient(object):
                 new_class[cur] = new_class[prev]
 
         return new_class
+
+    # Bytes of a buffer translated at once by _character_ranks
+    RANK_CHUNK = 1 << 20
+
+    def _character_ranks(self):
+        """
+        Returns an array with the position in the alphabet of every
+        character in the text, computed once. It holds a byte per
+        character when the alphabet fits in one. For example with the
+        default alphabet
+        - Suppose text = "BA$"
+        - ranks = [2, 1, 0]
+        A str or a byte buffer is mapped through a translation table
+        instead of one character at a time
+        """
+        if self._ranks is not None:
+            return self._ranks
+        typecode = "B" if len(self.alpha) <= 256 else "I"
+        if isinstance(self.text, str):
+            missing = set(self.text).difference(self.alpha)
+            if missing:
+                raise ValueError("Character not in alphabet: " +
+                                 repr(min(missing)))
+            ranks = self.text.translate({ord(letter): i for i, letter
+                                         in enumerate(self.alpha)})
+            self._ranks = array(typecode)
+            if typecode == "B":
+                self._ranks.frombytes(ranks.encode("latin-1"))
+            else:
+                self._ranks.extend(map(ord, ranks))
+            return self._ranks
+
+        rank = {letter: i for i, letter in enumerate(self.alpha)}
+        if isinstance(self.text, PackedDNA):
+            missing = self.text.characters().difference(self.alpha)
+            if missing:
+                raise ValueError("Character not in alphabet: " +
+                                 repr(min(missing)))
+            # Bases are ranked from their packed codes, the exceptions
+            # one by one
+            table = [rank.get(base, 0) for base in PackedDNA.BASES]
+            table += [0] * (256 - len(table))
+            self._ranks = array(typecode)
+            for start in range(0, len(self.text), self.RANK_CHUNK):
+                codes = self.text.codes(start, start + self.RANK_CHUNK)
+                if typecode == "B":
+                    self._ranks.frombytes(codes.translate(bytes(table)))
+                else:
+                    self._ranks.extend(map(table.__getitem__, codes))
+            for position, letter in zip(self.text.exception_positions,
+                                        self.text.exception_chars):
+                self._ranks[position] = rank[letter]
+            self._ranks.append(0)
+            return self._ranks
+
+        # The terminal is not part of a sequence, so its rank is added at
+        # the end and the ranks of values start at 1
+        del rank[self.terminal]
+        rank.update((value, i + 1) for i, value in enumerate(self.alpha[1:]))
+        if typecode == "B" and isinstance(self.text, memoryview) and \
+                self.text.format == "B":
+            # Values outside the alphabet are translated to 0, which
+            # only the terminal has
+            table = bytearray(256)
+            for value, i in rank.items():
+                if 0 <= value < 256:
+                    table[value] = i
+            self._ranks = array("B")
+            for start in range(0, len(self.text), self.RANK_CHUNK):
+                chunk = self.text[start:start+self.RANK_CHUNK]
+                self._ranks.frombytes(bytes(chunk).translate(table))
+            if self._ranks.count(0) != 0:
+                value = self.text[self._ranks.index(0)]
+                raise ValueError("Character not in alphabet: " + repr(value))
+        else:
+            try:
+                self._ranks = array(typecode, map(rank.__getitem__, self.text))
+            except KeyError as e:
+                raise ValueError("Character not in alphabet: " + str(e)) from None
+        self._ranks.append(0)
+        return self._ranks
+
+    def _build_suffix_array_numpy(self):
+        """
+        Same prefix doubling as build_suffix_array, but the counting sort
+        and class renumbering of every round are done as whole-array
+        operations. Both sorts are stable so the resulting order is
+        identical to the one produced by the python backend
+        """
+        with phase(self.stats, "doubling"):
+            order, rounds = self._numpy_doubling()
+        order = order.tolist()
+        self._record_suffix_array(order, doubling_rounds=rounds)
+        return order
+
+    def _numpy_doubling(self):
+        """ Returns the order as a numpy array and the rounds it took """
+        n = self.length
+        ranks = np.array(self._character_ranks(), dtype=np.int64)
+        order = np.argsort(ranks, kind="stable")
+        classes = np.empty(n, dtype=np.int64)
+        sorted_ranks = ranks[order]
+        classes[order] = np.concatenate(
+            ([0], np.cumsum(sorted_ranks[1:] != sorted_ranks[:-1])))
+        L = 1
+        rounds = 0
+        while L < n:
+            rounds += 1
+            # Sort the doubled shifts by their first half, the order of
+            # their second half is already given by the previous order
+            start = (order - L) % n
+            order = start[np.argsort(classes[start], kind="stable")]
+
+            # Renumber classes, a new class starts wherever either half
+            # differs from the previous shift in order
+            first = classes[order]
+            second = classes[(order + L) % n]
+            changed = (first[1:] != first[:-1]) | (second[1:] != second[:-1])
+            classes = np.empty(n, dtype=np.int64)
+            classes[order] = np.concatenate(([0], np.cumsum(changed)))
+
+            # Once every shift has its own class the order can not change
+            if classes[order[-1]] == n - 1:
+                break
+            L = 2 * L
+        return order, rounds
@@ -0,0 +1,232 @@
+"""
+On-disk format for a suffix array and its LCP array. The text, the
+suffix array and the LCP array are stored as fixed-width arrays in one
+file which is opened with mmap, so processes opening the same file share
+its pages and loading costs no more than the mmap call
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+
+class SuffixArrayIndex(object):
+    """
+    Read-only view of a saved suffix array index. The file layout, all
+    little-endian, is
+    - header: magic, version, integer width, character width, text
+      length, lcp length, terminal length, alphabet length
+    - terminal and alphabet as utf-8
+    - text, one byte per character (latin-1)
+    - suffix array, text length integers
+    - lcp array, lcp length integers
+    Each section starts on an 8 byte boundary.
+    self.text is a memoryview of the text bytes, self.suffix_array and
+    self.lcp_array are memoryviews of integers, none of them are copies
+    """
+    MAGIC = b"SAIX"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHBBQQHH")
+    TYPECODES = {4: "I", 8: "Q"}
+    # Items copied at once by write
+    CHUNK = 1 << 20
+
+    def __init__(self, buffer):
+        if sys.byteorder != "little":
+            raise ValueError("Suffix array indexes can only be read on "
+                             "little-endian machines")
+        self._mmap = None
+        self._view = memoryview(buffer)
+        self.text = self.suffix_array = self.lcp_array = None
+        try:
+            self._read_sections()
+        except Exception:
+            # Views left on the buffer would keep its mmap from closing
+            self._release_views()
+            raise
+
+    def _read_sections(self):
+        if len(self._view) < self.HEADER.size:
+            raise ValueError("Not a suffix array index")
+        magic, version, int_width, char_width, text_len, lcp_len, \
+            terminal_len, alpha_len = self.HEADER.unpack_from(self._view)
+        if magic != self.MAGIC:
+            raise ValueError("Not a suffix array index")
+        if version != self.VERSION:
+            raise ValueError("Unsupported index version: " + str(version))
+        if int_width not in self.TYPECODES or char_width != 1:
+            raise ValueError("Unsupported index widths")
+
+        offset = self.HEADER.size
+        self.terminal = bytes(self._view[offset:offset+terminal_len]).decode()
+        offset += terminal_len
+        self.alpha = bytes(self._view[offset:offset+alpha_len]).decode()
+
+        self.int_width = int_width
+        typecode = self.TYPECODES[int_width]
+        offset, sa_offset, lcp_offset, _ = self._offsets(
+            text_len, lcp_len, terminal_len + alpha_len, int_width)
+        if lcp_offset + lcp_len * int_width > len(self._view):
+            raise ValueError("Truncated suffix array index")
+        self.text = self._view[offset:offset+text_len]
+        self.suffix_array = \
+            self._view[sa_offset:sa_offset+text_len*int_width].cast(typecode)
+        self.lcp_array = \
+            self._view[lcp_offset:lcp_offset+lcp_len*int_width].cast(typecode)
+
+    def __len__(self):
+        return len(self.text)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def open(cls, path):
+        """ Memory maps the index saved at path """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index = cls(mm)
+        except Exception:
+            mm.close()
+            raise
+        index._mmap = mm
+        return index
+
+    def close(self):
+        """
+        Releases the views on the buffer, and unmaps it if it was
+        opened from a file
+        """
+        self._release_views()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def _release_views(self):
+        for view in (self.text, self.suffix_array, self.lcp_array, self._view):
+            if view is not None:
+                view.release()
+
+    @staticmethod
+    def _align(offset):
+        return (offset + 7) & ~7
+
+    @staticmethod
+    def integer_width(text_len):
+        """ Bytes per integer in the index of a text of text_len """
+        return 4 if text_len < 2**32 else 8
+
+    @classmethod
+    def _offsets(cls, text_len, lcp_len, strings_len, int_width):
+        """
+        Returns the offsets of the text, the suffix array and the lcp
+        array, and the size of the whole index
+        """
+        text_offset = cls._align(cls.HEADER.size + strings_len)
+        sa_offset = cls._align(text_offset + text_len)
+        lcp_offset = cls._align(sa_offset + text_len * int_width)
+        return (text_offset, sa_offset, lcp_offset,
+                cls._align(lcp_offset + lcp_len * int_width))
+
+    @classmethod
+    def size(cls, text_len, lcp_len, terminal="$", alpha=""):
+        """ Returns the size in bytes of an index, see write """
+        return cls._offsets(text_len, lcp_len,
+                            len(terminal.encode()) + len(alpha.encode()),
+                            cls.integer_width(text_len))[3]
+
+    @classmethod
+    def write(cls, buffer, text, suffix_array, lcp_array, terminal="$",
+              alpha=""):
+        """
+        Serializes the index into the start of the writable buffer, which
+        must hold at least size bytes. Unlike to_bytes nothing as large as
+        the index is built first, the text and arrays are copied
+        CHUNK items at a time. Returns the size of the index
+        """
+        if len(suffix_array) != len(text):
+            raise ValueError("Suffix array and text lengths differ")
+        n = len(text)
+        int_width = cls.integer_width(n)
+        typecode = cls.TYPECODES[int_width]
+        terminal_bytes = terminal.encode()
+        alpha_bytes = alpha.encode()
+        strings = terminal_bytes + alpha_bytes
+        text_offset, sa_offset, lcp_offset, size = cls._offsets(
+            n, len(lcp_array), len(strings), int_width)
+
+        with memoryview(buffer) as view:
+            if size > len(view):
+                raise ValueError("Buffer too small for the index")
+            view[:text_offset] = bytes(text_offset)
+            cls.HEADER.pack_into(view, 0, cls.MAGIC, cls.VERSION, int_width, 1,
+                                 n, len(lcp_array), len(terminal_bytes),
+                                 len(alpha_bytes))
+            view[cls.HEADER.size:cls.HEADER.size+len(strings)] = strings
+            for start in range(0, n, cls.CHUNK):
+                stop = min(start + cls.CHUNK, n)
+                try:
+                    chunk = text[start:stop].encode("latin-1")
+                except UnicodeEncodeError:
+                    raise ValueError("Index text must be latin-1 "
+                                     "encodable") from None
+                view[text_offset+start:text_offset+stop] = chunk
+            view[text_offset+n:sa_offset] = bytes(sa_offset - text_offset - n)
+            for offset, values in ((sa_offset, suffix_array),
+                                   (lcp_offset, lcp_array)):
+                end = offset + len(values) * int_width
+                with view[offset:end].cast(typecode) as target:
+                    for start in range(0, len(values), cls.CHUNK):
+                        stop = min(start + cls.CHUNK, len(values))
+                        target[start:stop] = array(typecode,
+                                                   values[start:stop])
+                view[end:cls._align(end)] = bytes(cls._align(end) - end)
+        return size
+
+    @classmethod
+    def to_bytes(cls, text, suffix_array, lcp_array, terminal="$", alpha=""):
+        """
+        Serializes a text (including its terminal), its suffix array
+        and its LCP array into the index format
+        """
+        return b"".join(cls._sections(text, suffix_array, lcp_array,
+                                      terminal, alpha))
+
+    @classmethod
+    def save(cls, path, text, suffix_array, lcp_array, terminal="$", alpha=""):
+        """ Writes the index to path, see to_bytes """
+        with open(path, "wb") as f:
+            for section in cls._sections(text, suffix_array, lcp_array,
+                                         terminal, alpha):
+                f.write(section)
+
+    @classmethod
+    def _sections(cls, text, suffix_array, lcp_array, terminal, alpha):
+        """ Yields the consecutive, already padded, pieces of the file """
+        try:
+            text_bytes = text.encode("latin-1")
+        except UnicodeEncodeError:
+            raise ValueError("Index text must be latin-1 encodable") from None
+        if len(suffix_array) != len(text_bytes):
+            raise ValueError("Suffix array and text lengths differ")
+        int_width = cls.integer_width(len(text_bytes))
+        typecode = cls.TYPECODES[int_width]
+        terminal_bytes = terminal.encode()
+        alpha_bytes = alpha.encode()
+
+        offset = 0
+        for section in (cls.HEADER.pack(cls.MAGIC, cls.VERSION, int_width, 1,
+                                         len(text_bytes), len(lcp_array),
+                                         len(terminal_bytes), len(alpha_bytes))
+                        + terminal_bytes + alpha_bytes,
+                        text_bytes,
+                        array(typecode, suffix_array).tobytes(),
+                        array(typecode, lcp_array).tobytes()):
+            offset += len(section)
+            yield section
+            yield bytes(cls._align(offset) - offset)
+            offset = cls._align(offset)
@@ -0,0 +1,185 @@
+"""
+Pattern search directly on a suffix array and its LCP array, without
+building a suffix tree. Every occurrence of a pattern is found by two
+binary searches over the suffix array which skip the characters already
+known to match (LCP-LR), so each query takes O( |P| + log(|S|) ) time
+"""
+
+from array import array
+
+from SuffixTreeEfficient import SuffixTreeEfficient
+
+class SuffixArraySearch(object):
+
+    def __init__(self, text, suffix_array, lcp_array, alpha=None,
+                 left_lcp=None, right_lcp=None):
+        """
+        text must include its terminal. It can be a str, a PackedDNA or,
+        as for a SuffixArrayIndex, a bytes-like object in which case
+        patterns are encoded as latin-1 before searching. alpha is the
+        alphabet the suffix array was sorted by, terminal first, as the
+        alpha of a SuffixTreeEfficient. Without it characters are
+        compared by code point, which only agrees with a suffix array
+        whose terminal is the smallest character of the text.
+        left_lcp and right_lcp are computed unless given, see
+        compute_lcp_lr
+        """
+        self.text = text
+        self.suffix_array = suffix_array
+        self.lcp_array = lcp_array
+        self.alpha = alpha
+        self._rank = None
+        if alpha:
+            # Characters of a bytes-like text are compared as integers
+            if isinstance(text, (bytes, bytearray, memoryview)):
+                self._rank = {ord(c): i for i, c in enumerate(alpha)}
+            else:
+                self._rank = {c: i for i, c in enumerate(alpha)}
+        if left_lcp is None or right_lcp is None:
+            n = len(suffix_array)
+            left_lcp = array("l", [0]) * n
+            right_lcp = array("l", [0]) * n
+            self.compute_lcp_lr(lcp_array, left_lcp, right_lcp)
+        self.left_lcp = left_lcp
+        self.right_lcp = right_lcp
+
+    @classmethod
+    def from_text(cls, text, terminal="$"):
+        """ Builds the suffix and LCP arrays of text, but no tree """
+        st = SuffixTreeEfficient(text, terminal)
+        return cls(st.text, st.suffix_array, st.lcp_array, st.alpha)
+
+    @classmethod
+    def from_index(cls, index):
+        """ Searches the arrays of an opened SuffixArrayIndex in place """
+        return cls(index.text, index.suffix_array, index.lcp_array,
+                   index.alpha)
+
+    @classmethod
+    def compute_lcp_lr(cls, lcp_array, left_lcp, right_lcp):
+        """
+        Fills left_lcp and right_lcp, writable sequences holding one
+        integer per suffix, with the LCP-LR arrays of lcp_array. They can
+        live in shared memory and be given to SuffixArraySearch in other
+        processes so that it skips computing them
+        """
+        if len(left_lcp) > 1:
+            cls._compute_lcp_lr(lcp_array, left_lcp, right_lcp,
+                                0, len(left_lcp) - 1)
+
+    @classmethod
+    def _compute_lcp_lr(cls, lcp_array, left_lcp, right_lcp, left, right):
+        """
+        For every midpoint M of the interval (L, R) visited by the
+        binary search, stores the lcp of the suffixes at L and M in
+        left_lcp[M] and of the suffixes at M and R in right_lcp[M].
+        Returns the lcp of the suffixes at left and right
+        """
+        if right - left == 1:
+            return lcp_array[left]
+        mid = (left + right) // 2
+        left_lcp[mid] = cls._compute_lcp_lr(lcp_array, left_lcp, right_lcp,
+                                            left, mid)
+        right_lcp[mid] = cls._compute_lcp_lr(lcp_array, left_lcp, right_lcp,
+                                             mid, right)
+        return min(left_lcp[mid], right_lcp[mid])
+
+    def find_patterns(self, patterns):
+        locations = []
+        for pattern in patterns:
+            locations.append(self.find_pattern(pattern))
+        return locations
+
+    def find_pattern(self, pattern):
+        """
+        Returns a list of indices where pattern occurs, in suffix array
+        order
+        """
+        start, end = self.find_range(pattern)
+        return list(self.suffix_array[start:end])
+
+    def find_range(self, pattern):
+        """
+        Returns the range [start, end) of the suffix array holding the
+        suffixes which start with pattern. The range is empty if the
+        pattern does not occur
+        """
+        pattern = self._encode(pattern)
+        if pattern is None or len(pattern) == 0:
+            return 0, 0
+        start = self._bound(pattern, False)
+        return start, self._bound(pattern, True)
+
+    def _encode(self, pattern):
+        if not isinstance(self.text, (bytes, bytearray, memoryview)):
+            return pattern
+        try:
+            return pattern.encode("latin-1")
+        except UnicodeEncodeError:
+            return None
+
+    def _compare(self, pattern, i, matched):
+        """
+        Compares pattern with the suffix at position i of the suffix
+        array, knowing their first matched characters are equal. Returns
+        the lcp of both and whether the suffix is smaller than the pattern.
+        With an alphabet, a pattern character outside of it sorts after
+        every character of the text
+        """
+        text, m = self.text, len(pattern)
+        suffix = self.suffix_array[i]
+        k = matched
+        while k < m and suffix + k < len(text) and text[suffix+k] == pattern[k]:
+            k += 1
+        if k == m:
+            return k, False
+        if suffix + k == len(text):
+            return k, True
+        if self._rank is None:
+            return k, text[suffix+k] < pattern[k]
+        rank = self._rank
+        return k, rank[text[suffix+k]] < rank.get(pattern[k], len(rank))
+
+    def _bound(self, pattern, upper):
+        """
+        Binary search for the first suffix which is not smaller than
+        pattern, or if upper the first suffix which is larger than
+        pattern and does not start with it. l and r are the lcp of the
+        pattern with the suffixes at left and right, whichever is larger
+        tells which of the precomputed lcps lets us skip the comparison
+        """
+        m, n = len(pattern), len(self.suffix_array)
+        l, smaller = self._compare(pattern, 0, 0)
+        if not (smaller or (upper and l == m)):
+            return 0
+        r, smaller = self._compare(pattern, n - 1, 0)
+        if smaller or (upper and r == m):
+            return n
+
+        left, right = 0, n - 1
+        while right - left > 1:
+            mid = (left + right) // 2
+            if l >= r:
+                known = self.left_lcp[mid]
+                if known > l:
+                    left = mid
+                    continue
+                if known < l:
+                    right, r = mid, known
+                    continue
+                k, smaller = self._compare(pattern, mid, l)
+            else:
+                known = self.right_lcp[mid]
+                if known > r:
+                    right = mid
+                    continue
+                if known < r:
+                    left, l = mid, known
+                    continue
+                k, smaller = self._compare(pattern, mid, r)
+
+            if smaller or (upper and k == m):
+                left, l = mid, k
+            else:
+                right, r = mid, k
+        return right
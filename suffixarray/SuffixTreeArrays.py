@@ -0,0 +1,141 @@
+"""
+Compact node storage for use with the SuffixTreeEfficient class. Nodes
+are integer ids into parallel typed arrays instead of SuffixTreeNode
+objects, so a node costs a few machine words rather than an object and
+a dict
+"""
+
+from array import array
+from bisect import bisect_left
+
+class SuffixTreeArrays(object):
+    """
+    For every node id, parent, string_depth, edge_start, edge_end and
+    occurs hold what the SuffixTreeNode attributes of the same name hold.
+    A parent of -1 marks the root and an occurs of -1 an internal node.
+    While the tree is built, children are chained through first_child,
+    last_child, next_sibling and prev_sibling. finalize replaces these
+    with the children of every node stored as one sorted run:
+    children[child_offsets[node]:child_offsets[node+1]],
+    with the code of the first character of every child's edge at the
+    same position of child_codes, and counts the leaves below every node
+    in leaf_count
+    """
+    NONE = -1
+
+    def __init__(self, text_length):
+        self.typecode = "i" if 2 * text_length < 2**31 else "q"
+        self.parent = array(self.typecode)
+        self.string_depth = array(self.typecode)
+        self.edge_start = array(self.typecode)
+        self.edge_end = array(self.typecode)
+        self.occurs = array(self.typecode)
+        self.first_child = array(self.typecode)
+        self.last_child = array(self.typecode)
+        self.next_sibling = array(self.typecode)
+        self.prev_sibling = array(self.typecode)
+        self.child_offsets = None
+        self.children = None
+        self.child_codes = None
+        self.leaf_count = None
+
+    def __len__(self):
+        return len(self.parent)
+
+    def new_node(self, parent, string_depth, edge_start, edge_end):
+        node = len(self.parent)
+        self.parent.append(parent)
+        self.string_depth.append(string_depth)
+        self.edge_start.append(edge_start)
+        self.edge_end.append(edge_end)
+        self.occurs.append(self.NONE)
+        self.first_child.append(self.NONE)
+        self.last_child.append(self.NONE)
+        self.next_sibling.append(self.NONE)
+        self.prev_sibling.append(self.NONE)
+        return node
+
+    def append_child(self, node, child):
+        """ Adds child after the current last child of node """
+        last = self.last_child[node]
+        self.prev_sibling[child] = last
+        self.next_sibling[child] = self.NONE
+        if last == self.NONE:
+            self.first_child[node] = child
+        else:
+            self.next_sibling[last] = child
+        self.last_child[node] = child
+        self.parent[child] = node
+
+    def replace_last_child(self, node, child):
+        """ Puts child in place of the last child of node """
+        last = self.last_child[node]
+        prev = self.prev_sibling[last]
+        self.prev_sibling[child] = prev
+        self.next_sibling[child] = self.NONE
+        if prev == self.NONE:
+            self.first_child[node] = child
+        else:
+            self.next_sibling[prev] = child
+        self.last_child[node] = child
+        self.parent[child] = node
+
+    def finalize(self, first_code):
+        """
+        Packs the children of every node into consecutive runs, in the
+        order they were added, frees the sibling chains and counts leaves.
+        first_code(child) is the code of the first character of the edge
+        to child, children must have been added in the order of their
+        codes for find_child to bisect on them
+        """
+        self.child_offsets = array(self.typecode, [0]) * (len(self) + 1)
+        self.children = array(self.typecode, [0]) * max(0, len(self) - 1)
+        self.child_codes = array(self.typecode, [0]) * len(self.children)
+        offset = 0
+        for node in range(len(self)):
+            self.child_offsets[node] = offset
+            child = self.first_child[node]
+            while child != self.NONE:
+                self.children[offset] = child
+                self.child_codes[offset] = first_code(child)
+                offset += 1
+                child = self.next_sibling[child]
+        self.child_offsets[len(self)] = offset
+        self.first_child = self.last_child = None
+        self.next_sibling = self.prev_sibling = None
+        self._count_leaves()
+
+    def _count_leaves(self):
+        """
+        Fills leaf_count with the number of leaves below every node.
+        Children can have smaller ids than their parent after an edge
+        break, so nodes are summed up in reverse preorder
+        """
+        self.leaf_count = array(self.typecode, [0]) * len(self)
+        if len(self) == 0:
+            return
+        preorder = []
+        to_visit = [0]
+        while len(to_visit) != 0:
+            node = to_visit.pop()
+            preorder.append(node)
+            to_visit.extend(self.get_children(node))
+        for node in reversed(preorder):
+            if self.occurs[node] != self.NONE:
+                self.leaf_count[node] = 1
+            if self.parent[node] != self.NONE:
+                self.leaf_count[self.parent[node]] += self.leaf_count[node]
+
+    def find_child(self, node, code):
+        """
+        Returns the child of node whose edge starts with the character
+        of the given code, or NONE, bisecting on the codes of its run
+        """
+        start, end = self.child_offsets[node], self.child_offsets[node+1]
+        i = bisect_left(self.child_codes, code, start, end)
+        if i < end and self.child_codes[i] == code:
+            return self.children[i]
+        return self.NONE
+
+    def get_children(self, node):
+        return self.children[self.child_offsets[node]:self.child_offsets[node+1]]
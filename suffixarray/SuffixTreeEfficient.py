@@ -1,20 +1,58 @@
 """
 Efficient construction of a SuffixTree for a string
 Builds a suffix tree from suffix array in linear time
-Can build a suffix tree from scratch in S*log(S) time
+Can build a suffix tree from scratch in linear time, the suffix
+array is built with induced sorting (SA-IS)
 """
 
+import io
+import json
+import sys
+from itertools import islice
+
+from ApproximateMatch import advance, first_state
+from BuildStats import list_size, phase
+from PackedDNA import PackedDNA
 from SuffixArrayEfficient import SuffixArrayEfficient
+from SuffixArrayIndex import SuffixArrayIndex
+from SuffixTreeArrays import SuffixTreeArrays
 from SuffixTreeNode import SuffixTreeNode
+from SparseTable import SparseTable
 
 class SuffixTreeEfficient(object):
-    def __init__(self, text, terminal="$"):
+
+    EXPORT_FORMATS = ("text", "dot", "jsonl")
+
+    def __init__(self, text, terminal="$", compact=False, alpha=None,
+                 stats=None, cache=None):
+        """
+        With compact the tree nodes are stored as ids into the arrays of
+        a SuffixTreeArrays (self.nodes) instead of SuffixTreeNode objects.
+        alpha is the alphabet of the text, see SuffixArrayEfficient. text
+        can be a str or a PackedDNA.
+        stats is an optional BuildStats recording the suffix array, lcp
+        array and tree phases.
+        cache is an optional QueryCache keeping the results of
+        find_pattern and find_pattern_approximate, cleared whenever the
+        tree is created
+        """
+        self.compact = compact
+        self.stats = stats
+        self.cache = cache
         self.text = text + terminal
-        self.suffix_array = SuffixArrayEfficient(text).build_suffix_array()
-        self.lcp_array = self._compute_lcp_array()
+        self.terminal = terminal
+        builder = SuffixArrayEfficient(text, terminal, alpha=alpha, stats=stats)
+        self.alpha = builder.alpha
+        self.suffix_array = builder.build_suffix_array_sais()
+        with phase(stats, "lcp_array"):
+            self.lcp_array = self._compute_lcp_array()
+        if stats is not None:
+            stats.record("lcp_array_bytes", list_size(self.lcp_array))
+        self._rank = None
+        self._lcp_table = None
 
     def __str__(self):
-        return "Text:" + self.text + "\nSuffixArray:" + str(self.suffix_array)
+        return "Text:" + str(self.text) + "\nSuffixArray:" + str(self.suffix_array)
 
     def _invert_suffix_array(self, order):
         pos = [0] * len(order)
@@ -23,7 +61,19 @@ class SuffixTreeEfficient(object):
         return pos
 
     def _lcp_of_suffixes(self, S, i, j, equal):
+        """
+        Extends the equal characters known to match a block at a time,
+        comparing slices, and finishes the last block character by
+        character. A PackedDNA compares its packed words instead
+        """
+        if isinstance(S, PackedDNA):
+            return S.lcp(i, j, equal)
         lcp = max(0, equal)
+        block = 16
+        while S[i+lcp:i+lcp+block] == S[j+lcp:j+lcp+block] and \
+                max(i, j) + lcp + block <= len(S):
+            lcp += block
+            block = min(2 * block, 4096)
         while i + lcp < len(S) and j + lcp < len(S):
             if S[i+lcp] == S[j+lcp]:
                 lcp += 1
@@ -57,6 +107,14 @@ class SuffixTreeEfficient(object):
             suffix = (suffix + 1) % len(self.text)
         return lcp_arr
 
+    def save_index(self, path):
+        """
+        Saves the text, suffix array and LCP array to path so they can
+        be memory mapped with SuffixArrayIndex.open
+        """
+        SuffixArrayIndex.save(path, str(self.text), self.suffix_array,
+                              self.lcp_array, self.terminal, self.alpha)
+
     def _new_leaf(self, node, S, suffix):
         leaf = SuffixTreeNode(node,
                 len(S) - suffix,
@@ -76,11 +134,67 @@ class SuffixTreeEfficient(object):
                     )
         mid_node.children[mid_char] = node.children[start_char]
         node.children[start_char].parent = mid_node
-        node.children[start_char].edge_start = start + offset
+        node.children[start_char].edge_start += offset
         node.children[start_char] = mid_node
         return mid_node
 
+    def _new_compact_leaf(self, node, S, suffix):
+        nodes = self.nodes
+        leaf = nodes.new_node(node,
+                len(S) - suffix,
+                suffix + nodes.string_depth[node],
+                len(S) - 1
+                )
+        nodes.occurs[leaf] = suffix
+        nodes.append_child(node, leaf)
+        return leaf
+
+    def _break_compact_edge(self, node, S, start, offset):
+        """
+        Same as _break_edge. The edge broken always leads to the last
+        child of node since suffixes are added in sorted order
+        """
+        nodes = self.nodes
+        child = nodes.last_child[node]
+        mid_node = nodes.new_node(node,
+                    nodes.string_depth[node] + offset,
+                    start,
+                    start + offset - 1
+                    )
+        nodes.replace_last_child(node, mid_node)
+        nodes.edge_start[child] += offset
+        nodes.append_child(mid_node, child)
+        return mid_node
+
+    def _make_compact_suffix_tree(self, S, order, lcp_arr):
+        self.nodes = SuffixTreeArrays(len(S))
+        depth, parent = self.nodes.string_depth, self.nodes.parent
+        root = self.nodes.new_node(SuffixTreeArrays.NONE, 0, -1, -1)
+        lcp_prev = 0
+        curr_node = root
+        for i in range(len(S)):
+            suffix = order[i]
+            while depth[curr_node] > lcp_prev:
+                curr_node = parent[curr_node]
+            if depth[curr_node] == lcp_prev:
+                curr_node = self._new_compact_leaf(curr_node, S, suffix)
+            else:
+                edge_start = order[i-1] + depth[curr_node]
+                offset = lcp_prev - depth[curr_node]
+                mid_node = self._break_compact_edge(curr_node, S, edge_start, offset)
+                curr_node = self._new_compact_leaf(mid_node, S, suffix)
+            if i < len(S)-1:
+                lcp_prev = lcp_arr[i]
+        # Suffixes were added in sorted order, so the children of every
+        # node are in the order of the alphabet
+        self._alpha_codes = {c: code for code, c in enumerate(self.alpha)}
+        codes, edge_start = self._alpha_codes, self.nodes.edge_start
+        self.nodes.finalize(lambda child: codes[S[edge_start[child]]])
+        return root
+
     def _make_suffix_tree_from_suffix_array(self, S, order, lcp_arr):
+        if self.compact:
+            return self._make_compact_suffix_tree(S, order, lcp_arr)
         root = SuffixTreeNode(None, 0, -1, -1)
         lcp_prev = 0
         curr_node = root
@@ -103,29 +217,154 @@ class SuffixTreeEfficient(object):
                 lcp_prev = lcp_arr[i]
         return root
 
+    def lcp(self, i, j):
+        """
+        Returns the length of the longest common prefix of the suffixes
+        starting at positions i and j of the text, in constant time once
+        the first call has built the inverse suffix array and a
+        SparseTable over the lcp array
+        """
+        if self._rank is None:
+            self._rank = self._invert_suffix_array(self.suffix_array)
+            self._lcp_table = SparseTable(self.lcp_array)
+        if i == j:
+            return len(self.text) - i
+        first, second = sorted((self._rank[i], self._rank[j]))
+        return self._lcp_table.query(first, second)
+
     def create_suffix_tree(self):
-        lcp_array = self._compute_lcp_array()
-        self.root = self._make_suffix_tree_from_suffix_array(self.text, \
-                self.suffix_array, lcp_array)
+        if self.cache is not None:
+            self.cache.clear()
+        with phase(self.stats, "tree"):
+            self.root = self._make_suffix_tree_from_suffix_array(self.text, \
+                    self.suffix_array, self.lcp_array)
+            if not self.compact:
+                self._count_leaves()
+        if self.stats is not None:
+            self._record_tree_stats()
+
+    def _record_tree_stats(self):
+        """
+        Every edge break adds one internal node, so the breaks are the
+        internal nodes other than the root
+        """
+        if self.compact:
+            nodes = self.nodes
+            count = len(nodes)
+            leaves = sum(1 for occurs in nodes.occurs
+                         if occurs != SuffixTreeArrays.NONE)
+            size = sum(list_size(values) for values in
+                       (nodes.parent, nodes.string_depth, nodes.edge_start,
+                        nodes.edge_end, nodes.occurs, nodes.child_offsets,
+                        nodes.children, nodes.child_codes))
+        else:
+            count = leaves = size = 0
+            to_visit = [self.root]
+            while to_visit:
+                node = to_visit.pop()
+                count += 1
+                if node.occurs is not None:
+                    leaves += 1
+                size += sys.getsizeof(node) + sys.getsizeof(node.__dict__) + \
+                    sys.getsizeof(node.children)
+                to_visit.extend(node.children.values())
+        self.stats.record("nodes", count)
+        self.stats.record("leaves", leaves)
+        self.stats.record("edge_breaks", count - leaves - 1)
+        self.stats.record("tree_bytes", size)
 
     def display_tree(self):
         """
         Displays the suffix tree labels level by level. The furthest left
         is level 0 the next furthest left is level 1 etc. The children of
         a given label are signified by a change in level (indentation).
-        Returns the displayed string
+        Returns the displayed string, use export to write a large tree
+        to a file instead
         """
-        s = self._display_tree_recursive("", self.root)
+        out = io.StringIO()
+        self.export(out)
+        s = out.getvalue()
         length = len(s) - 2 # remove the trailing newline char
         return s[:length]
 
-    def _display_tree_recursive(self, string, curr, space=''):
-        for child in curr.children:
-            start = curr.children[child].edge_start
-            end = curr.children[child].edge_end
-            string += space + self.text[start:end+1] + "\n"
-            string = self._display_tree_recursive(string, curr.children[child], space+"\t")
-        return string
+    def _edge_end(self, node):
+        """ Returns where the label of the edge into node ends in the text """
+        return node.edge_end
+
+    def export(self, out, format="text", max_label=None):
+        """
+        Writes the tree to the file-like out one edge at a time, in depth
+        first order, as
+        - "text": the label of every edge indented by its depth, as
+          display_tree shows it
+        - "dot": a graphviz digraph, leaves are labelled with where their
+          suffix occurs
+        - "jsonl": one JSON object per node other than the root, with its
+          id, its parent's id, the start and end of its edge label in the
+          text and where its suffix occurs (null for internal nodes)
+        Labels longer than max_label characters are cut short with "..."
+        in the text and dot formats
+        """
+        if format not in self.EXPORT_FORMATS:
+            raise ValueError("Unknown export format: " + str(format))
+        if format == "dot":
+            out.write("digraph suffix_tree {\n")
+        for depth, parent, child, start, end, occurs in self._iter_edges():
+            if format == "jsonl":
+                out.write(json.dumps({"id": child, "parent": parent,
+                                      "start": start, "end": end,
+                                      "occurs": occurs}) + "\n")
+                continue
+            label = self.text[start:end+1]
+            if max_label is not None and len(label) > max_label:
+                label = label[:max_label] + "..."
+            if format == "text":
+                out.write("\t" * depth + label + "\n")
+            else:
+                if occurs is not None:
+                    out.write("  " + str(child) + " [shape=box, label=" +
+                              str(occurs) + "];\n")
+                out.write("  " + str(parent) + " -> " + str(child) + " [label=" +
+                          json.dumps(label, ensure_ascii=False) + "];\n")
+        if format == "dot":
+            out.write("}\n")
+
+    def _iter_edges(self):
+        """
+        Yields (depth, parent, child, start, end, occurs) for every edge in
+        depth first order, where start and end delimit the edge label in
+        the text. The walk keeps one iterator over the children of every
+        node on the current path instead of recursing. Compact nodes are
+        their own ids, SuffixTreeNode objects are numbered as they are
+        reached with the root as 0
+        """
+        if self.compact:
+            nodes = self.nodes
+            path = [(self.root, iter(nodes.get_children(self.root)))]
+            while len(path) != 0:
+                parent, children = path[-1]
+                child = next(children, None)
+                if child is None:
+                    path.pop()
+                    continue
+                occurs = nodes.occurs[child]
+                yield (len(path) - 1, parent, child, nodes.edge_start[child],
+                       nodes.edge_end[child],
+                       None if occurs == SuffixTreeArrays.NONE else occurs)
+                path.append((child, iter(nodes.get_children(child))))
+            return
+        next_id = 1
+        path = [(0, iter(self.root.children.values()))]
+        while len(path) != 0:
+            parent, children = path[-1]
+            child = next(children, None)
+            if child is None:
+                path.pop()
+                continue
+            yield (len(path) - 1, parent, next_id, child.edge_start,
+                   self._edge_end(child), child.occurs)
+            path.append((next_id, iter(child.children.values())))
+            next_id += 1
 
     def find_patterns(self, patterns):
         locations = []
@@ -133,12 +372,140 @@ class SuffixTreeEfficient(object):
             locations.append(self.find_pattern(pattern))
         return locations
 
-    def find_pattern(self, pattern):
+    def find_patterns_parallel(self, patterns, workers=None, chunk_size=1024):
+        """
+        Same as find_patterns, but spreads the patterns over a pool of
+        worker processes searching a shared copy of the suffix array.
+        To run several batches keep a BatchQueryExecutor around instead
+        """
+        from BatchQueryExecutor import BatchQueryExecutor
+        with BatchQueryExecutor(self, workers, chunk_size) as executor:
+            return executor.find_patterns(patterns)
+
+    def find_pattern(self, pattern, limit=None):
         """
         Traverses the suffix tree to find if a given pattern
         can be matched. If so, returns a list of indices where it
-        occurs
+        occurs, at most limit of them if given. With a cache, all the
+        indices are kept there. A search with limit uses them if they are
+        cached, otherwise it stops early without looking up the cache or
+        filling it, and is not counted as a miss
+        """
+        if self.cache is None:
+            return list(islice(self.iter_pattern(pattern), limit))
+        key = ("find_pattern", pattern)
+        if limit is not None and key not in self.cache:
+            return list(islice(self.iter_pattern(pattern), limit))
+        locations = self.cache.get(key)
+        if locations is None:
+            locations = tuple(self.iter_pattern(pattern))
+            self.cache.put(key, locations)
+        return list(locations[:limit])
+
+    def iter_pattern(self, pattern):
+        """
+        Yields the indices where pattern occurs, in the order find_pattern
+        returns them, finding each only when it is asked for
         """
+        node = self._find_node(pattern)
+        if node is not None:
+            yield from self._iter_leaves(node)
+
+    def count_pattern(self, pattern):
+        """
+        Returns the number of occurrences of pattern in O( |P| ) from the
+        leaf counts stored by create_suffix_tree
+        """
+        node = self._find_node(pattern)
+        if node is None:
+            return 0
+        if self.compact:
+            return self.nodes.leaf_count[node]
+        return node.leaf_count
+
+    def find_pattern_approximate(self, pattern, k, edits=False):
+        """
+        Returns (index, distance) for every index of the text where
+        pattern occurs with at most k mismatches, or with edits at most k
+        insertions, deletions and substitutions, sorted by index. An
+        index is reported once, with its smallest distance. The tree is
+        walked from the root one character at a time, keeping the
+        mismatches or a band of edit distances (see ApproximateMatch) for
+        every path, which is dropped as soon as it is over k
+        """
+        if self.cache is None:
+            return self._find_pattern_approximate(pattern, k, edits)
+        key = ("find_pattern_approximate", pattern, k, edits)
+        locations = self.cache.get(key)
+        if locations is None:
+            locations = tuple(self._find_pattern_approximate(pattern, k, edits))
+            self.cache.put(key, locations)
+        return list(locations)
+
+    def _find_pattern_approximate(self, pattern, k, edits):
+        """ find_pattern_approximate without the cache """
+        if k < 0:
+            raise ValueError("k must not be negative")
+        if len(pattern) == 0:
+            return []
+        best = {}
+        limit = len(pattern) + (k if edits else 0)
+        to_explore = [(self.root, 0, first_state(pattern, k, edits))]
+        while len(to_explore) != 0:
+            node, depth, parent_state = to_explore.pop()
+            for child, start, end in self._iter_child_edges(node):
+                label = self.text[start:min(end + 1, start + limit - depth)]
+                child_depth, state = depth, parent_state
+                for symbol in label:
+                    if symbol == self.terminal:
+                        break
+                    state, distance, pruned = advance(state, child_depth, symbol,
+                                                      pattern, k, edits)
+                    child_depth += 1
+                    if distance <= k:
+                        for index in self._iter_leaves(child):
+                            if distance < best.get(index, k + 1):
+                                best[index] = distance
+                    if pruned:
+                        break
+                else:
+                    if child_depth < limit:
+                        to_explore.append((child, child_depth, state))
+        return sorted(best.items())
+
+    def _iter_child_edges(self, node):
+        """ Yields (child, start, end) for every child of node and its edge """
+        if self.compact:
+            nodes = self.nodes
+            for child in nodes.get_children(node):
+                yield child, nodes.edge_start[child], nodes.edge_end[child]
+            return
+        for child in node.children.values():
+            yield child, child.edge_start, self._edge_end(child)
+
+    def _count_leaves(self):
+        """ Stores in every node the number of leaves below it """
+        preorder = []
+        to_visit = [self.root]
+        while len(to_visit) != 0:
+            node = to_visit.pop()
+            preorder.append(node)
+            to_visit.extend(node.children.values())
+        for node in reversed(preorder):
+            if node.occurs is not None:
+                node.leaf_count = 1
+            else:
+                node.leaf_count = sum(child.leaf_count
+                                      for child in node.children.values())
+
+    def _find_node(self, pattern):
+        """
+        Returns the node at or below the end of the path spelling
+        pattern, every leaf below it is an occurrence. Returns None if
+        pattern is empty or does not occur
+        """
+        if self.compact:
+            return self._find_node_compact(pattern)
         curr_node = self.root
         curr_char_pos = 0
         updated = True
@@ -146,8 +513,9 @@ class SuffixTreeEfficient(object):
             updated = False
             for child in curr_node.children.keys():
                 child_node = curr_node.children[child]
-                edge_label = self.text[child_node.edge_start:child_node.edge_end+1]
-                edge_label_len = child_node.edge_end - child_node.edge_start + 1
+                edge_end = self._edge_end(child_node)
+                edge_label = self.text[child_node.edge_start:edge_end+1]
+                edge_label_len = edge_end - child_node.edge_start + 1
 
                 # Check if pattern contains the full edge label
                 if pattern[curr_char_pos:curr_char_pos+edge_label_len] == edge_label:
@@ -163,26 +531,68 @@ class SuffixTreeEfficient(object):
                     updated = True
                     break
 
-            # We have completed the pattern, now return where the pattern
-            # occurs in the original text
+            # We have completed the pattern, all leaves below the node
+            # are occurrences
             if curr_char_pos == len(pattern):
-                # Not a leaf node, all children of node contain pattern
-                if curr_node.occurs == None:
-                    locations = []
-                    self._explore_leaves(curr_node, locations)
-                else:
-                    locations = [curr_node.occurs]
-                return locations
-        return []
+                return curr_node
+        return None
 
-    def _explore_leaves(self, node, locations):
+    def _find_node_compact(self, pattern):
         """
-        Explores a down thru to the leaves from a given node,
-        appending where the suffix at the leaf occurs in the
-        string to locations
+        _find_node for the compact tree. At most one child of a node
+        starts with a given character, so the edge to follow is found by
+        bisecting on the alphabet codes of the first characters of the
+        children and then compared as a whole
         """
-        for child in node.children.keys():
-            if node.children[child].occurs != None:
-                locations.append(node.children[child].occurs)
+        nodes = self.nodes
+        packed = isinstance(self.text, PackedDNA)
+        if packed:
+            packed_pattern = PackedDNA(pattern)
+        curr_node = self.root
+        curr_char_pos = 0
+        while curr_char_pos < len(pattern):
+            code = self._alpha_codes.get(pattern[curr_char_pos])
+            if code is None:
+                return None
+            child = nodes.find_child(curr_node, code)
+            if child == SuffixTreeArrays.NONE:
+                return None
+            start = nodes.edge_start[child]
+            length = min(nodes.edge_end[child] - start + 1,
+                         len(pattern) - curr_char_pos)
+            if packed:
+                if self.text.lcp(start, curr_char_pos, 0, packed_pattern) < length:
+                    return None
+            elif self.text[start:start+length] != \
+                    pattern[curr_char_pos:curr_char_pos+length]:
+                return None
+            curr_char_pos += length
+            curr_node = child
+
+        if curr_char_pos == 0:
+            return None
+        return curr_node
+
+    def _iter_leaves(self, node):
+        """
+        Yields where the suffixes of the leaves below node occur, walking
+        the tree with an explicit stack. Children are pushed in reverse
+        so leaves come out in the order of the children
+        """
+        if self.compact:
+            nodes = self.nodes
+            to_explore = [node]
+            while len(to_explore) != 0:
+                curr = to_explore.pop()
+                if nodes.occurs[curr] != SuffixTreeArrays.NONE:
+                    yield nodes.occurs[curr]
+                else:
+                    to_explore.extend(reversed(nodes.get_children(curr)))
+            return
+        to_explore = [node]
+        while len(to_explore) != 0:
+            curr = to_explore.pop()
+            if curr.occurs is not None:
+                yield curr.occurs
             else:
-                self._explore_leaves(node.children[child], locations)
+                to_explore.extend(reversed(list(curr.children.values())))
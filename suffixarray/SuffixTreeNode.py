@@ -10,6 +10,8 @@ class SuffixTreeNode(object):
         self.edge_start = edge_start
         self.edge_end = edge_end
         self.occurs = None
+        self.suffix_link = None
+        self.leaf_count = None
 
     def __str__(self):
         return "Depth: " + str(self.string_depth) + \
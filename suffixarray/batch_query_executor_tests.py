@@ -0,0 +1,51 @@
+import random
+
+from BatchQueryExecutor import BatchQueryExecutor
+from SuffixTreeEfficient import SuffixTreeEfficient
+
+def test_find_patterns():
+    print("Testing batch queries with worker processes... ", end='')
+
+    rng = random.Random(3)
+    text = ''.join(rng.choice("ACGT") for _ in range(500))
+    st = SuffixTreeEfficient(text)
+    st.create_suffix_tree()
+    patterns = [text[i:i+rng.randint(1, 8)] for i in range(0, 500, 3)] + \
+        ["", "N", "ACGTACGTACGT"]
+
+    with BatchQueryExecutor(st, workers=3, chunk_size=7) as executor:
+        assert executor.find_patterns(patterns) == st.find_patterns(patterns)
+        assert executor.find_patterns([]) == []
+
+    assert st.find_patterns_parallel(patterns[:20], workers=2) == \
+        st.find_patterns(patterns[:20])
+
+    print("Done")
+
+def test_punctuation():
+    print("Testing batch queries on text with spaces and punctuation... ",
+          end='')
+
+    # Space and punctuation sort below the terminal
+    rng = random.Random(4)
+    sentence = "the cat sat on the mat"
+    noisy = ''.join(rng.choice(" !#,.abt") for _ in range(300))
+    for text in (sentence, noisy):
+        st = SuffixTreeEfficient(text)
+        st.create_suffix_tree()
+        patterns = [" ", "!", "# ", "t ", "at", " the", "$", ". !"] + \
+            [text[i:i+rng.randint(1, 4)] for i in range(0, len(text), 5)]
+        with BatchQueryExecutor(st, workers=2, chunk_size=5) as executor:
+            found = executor.find_patterns(patterns)
+        assert found == st.find_patterns(patterns)
+        assert sorted(found[0]) == \
+            [i for i, c in enumerate(text) if c == " "]
+
+    print("Done")
+
+def main():
+    test_find_patterns()
+    test_punctuation()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import random
+
+from FMIndex import FMIndex
+
+def occurrences(text, pattern):
+    return sorted(i for i in range(len(text)) if text.startswith(pattern, i))
+
+def test_count():
+    print("Testing FM-index count... ", end='')
+
+    fm = FMIndex("GTAGT")
+    assert fm.bwt == "TTA$GG"
+    assert fm.count("GT") == 2
+    assert fm.count("GTAGT") == 1
+    assert fm.count("T") == 2
+    assert fm.count("$") == 1
+    assert fm.count("TT") == 0
+    assert fm.count("B") == 0
+    assert fm.count("") == 0
+
+    print("Done")
+
+def test_locate():
+    print("Testing FM-index locate... ", end='')
+
+    fm = FMIndex("GTAGT", sa_rate=1)
+    assert fm.locate("GT") == [3, 0]
+    assert fm.locate("A") == [2]
+    assert fm.locate("C") == []
+
+    rng = random.Random(11)
+    text = "".join(rng.choice("ACGT") for _ in range(300)) + "GATTACA" * 10
+    for sa_rate, occ_rate in [(1, 1), (4, 3), (32, 64), (1000, 1000)]:
+        fm = FMIndex(text, sa_rate=sa_rate, occ_rate=occ_rate)
+        for _ in range(50):
+            start = rng.randrange(len(text))
+            pattern = text[start:start+rng.randint(1, 6)]
+            assert fm.count(pattern) == len(occurrences(text, pattern))
+            assert sorted(fm.locate(pattern)) == occurrences(text, pattern)
+
+    print("Done")
+
+def test_characters_below_terminal():
+    print("Testing FM-index with characters sorting before the terminal... ",
+          end='')
+
+    fm = FMIndex("AB A", alpha=" AB")
+    assert fm.locate("A") == [3, 0]
+    assert fm.count(" A") == 1
+
+    rng = random.Random(3)
+    text = "".join(rng.choice(" !#AB") for _ in range(300))
+    fm = FMIndex(text, sa_rate=4, occ_rate=8)
+    for _ in range(50):
+        start = rng.randrange(len(text))
+        pattern = text[start:start+rng.randint(1, 4)]
+        assert fm.count(pattern) == len(occurrences(text, pattern))
+        assert sorted(fm.locate(pattern)) == occurrences(text, pattern)
+
+    print("Done")
+
+def main():
+    test_count()
+    test_locate()
+    test_characters_below_terminal()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import random
+
+from ApproximateMatch import approximate_distance
+from OnlineSuffixTree import OnlineSuffixTree
+from QueryCache import QueryCache
+from SuffixTreeEfficient import SuffixTreeEfficient
+
+def brute_force(text, pattern):
+    return [i for i in range(len(text)) if text.startswith(pattern, i)]
+
+def test_find_pattern():
+    print("Testing find pattern on an online suffix tree... ", end='')
+
+    st = OnlineSuffixTree("GTAGT")
+    assert sorted(st.find_pattern("GT")) == [0, 3]
+    assert sorted(st.find_pattern("T")) == [1, 4]
+    assert st.find_pattern("GTAGT") == [0]
+    assert st.find_pattern("B") == []
+    assert st.find_pattern("") == []
+
+    st = OnlineSuffixTree("AAA")
+    assert sorted(st.find_pattern("A")) == [0, 1, 2]
+    assert sorted(st.find_pattern("AA")) == [0, 1]
+    assert st.find_pattern("AAAA") == []
+    assert st.count_pattern("A") == 3
+    assert st.count_pattern("AA") == 2
+    assert st.find_pattern("A", limit=1) == st.find_pattern("A")[:1]
+
+    print("Done")
+
+def test_extend():
+    print("Testing extending an online suffix tree... ", end='')
+
+    rng = random.Random(11)
+    for i in range(30):
+        # Cached results must not outlive an extend
+        cache = QueryCache(max_bytes=2000) if i % 2 else None
+        st = OnlineSuffixTree(cache=cache)
+        text = ""
+        for _ in range(10):
+            chunk = ''.join(rng.choice("AB" if rng.random() < 0.5 else "ACGT")
+                            for _ in range(rng.randint(0, 8)))
+            st.extend(chunk)
+            text += chunk
+            assert st.text == text
+            for _ in range(10):
+                start = rng.randrange(len(text) + 1)
+                pattern = text[start:start + rng.randint(1, 5)] or "A"
+                assert sorted(st.find_pattern(pattern)) == \
+                    brute_force(text, pattern)
+
+    print("Done")
+
+def test_periodic_text():
+    print("Testing suffixes without a leaf in periodic texts... ", end='')
+
+    # Most suffixes of such texts are implicit, their occurrences are
+    # found from the copy of the active point in the tree
+    rng = random.Random(5)
+    for period in ("A", "AB", "AAB", "ABCAB"):
+        st = OnlineSuffixTree()
+        text = ""
+        for _ in range(8):
+            chunk = period * rng.randint(0, 4) + period[:rng.randint(0, 2)]
+            st.extend(chunk)
+            text += chunk
+            for pattern in ("A", "AB", "BA", "AAA", "ABCA", period * 3):
+                assert sorted(st.find_pattern(pattern)) == \
+                    brute_force(text, pattern)
+                for k, edits in ((1, False), (1, True), (2, True)):
+                    end = len(pattern) + (k if edits else 0)
+                    expected = [(i, d) for i in range(len(text))
+                                for d in [approximate_distance(
+                                    pattern, text[i:i+end], k, edits)]
+                                if d is not None]
+                    assert st.find_pattern_approximate(pattern, k, edits) == \
+                        expected
+
+    print("Done")
+
+def test_no_suffix_array():
+    print("Testing methods needing a suffix array... ", end='')
+
+    st = OnlineSuffixTree("GTAGT")
+    # The joined text is kept until the next extend
+    assert st.text is st.text
+    st.extend("A")
+    assert st.text == "GTAGTA"
+    for method, argument in (("save_index", "index.bin"),
+                             ("find_patterns_parallel", ["GT"])):
+        try:
+            getattr(st, method)(argument)
+            assert False
+        except TypeError as e:
+            assert "not supported" in str(e)
+
+    print("Done")
+
+def test_matches_suffix_tree():
+    print("Testing online suffix tree with a terminal... ", end='')
+
+    st = OnlineSuffixTree("GTA")
+    st.extend("GT$")
+    assert st.remainder == 0
+    expected = SuffixTreeEfficient("GTAGT")
+    expected.create_suffix_tree()
+    for pattern in ["GT", "T", "AGT$", "$", "TAG"]:
+        assert sorted(st.find_pattern(pattern)) == \
+            sorted(expected.find_pattern(pattern))
+
+    print("Done")
+
+def test_find_pattern_approximate():
+    print("Testing approximate search on an online suffix tree... ", end='')
+
+    rng = random.Random(1)
+    for _ in range(20):
+        text = "".join(rng.choice("ACG") for _ in range(rng.randint(1, 60)))
+        st = OnlineSuffixTree(text)
+        expected = SuffixTreeEfficient(text)
+        expected.create_suffix_tree()
+        pattern = "".join(rng.choice("ACG") for _ in range(rng.randint(1, 5)))
+        for k in (0, 1, 2):
+            for edits in (False, True):
+                assert st.find_pattern_approximate(pattern, k, edits) == \
+                    expected.find_pattern_approximate(pattern, k, edits)
+
+    print("Done")
+
+def main():
+    test_find_pattern()
+    test_extend()
+    test_periodic_text()
+    test_no_suffix_array()
+    test_matches_suffix_tree()
+    test_find_pattern_approximate()
+
+if __name__ == "__main__":
+    main()
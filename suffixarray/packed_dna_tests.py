@@ -0,0 +1,85 @@
+import random
+
+from PackedDNA import PackedDNA
+from SuffixArrayEfficient import SuffixArrayEfficient
+from SuffixTreeEfficient import SuffixTreeEfficient
+
+def test_pack():
+    print("Testing packing DNA... ", end='')
+
+    text = "GATTACANNGATTACA$"
+    packed = PackedDNA("GATTA")
+    packed.extend("CANNGAT")
+    packed = packed + "TACA$"
+    assert len(packed) == len(text)
+    assert str(packed) == text
+    assert "".join(packed) == text
+    assert packed[0] == "G" and packed[7] == "N" and packed[-1] == "$"
+    assert packed[5:12] == text[5:12]
+    assert packed[3:] == text[3:]
+    assert len(packed.data) == 5
+    assert list(packed.exception_positions) == [7, 8, 16]
+    assert PackedDNA("")[0:3] == ""
+    assert list(PackedDNA("GATNTACAG").codes()) == [2, 0, 3, 0, 3, 0, 1, 0, 2]
+    assert list(PackedDNA("GATNTACAG").codes(3, 7)) == [0, 3, 0, 1]
+    assert PackedDNA("GATNTAG").characters() == set("AGNT")
+    assert PackedDNA("").characters() == set()
+
+    print("Done")
+
+def test_lcp():
+    print("Testing lcp of packed suffixes... ", end='')
+
+    rng = random.Random(7)
+    unit = "".join(rng.choice("ACGT") for _ in range(150))
+    text = unit + "N" + unit[:100] + "GATTACA" * 20 + unit + "$"
+    packed = PackedDNA(text)
+    for _ in range(500):
+        i, j = rng.randrange(len(text)), rng.randrange(len(text))
+        k = 0
+        while max(i, j) + k < len(text) and text[i+k] == text[j+k]:
+            k += 1
+        assert packed.lcp(i, j) == k
+    assert packed.lcp(0, 151, 50) == 100
+    assert packed.lcp(5, 0, 0, PackedDNA(unit[5:80] + "N")) == 75
+
+    print("Done")
+
+def test_structures():
+    print("Testing structures on packed DNA... ", end='')
+
+    text = "GATTACAGATNACAGGATTACA"
+    packed = PackedDNA(text)
+    assert SuffixArrayEfficient(packed).build_suffix_array_sais() == \
+        SuffixArrayEfficient(text).build_suffix_array_sais()
+
+    # The terminal is implied instead of copying the packed text
+    builder = SuffixArrayEfficient(packed, alpha="ACGNT")
+    assert builder.text is packed and builder.length == len(text) + 1
+    assert builder.build_suffix_array() == \
+        SuffixArrayEfficient(text, alpha="ACGNT").build_suffix_array()
+    try:
+        SuffixArrayEfficient(packed, alpha="ACGT").build_suffix_array_sais()
+        assert False
+    except ValueError:
+        pass
+
+    for compact in (False, True):
+        st = SuffixTreeEfficient(text, compact=compact)
+        packed_st = SuffixTreeEfficient(packed, compact=compact)
+        st.create_suffix_tree()
+        packed_st.create_suffix_tree()
+        assert packed_st.lcp_array == st.lcp_array
+        assert packed_st.display_tree() == st.display_tree()
+        for pattern in ["GATTACA", "A", "ACA", "ATN", "N", "GATC", ""]:
+            assert packed_st.find_pattern(pattern) == st.find_pattern(pattern)
+
+    print("Done")
+
+def main():
+    test_pack()
+    test_lcp()
+    test_structures()
+
+if __name__ == "__main__":
+    main()
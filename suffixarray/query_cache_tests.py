@@ -0,0 +1,71 @@
+from QueryCache import QueryCache, _size
+
+ENTRY = _size(1) + _size((1, 2))
+
+def test_lru():
+    print("Testing least recently used eviction... ", end='')
+
+    cache = QueryCache(max_bytes=3 * ENTRY)
+    for key in (1, 2, 3):
+        assert cache.put(key, (key, key))
+    assert cache.get(1) == (1, 1)
+    cache.put(4, (4, 4))
+    assert 2 not in cache
+    assert cache.get(2) is None
+    assert cache.get(2, "missing") == "missing"
+    assert [key in cache for key in (1, 3, 4)] == [True, True, True]
+    assert cache.bytes == 3 * ENTRY
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 1)
+
+    # Replacing an entry does not evict another one
+    cache.put(3, (5, 5))
+    assert len(cache) == 3 and cache.get(3) == (5, 5)
+
+    print("Done")
+
+def test_lfu():
+    print("Testing least frequently used eviction... ", end='')
+
+    cache = QueryCache(max_bytes=3 * ENTRY, policy="lfu")
+    for key in (1, 2, 3):
+        cache.put(key, (key, key))
+    for key in (1, 1, 2, 3):
+        cache.get(key)
+    cache.put(4, (4, 4))
+    # 2 and 3 were used as often, 2 less recently
+    assert 2 not in cache
+    cache.put(5, (5, 5))
+    assert 4 not in cache
+    assert [key in cache for key in (1, 3, 5)] == [True, True, True]
+    assert cache.evictions == 2
+
+    print("Done")
+
+def test_budget():
+    print("Testing the cache memory budget... ", end='')
+
+    cache = QueryCache(max_bytes=2 * ENTRY)
+    assert not cache.put(1, tuple(range(100)))
+    assert len(cache) == 0 and cache.bytes == 0
+    cache.put(1, (1, 1))
+    cache.put(2, (2, 2))
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+    assert cache.as_dict()["invalidations"] == 1
+
+    for policy, max_bytes in (("fifo", 10), ("lru", -1)):
+        try:
+            QueryCache(max_bytes, policy)
+            assert False
+        except ValueError:
+            pass
+
+    print("Done")
+
+def main():
+    test_lru()
+    test_lfu()
+    test_budget()
+
+if __name__ == "__main__":
+    main()
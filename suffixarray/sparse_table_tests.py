@@ -0,0 +1,34 @@
+import random
+
+from SparseTable import SparseTable
+
+def test_query():
+    print("Testing range minimum queries... ", end='')
+
+    table = SparseTable([3, 1, 4, 1, 5, 9, 2, 6])
+    assert table.query(0, 1) == 3
+    assert table.query(0, 8) == 1
+    assert table.query(4, 7) == 2
+    assert table.query(4, 6) == 5
+
+    rng = random.Random(5)
+    values = [rng.randint(0, 50) for _ in range(100)]
+    table = SparseTable(values)
+    for start in range(len(values)):
+        for end in range(start + 1, len(values) + 1):
+            assert table.query(start, end) == min(values[start:end])
+
+    for start, end in [(2, 2), (-1, 3), (0, 101)]:
+        try:
+            table.query(start, end)
+            assert False
+        except IndexError:
+            pass
+
+    print("Done")
+
+def main():
+    test_query()
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,12 @@ Contains source code for testing the implementation of
 the efficient construction algorithm for a suffix array
 """
 
-from SuffixArrayEfficient import SuffixArrayEfficient
+import mmap
+import tempfile
+from array import array
+
+from BuildStats import BuildStats
+from SuffixArrayEfficient import SuffixArrayEfficient, np
 
 def test_custom_alpha():
     print("Testing custom alphabet... ", end='')
@@ -12,6 +17,9 @@ def test_custom_alpha():
         "$ABCDEFGHIJKLMNOPQRSTUVWXYZ"
     assert SuffixArrayEfficient("").alpha == \
         "$ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    assert SuffixArrayEfficient("GATTACA", custom_alpha=True).alpha == "$ACGT"
+    assert SuffixArrayEfficient("b a").alpha == "$ ab"
+    assert SuffixArrayEfficient(b"GATTACA").alpha == ("$", 65, 67, 71, 84)
 
     print("Done")
 
@@ -37,17 +45,104 @@ def test_update_classes():
     assert new_classes == [3,4,3,4,2,1,0]
     print("Done")
 
-def test_build_suffix_arrray():
-    print("Testing build suffix array... ", end='')
+def test_build_suffix_arrray(backend="python"):
+    print("Testing build suffix array (" + backend + ")... ", end='')
 
-    assert SuffixArrayEfficient("ABABAA").build_suffix_array() == \
+    assert SuffixArrayEfficient("ABABAA", backend=backend).build_suffix_array() == \
         [6, 5, 4, 2, 0, 3, 1]
-    assert SuffixArrayEfficient("AAA").build_suffix_array() == [3,2,1,0]
-    assert SuffixArrayEfficient("GAC").build_suffix_array() == [3,1,2,0]
-    assert SuffixArrayEfficient("GAGAGAGA").build_suffix_array() == \
+    assert SuffixArrayEfficient("AAA", backend=backend).build_suffix_array() == \
+        [3,2,1,0]
+    assert SuffixArrayEfficient("GAC", backend=backend).build_suffix_array() == \
+        [3,1,2,0]
+    assert SuffixArrayEfficient("GAGAGAGA", backend=backend).build_suffix_array() == \
         [8,7,5,3,1,6,4,2,0]
-    assert SuffixArrayEfficient("AACGATAGCGGTAGA").build_suffix_array() == \
+    assert SuffixArrayEfficient("AACGATAGCGGTAGA", backend=backend).build_suffix_array() == \
         [15, 14, 0, 1, 12, 6, 4, 2, 8, 13, 3, 7, 9, 10, 11, 5]
+    assert SuffixArrayEfficient("", backend=backend).build_suffix_array() == [0]
+
+    # Texts longer than the alphabet
+    text = "THEQUICKBROWNFOXJUMPSOVERTHELAZYDOG"
+    expected = sorted(range(len(text) + 1), key=lambda i: text[i:] + "$")
+    assert SuffixArrayEfficient(text, backend=backend).build_suffix_array() == \
+        expected
+
+    print("Done")
+
+def test_build_suffix_array_sais():
+    print("Testing build suffix array with SA-IS... ", end='')
+
+    assert SuffixArrayEfficient("ABABAA").build_suffix_array_sais() == \
+        [6, 5, 4, 2, 0, 3, 1]
+    assert SuffixArrayEfficient("AAA").build_suffix_array_sais() == [3,2,1,0]
+    assert SuffixArrayEfficient("GAC").build_suffix_array_sais() == [3,1,2,0]
+    assert SuffixArrayEfficient("").build_suffix_array_sais() == [0]
+    assert SuffixArrayEfficient("AACGATAGCGGTAGA").build_suffix_array_sais() == \
+        [15, 14, 0, 1, 12, 6, 4, 2, 8, 13, 3, 7, 9, 10, 11, 5]
+
+    for text in ["MISSISSIPPI", "ABRACADABRA" * 7, "GATTACA" * 11, "A" * 100]:
+        suff = SuffixArrayEfficient(text)
+        assert suff.build_suffix_array_sais() == suff.build_suffix_array()
+
+    print("Done")
+
+def test_build_suffix_array_parallel():
+    print("Testing build suffix array with worker processes... ", end='')
+
+    assert SuffixArrayEfficient("ABABAA").build_suffix_array_parallel(2) == \
+        [6, 5, 4, 2, 0, 3, 1]
+    assert SuffixArrayEfficient("").build_suffix_array_parallel(2) == [0]
+
+    for text in ["MISSISSIPPI", "ABRACADABRA" * 7, "GATTACA" * 11, "A" * 100]:
+        suff = SuffixArrayEfficient(text)
+        assert suff.build_suffix_array_parallel(3) == suff.build_suffix_array()
+
+    print("Done")
+
+def test_build_from_sequences():
+    print("Testing build suffix array from sequences... ", end='')
+
+    text = b"GATTACA\x00GATTACA"
+    expected = sorted(range(len(text) + 1), key=lambda i: list(text[i:]) + [-1])
+    for sequence in (text, bytearray(text), memoryview(text),
+                     array("i", list(text)), list(text)):
+        suff = SuffixArrayEfficient(sequence)
+        assert suff.build_suffix_array() == expected
+        assert suff.build_suffix_array_sais() == expected
+
+    with tempfile.TemporaryFile() as f:
+        f.write(text)
+        f.flush()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        suff = SuffixArrayEfficient(mm)
+        assert suff.build_suffix_array_sais() == expected
+        suff.text.release()
+        mm.close()
+
+    assert SuffixArrayEfficient([7, -1, 7, 10**12]).build_suffix_array() == \
+        [4, 1, 0, 2, 3]
+
+    # A str alphabet is taken as code points
+    suff = SuffixArrayEfficient(text, alpha="$\x00ACGT")
+    assert suff.alpha == ("$", 0, 65, 67, 71, 84)
+    assert suff.build_suffix_array_sais() == expected
+    for sequence in (text, [0, 65, 1]):
+        try:
+            SuffixArrayEfficient(sequence, alpha="ACGT").build_suffix_array()
+            assert False
+        except ValueError:
+            pass
+
+    print("Done")
+
+def test_build_stats():
+    print("Testing build statistics... ", end='')
+
+    stats = BuildStats()
+    suff = SuffixArrayEfficient("ABABAA", stats=stats)
+    assert suff.build_suffix_array() == [6, 5, 4, 2, 0, 3, 1]
+    assert set(stats.phases) == {"sort_characters", "doubling"}
+    assert stats.counters["doubling_rounds"] == 3
+    assert stats.counters["suffix_array_bytes"] > 0
 
     print("Done")
 
@@ -57,6 +152,12 @@ def main():
     test_compute_character_classes()
     test_update_classes()
     test_build_suffix_arrray()
+    if np is not None:
+        test_build_suffix_arrray("numpy")
+    test_build_suffix_array_sais()
+    test_build_suffix_array_parallel()
+    test_build_from_sequences()
+    test_build_stats()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+from SuffixArrayIndex import SuffixArrayIndex
+from SuffixTreeEfficient import SuffixTreeEfficient
+
+def test_save_and_open():
+    print("Testing saving and opening an index... ", end='')
+
+    st = SuffixTreeEfficient("AACGATAGCGGTAGA")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.sa")
+        st.save_index(path)
+        with SuffixArrayIndex.open(path) as index:
+            assert index.terminal == "$"
+            assert index.alpha == "$ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+            assert index.int_width == 4
+            assert len(index) == 16
+            assert bytes(index.text) == b"AACGATAGCGGTAGA$"
+            assert list(index.suffix_array) == st.suffix_array
+            assert list(index.lcp_array) == st.lcp_array
+
+    print("Done")
+
+def test_from_bytes():
+    print("Testing reading an index from a buffer... ", end='')
+
+    data = SuffixArrayIndex.to_bytes("A$", [1, 0], [0])
+    assert len(data) % 8 == 0
+    index = SuffixArrayIndex(data)
+    assert bytes(index.text) == b"A$"
+    assert list(index.suffix_array) == [1, 0]
+    assert list(index.lcp_array) == [0]
+    index.close()
+
+    try:
+        SuffixArrayIndex(b"NOPE" + data[4:])
+        assert False
+    except ValueError:
+        pass
+
+    print("Done")
+
+def test_open_invalid():
+    print("Testing opening invalid indexes... ", end='')
+
+    data = SuffixArrayIndex.to_bytes("GATTACA$", [7, 6, 4, 1, 5, 0, 3, 2],
+                                     [0, 1, 1, 0, 0, 0, 1])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.sa")
+        # The mmap is closed when reading fails, otherwise closing it
+        # with views left on it would raise a BufferError instead
+        for invalid in (b"NOPE" + data[4:], data[:-8], data[:10]):
+            with open(path, "wb") as f:
+                f.write(invalid)
+            try:
+                SuffixArrayIndex.open(path)
+                assert False
+            except ValueError:
+                pass
+
+    print("Done")
+
+def test_write():
+    print("Testing writing an index into a buffer... ", end='')
+
+    st = SuffixTreeEfficient("AACGATAGCGGTAGA")
+    args = (st.text, st.suffix_array, st.lcp_array, st.terminal, st.alpha)
+    data = SuffixArrayIndex.to_bytes(*args)
+    size = SuffixArrayIndex.size(len(st.text), len(st.lcp_array),
+                                 st.terminal, st.alpha)
+    assert size == len(data)
+    buffer = bytearray(b"x" * (size + 5))
+    assert SuffixArrayIndex.write(buffer, *args) == size
+    assert buffer[:size] == data and buffer[size:] == b"x" * 5
+
+    try:
+        SuffixArrayIndex.write(bytearray(size - 1), *args)
+        assert False
+    except ValueError:
+        pass
+
+    print("Done")
+
+def main():
+    test_save_and_open()
+    test_from_bytes()
+    test_open_invalid()
+    test_write()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+
+from SuffixArrayIndex import SuffixArrayIndex
+from SuffixArraySearch import SuffixArraySearch
+from SuffixTreeEfficient import SuffixTreeEfficient
+
+def test_find_pattern():
+    print("Testing find pattern on a suffix array... ", end='')
+
+    sa = SuffixArraySearch.from_text("GTAGT")
+    assert sa.find_pattern("B") == []
+    assert sa.find_pattern("GTAGT") == [0]
+    assert sa.find_pattern("$") == [5]
+    assert sa.find_pattern("TAGT") == [1]
+    assert sa.find_pattern("GT") == [3, 0]
+    assert sa.find_pattern("G") == [3, 0]
+    assert sa.find_pattern("T") == [4, 1]
+    assert sa.find_pattern("GTAGTA") == []
+    assert sa.find_range("GT") == (2, 4)
+
+    sa = SuffixArraySearch.from_text("A")
+    assert sa.find_pattern("A") == [0]
+    assert sa.find_pattern("") == []
+    assert sa.find_pattern("AA") == []
+
+    print("Done")
+
+def test_matches_suffix_tree():
+    print("Testing suffix array search against the suffix tree... ", end='')
+
+    rng = random.Random(7)
+    for n in (1, 2, 3, 10, 60, 300):
+        text = ''.join(rng.choice("ACGT") for _ in range(n))
+        st = SuffixTreeEfficient(text)
+        st.create_suffix_tree()
+        sa = SuffixArraySearch(st.text, st.suffix_array, st.lcp_array,
+                               st.alpha)
+        for _ in range(50):
+            start = rng.randrange(n)
+            pattern = text[start:start + rng.randint(1, 6)]
+            assert sa.find_pattern(pattern) == st.find_pattern(pattern)
+            pattern = ''.join(rng.choice("ACGT") for _ in range(rng.randint(1, 4)))
+            assert sa.find_pattern(pattern) == st.find_pattern(pattern)
+
+    print("Done")
+
+def test_characters_below_terminal():
+    print("Testing characters sorting below the terminal... ", end='')
+
+    sa = SuffixArraySearch.from_text(" A ")
+    assert sorted(sa.find_pattern(" ")) == [0, 2]
+
+    # The suffix array puts the terminal first, before space, ! and #
+    rng = random.Random(8)
+    for _ in range(200):
+        alpha = rng.choice((" A", "! #", " !#AB"))
+        text = ''.join(rng.choice(alpha) for _ in range(rng.randint(1, 30)))
+        sa = SuffixArraySearch.from_text(text)
+        for _ in range(10):
+            pattern = ''.join(rng.choice(" !#AB")
+                              for _ in range(rng.randint(1, 3)))
+            expected = [i for i in range(len(text))
+                        if text.startswith(pattern, i)]
+            assert sorted(sa.find_pattern(pattern)) == expected
+
+    print("Done")
+
+def test_find_pattern_on_index():
+    print("Testing find pattern on a memory-mapped index... ", end='')
+
+    st = SuffixTreeEfficient("AAA")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.sa")
+        st.save_index(path)
+        with SuffixArrayIndex.open(path) as index:
+            sa = SuffixArraySearch.from_index(index)
+            assert sa.find_patterns(["AAA", "B", "A", "AA", "é€"]) == \
+                [[0], [], [2, 1, 0], [1, 0], []]
+
+    print("Done")
+
+def main():
+    test_find_pattern()
+    test_matches_suffix_tree()
+    test_characters_below_terminal()
+    test_find_pattern_on_index()
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import io
+import json
+import random
+
+from BuildStats import BuildStats
+from QueryCache import QueryCache
 from SuffixTreeEfficient import SuffixTreeEfficient
 
 def test_compute_lcp_array():
@@ -6,30 +12,55 @@ def test_compute_lcp_array():
     assert sufftree.lcp_array == [0, 1, 1, 3, 0, 2]
     print("Done")
 
-def test_create_suffix_tree():
-    print("Testing creating a suffix tree... ", end='')
+def test_lcp():
+    print("Testing lcp of any two suffixes... ", end='')
+
+    st = SuffixTreeEfficient("ABABAA")
+    assert st.lcp(0, 2) == 3
+    assert st.lcp(2, 0) == 3
+    assert st.lcp(1, 3) == 2
+    assert st.lcp(0, 1) == 0
+    assert st.lcp(4, 4) == 3
+    assert st.lcp(6, 5) == 0
 
-    st = SuffixTreeEfficient("AAA")
+    text = "ABRACADABRA" * 5 + "A" * 40
+    st = SuffixTreeEfficient(text)
+    S = st.text
+    for i in range(0, len(S), 3):
+        for j in range(0, len(S), 5):
+            k = 0
+            while max(i, j) + k < len(S) and S[i+k] == S[j+k]:
+                k += 1
+            assert st.lcp(i, j) == k
+
+    print("Done")
+
+def test_create_suffix_tree(compact=False):
+    print("Testing creating a" + (" compact" if compact else "") +
+          " suffix tree... ", end='')
+
+    st = SuffixTreeEfficient("AAA", compact=compact)
     st.create_suffix_tree()
     rep = repr(st.display_tree())
     assert rep == repr('$\nA\n\t$\n\tA\n\t\t$\n\t\tA')
 
-    st = SuffixTreeEfficient("A")
+    st = SuffixTreeEfficient("A", compact=compact)
     st.create_suffix_tree()
     rep = repr(st.display_tree())
     assert rep == repr('$\nA')
 
-    st = SuffixTreeEfficient("GTAGT")
+    st = SuffixTreeEfficient("GTAGT", compact=compact)
     st.create_suffix_tree()
     rep = repr(st.display_tree())
     assert rep == repr('$\nAGT$\nGT\n\t$\n\tAGT$\nT\n\t$\n\tAGT')
 
     print("Done")
 
-def test_find_pattern():
-    print("Testing find pattern... ", end='')
+def test_find_pattern(compact=False):
+    print("Testing find pattern" + (" (compact)" if compact else "") +
+          "... ", end='')
 
-    st = SuffixTreeEfficient("GTAGT")
+    st = SuffixTreeEfficient("GTAGT", compact=compact)
     st.create_suffix_tree()
     assert st.find_pattern("B") == []
     assert st.find_pattern("GTAGT") == [0]
@@ -44,26 +75,238 @@ def test_find_pattern():
     assert st.find_pattern("A") == [2]
     assert st.find_pattern("T") == [4, 1]
 
-    st = SuffixTreeEfficient("AAA")
+    st = SuffixTreeEfficient("AAA", compact=compact)
     st.create_suffix_tree()
     assert st.find_pattern("AAA") == [0]
     assert st.find_pattern("B") == []
     assert st.find_pattern("A") == [2, 1, 0]
     assert st.find_pattern("AA") == [1, 0]
 
-    st = SuffixTreeEfficient("A")
+    st = SuffixTreeEfficient("A", compact=compact)
     st.create_suffix_tree()
     assert st.find_pattern("A") == [0]
     assert st.find_pattern("") == []
     assert st.find_pattern("B") == []
     assert st.find_pattern("AA") == []
 
+    # Edges are followed by the alphabet codes of their first characters,
+    # including characters ordered before the terminal
+    rng = random.Random(3)
+    for alpha in ("ACGT", " !#AB", "GODCAT"):
+        text = "".join(rng.choices(alpha, k=rng.randint(1, 40)))
+        st = SuffixTreeEfficient(text, compact=compact, alpha=alpha)
+        st.create_suffix_tree()
+        for _ in range(20):
+            start = rng.randrange(len(text))
+            for pattern in (text[start:start + rng.randint(1, 4)],
+                            "".join(rng.choices(alpha + "Z", k=2))):
+                expected = [i for i in range(len(text))
+                            if text.startswith(pattern, i)]
+                assert sorted(st.find_pattern(pattern)) == expected
+
+    print("Done")
+
+def test_count_pattern(compact=False):
+    print("Testing count pattern" + (" (compact)" if compact else "") +
+          "... ", end='')
+
+    st = SuffixTreeEfficient("GTAGT", compact=compact)
+    st.create_suffix_tree()
+    assert st.count_pattern("GT") == 2
+    assert st.count_pattern("GTAGT") == 1
+    assert st.count_pattern("T") == 2
+    assert st.count_pattern("$") == 1
+    assert st.count_pattern("B") == 0
+    assert st.count_pattern("") == 0
+
+    # Deep trees are walked without recursion
+    st = SuffixTreeEfficient("A" * 3000, compact=compact)
+    st.create_suffix_tree()
+    assert st.count_pattern("A") == 3000
+    assert st.count_pattern("A" * 2000) == 1001
+    assert len(st.find_pattern("A")) == 3000
+
+    print("Done")
+
+def test_find_pattern_lazily(compact=False):
+    print("Testing iterating over a pattern" + (" (compact)" if compact else "") +
+          "... ", end='')
+
+    st = SuffixTreeEfficient("GTAGTAGT", compact=compact)
+    st.create_suffix_tree()
+    assert list(st.iter_pattern("GT")) == st.find_pattern("GT")
+    assert st.find_pattern("GT", limit=2) == st.find_pattern("GT")[:2]
+    assert st.find_pattern("GT", limit=0) == []
+    assert list(st.iter_pattern("C")) == []
+
+    occurrences = st.iter_pattern("TAGT")
+    assert next(occurrences) in (1, 4)
+
+    print("Done")
+
+def test_find_pattern_cached(compact=False):
+    print("Testing cached pattern search" + (" (compact)" if compact else "") +
+          "... ", end='')
+
+    cache = QueryCache()
+    st = SuffixTreeEfficient("GTAGTAGT", compact=compact, cache=cache)
+    st.create_suffix_tree()
+
+    # A limited search of an uncached pattern bypasses the cache
+    assert len(st.find_pattern("GT", limit=1)) == 1
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+    expected = st.find_pattern("GT")
+    assert sorted(expected) == [0, 3, 6]
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # Results are copies of the cached ones
+    found = st.find_pattern("GT")
+    found.append(10)
+    assert st.find_pattern("GT") == expected
+    assert st.find_pattern("GT", limit=1) == expected[:1]
+    assert st.find_pattern_approximate("GAA", 1) == [(0, 1), (3, 1)]
+    assert st.find_pattern_approximate("GAA", 1) == [(0, 1), (3, 1)]
+    assert (cache.hits, cache.misses) == (4, 2)
+
+    st.create_suffix_tree()
+    assert len(cache) == 0 and cache.invalidations == 2
+    assert st.find_pattern("GT") == expected
+
+    print("Done")
+
+def edit_distance_to_prefix(pattern, text):
+    """ Fewest edits between pattern and any prefix of text """
+    row = list(range(len(pattern) + 1))
+    best = row[-1]
+    for c in text:
+        new = [row[0] + 1]
+        for i in range(1, len(pattern) + 1):
+            new.append(min(row[i-1] + (pattern[i-1] != c), row[i] + 1,
+                           new[i-1] + 1))
+        row = new
+        best = min(best, row[-1])
+    return best
+
+def test_find_pattern_approximate(compact=False):
+    print("Testing approximate pattern search" +
+          (" (compact)" if compact else "") + "... ", end='')
+
+    st = SuffixTreeEfficient("GTAGTAGT", compact=compact)
+    st.create_suffix_tree()
+    assert st.find_pattern_approximate("GAA", 1) == [(0, 1), (3, 1)]
+    assert st.find_pattern_approximate("GAA", 0) == []
+    assert st.find_pattern_approximate("GTA", 0) == [(0, 0), (3, 0)]
+    assert st.find_pattern_approximate("GTTAG", 1) == []
+    assert st.find_pattern_approximate("GTTAG", 1, edits=True) == \
+        [(0, 1), (3, 1)]
+    assert st.find_pattern_approximate("", 2) == []
+    try:
+        st.find_pattern_approximate("GT", -1)
+        assert False
+    except ValueError:
+        pass
+
+    rng = random.Random(0)
+    text = "".join(rng.choice("ACGT") for _ in range(200))
+    st = SuffixTreeEfficient(text, compact=compact)
+    st.create_suffix_tree()
+    for _ in range(20):
+        pattern = "".join(rng.choice("ACGT") for _ in range(rng.randint(1, 8)))
+        k = rng.randint(0, 2)
+        expected = []
+        for i in range(len(text) - len(pattern) + 1):
+            mismatches = sum(1 for a, b in zip(pattern, text[i:]) if a != b)
+            if mismatches <= k:
+                expected.append((i, mismatches))
+        assert st.find_pattern_approximate(pattern, k) == expected
+
+        expected = []
+        for i in range(len(text)):
+            distance = edit_distance_to_prefix(pattern,
+                                               text[i:i+len(pattern)+k])
+            if distance <= k:
+                expected.append((i, distance))
+        assert st.find_pattern_approximate(pattern, k, edits=True) == expected
+
+    print("Done")
+
+def test_export(compact=False):
+    print("Testing export" + (" (compact)" if compact else "") + "... ", end='')
+
+    st = SuffixTreeEfficient("GTAGT", compact=compact)
+    st.create_suffix_tree()
+    out = io.StringIO()
+    st.export(out)
+    assert out.getvalue() == '$\nAGT$\nGT\n\t$\n\tAGT$\nT\n\t$\n\tAGT$\n'
+
+    out = io.StringIO()
+    st.export(out, "text", max_label=2)
+    assert out.getvalue().split("\n")[1] == "AG..."
+
+    out = io.StringIO()
+    st.export(out, "dot")
+    lines = out.getvalue().split("\n")
+    assert lines[0] == "digraph suffix_tree {" and lines[-2] == "}"
+    assert sum(1 for line in lines if "->" in line) == 8
+    assert sum(1 for line in lines if "shape=box" in line) == 6
+
+    out = io.StringIO()
+    st.export(out, "jsonl")
+    nodes = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(nodes) == 8
+    assert sorted(node["occurs"] for node in nodes
+                  if node["occurs"] is not None) == [0, 1, 2, 3, 4, 5]
+    ids = {node["id"] for node in nodes} | {0}
+    assert all(node["parent"] in ids for node in nodes)
+
+    # Deep trees are exported without recursion
+    st = SuffixTreeEfficient("A" * 2000, compact=compact)
+    st.create_suffix_tree()
+    out = io.StringIO()
+    st.export(out, "jsonl")
+    assert len(out.getvalue().splitlines()) == 2 * 2001 - 2
+
+    print("Done")
+
+def test_build_stats(compact=False):
+    print("Testing build statistics" + (" (compact)" if compact else "") +
+          "... ", end='')
+
+    events = []
+    stats = BuildStats(lambda stats, kind, name, value: events.append((kind, name)))
+    st = SuffixTreeEfficient("GTAGT", compact=compact, stats=stats)
+    st.create_suffix_tree()
+    assert set(stats.phases) == {"sais", "lcp_array", "tree"}
+    assert stats.counters["nodes"] == 9
+    assert stats.counters["leaves"] == 6
+    assert stats.counters["edge_breaks"] == 2
+    assert stats.counters["sais_levels"] == 1
+    assert stats.counters["tree_bytes"] > 0
+    assert ("phase", "tree") in events and ("counter", "nodes") in events
+    assert st.find_pattern("GT") == [3, 0]
+
     print("Done")
 
 def main():
     test_compute_lcp_array()
+    test_lcp()
     test_create_suffix_tree()
     test_find_pattern()
+    test_create_suffix_tree(compact=True)
+    test_find_pattern(compact=True)
+    test_count_pattern()
+    test_count_pattern(compact=True)
+    test_find_pattern_lazily()
+    test_find_pattern_lazily(compact=True)
+    test_find_pattern_cached()
+    test_find_pattern_cached(compact=True)
+    test_find_pattern_approximate()
+    test_find_pattern_approximate(compact=True)
+    test_export()
+    test_export(compact=True)
+    test_build_stats()
+    test_build_stats(compact=True)
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,45 @@
+import json
+import struct
+import sys
 from abc import ABC, abstractmethod
+from array import array
 
-import json
+from DictStorage import DictStorage
+from DoubleArray import DoubleArray
 
 class BaseTrie(ABC):
 
-    def __init__(self, terminal='$'):
+    EXPORT_FORMATS = ("text", "dot", "jsonl")
+
+    # Maps a label to the key a DoubleArray gives its code to, None for
+    # the label itself. Tries with labels of several characters key them
+    # by their first one, so codes stay as few as the characters
+    _label_key = None
+
+    # Saved tries start with magic, version, flags and the length of the
+    # JSON metadata that follows, see save
+    MAGIC = b"TRIE"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHBxI")
+    DOUBLE_ARRAY = 1
+
+    def __init__(self, terminal='$', double_array=False):
+        """
+        By default the trie is a DictStorage, a dict of dicts node ->
+        {label: child}. With double_array the transitions are packed into
+        the integer arrays of a DoubleArray instead, which takes a
+        fraction of the memory. Both have the same methods, which the
+        accessors below call without checking which one self.tree is
+        """
         self.id = 0
+        # Ids of removed nodes, handed out again by _new_id
+        self._free_ids = []
         self.terminal = terminal
         self.root = self.id
-        self.tree = {self.root: {} }
+        self.double_array = double_array
+        self.tree = DoubleArray(self._label_key) if double_array \
+            else DictStorage()
+        self.tree.add_node(self.root)
         self._build_trie()
 
     def __str__(self):
@@ -38,25 +69,147 @@ class BaseTrie(ABC):
         targets = []
         all_nodes = self._get_nodes()
         for node in all_nodes:
-            if self._contains_symbol(node, label):
+            if any(self._label_equals(l, label) for l in self._get_labels(node)):
                 targets.append(node)
         return targets
 
     def _get_nodes(self):
-        return self.tree.keys()
+        return self.tree.nodes()
 
     def _contains_symbol(self, curr, symbol):
-        return symbol in self.tree[curr]
+        return self.tree.has_child(curr, symbol)
 
     def print_trie(self):
-        self._print_trie_helper([self.root], "")
+        self.export(sys.stdout)
+
+    def export(self, out, format="text"):
+        """
+        Writes the trie to the file-like out one edge at a time, in depth
+        first order, as
+        - "text": parent->child:label indented by depth, as print_trie
+          shows it
+        - "dot": a graphviz digraph
+        - "jsonl": one JSON object per edge with the parent, child and label
+        """
+        if format not in self.EXPORT_FORMATS:
+            raise ValueError("Unknown export format: " + str(format))
+        if format == "dot":
+            out.write("digraph trie {\n")
+        for depth, curr, child, label in self._iter_edges():
+            label = self._label_text(label)
+            if format == "text":
+                out.write("\t" * depth + str(curr) + "->" + str(child) + ":" +
+                          label + "\n")
+            elif format == "dot":
+                out.write("  " + str(curr) + " -> " + str(child) + " [label=" +
+                          json.dumps(label, ensure_ascii=False) + "];\n")
+            else:
+                out.write(json.dumps({"parent": curr, "child": child,
+                                      "label": label}) + "\n")
+        if format == "dot":
+            out.write("}\n")
+
+    def save(self, path):
+        """
+        Writes the trie to path in a binary format. The header is followed
+        by JSON metadata (class, terminal, labels and the list of arrays),
+        then by flat little-endian arrays written one after another:
+        those of self.tree, see DictStorage.to_arrays and
+        DoubleArray.to_arrays, then those of the subclass, see
+        _extra_state
+        """
+        labels, arrays = self.tree.to_arrays(self.id + 1)
+        state, extra = self._extra_state()
+        arrays.update(extra)
+        metadata = json.dumps({
+            "class": type(self).__name__,
+            "terminal": self.terminal,
+            "id": self.id,
+            "labels": labels,
+            "arrays": [[name, values.typecode, len(values)]
+                       for name, values in arrays.items()],
+            "state": state,
+        }).encode()
+        flags = self.DOUBLE_ARRAY if self.double_array else 0
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, flags,
+                                     len(metadata)))
+            f.write(metadata)
+            for values in arrays.values():
+                if sys.byteorder != "little":
+                    values = array(values.typecode, values)
+                    values.byteswap()
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a trie written by save with the same class, reading every
+        array in bulk instead of inserting the nodes one by one
+        """
+        with open(path, "rb") as f:
+            magic, version, flags, length = cls.HEADER.unpack(
+                f.read(cls.HEADER.size))
+            if magic != cls.MAGIC:
+                raise ValueError("Not a saved trie")
+            if version != cls.VERSION:
+                raise ValueError("Unsupported trie version: " + str(version))
+            metadata = json.loads(f.read(length).decode())
+            if metadata["class"] != cls.__name__:
+                raise ValueError("Saved trie is a " + metadata["class"])
+            arrays = {}
+            for name, typecode, size in metadata["arrays"]:
+                values = array(typecode)
+                values.fromfile(f, size)
+                if sys.byteorder != "little":
+                    values.byteswap()
+                arrays[name] = values
+
+        trie = cls.__new__(cls)
+        trie.id = metadata["id"]
+        trie.terminal = metadata["terminal"]
+        trie.root = 0
+        trie.double_array = bool(flags & cls.DOUBLE_ARRAY)
+        # JSON has no tuples, offset labels come back as lists
+        labels = [tuple(label) if isinstance(label, list) else label
+                  for label in metadata["labels"]]
+        if trie.double_array:
+            trie.tree = DoubleArray.from_arrays(labels, arrays,
+                                                trie._label_key)
+        else:
+            trie.tree = DictStorage.from_arrays(labels, arrays)
+        trie._free_ids = [node for node in range(trie.id, 0, -1)
+                          if not trie.tree.has_node(node)]
+        trie._restore_extra_state(metadata["state"], arrays)
+        return trie
+
+    def _extra_state(self):
+        """
+        Returns the JSON state and the named arrays a subclass needs
+        saved along with the tree
+        """
+        return {}, {}
+
+    def _restore_extra_state(self, state, arrays):
+        """ Restores what _extra_state returned when the trie is loaded """
+        pass
 
-    def _print_trie_helper(self, history, space):
-        curr = history.pop(0)
-        for l in self.tree[curr]:
-            print(space + str(curr) + "->" + str(self.tree[curr][l]) + ":" + l)
-            history.append(self.tree[curr][l])
-            self._print_trie_helper(history, space +"\t")
+    def _iter_edges(self):
+        """
+        Yields (depth, parent, child, label) for every edge in depth first
+        order, keeping one iterator over the labels of every node on the
+        current path instead of recursing
+        """
+        path = [(self.root, iter(self._get_labels(self.root)))]
+        while len(path) != 0:
+            curr, labels = path[-1]
+            label = next(labels, None)
+            if label is None:
+                path.pop()
+                continue
+            child = self._get_node_by_label(curr, label)
+            yield len(path) - 1, curr, child, label
+            path.append((child, iter(self._get_labels(child))))
 
     def all_paths_to_label(self, label):
         ps_to_l = []
@@ -74,12 +227,27 @@ class BaseTrie(ABC):
                 else:
                     paths.append(curr_path + "," + str(next_node))
 
-                if l == label:
+                if self._label_equals(l, label):
                     ps_to_l.append( paths[-1])
         return ps_to_l
 
+    def _label_text(self, label, length=None):
+        """
+        Returns the string of an edge label, or only its first length
+        characters. Labels are strings unless a subclass says otherwise
+        """
+        return label if length is None else label[:length]
+
+    def _label_length(self, label):
+        return len(label)
+
+    def _label_equals(self, label, text):
+        """ Whether an edge label reads text, without reading longer ones """
+        return self._label_length(label) == len(text) and \
+            self._label_text(label) == text
+
     def _get_labels(self, node):
-        return list(self.tree[node])
+        return self.tree.get_labels(node)
 
     def _get_node_label(self, src, dest):
         for label in self._get_labels(src):
@@ -87,6 +255,12 @@ class BaseTrie(ABC):
                 return label
 
     def _new_id(self):
+        """
+        Returns an id for a new node, the last removed one if any so ids
+        stay below the largest number of nodes the trie has held
+        """
+        if self._free_ids:
+            return self._free_ids.pop()
         self.id += 1
         return self.id
 
@@ -115,7 +289,7 @@ class BaseTrie(ABC):
 
     def _get_node_by_label(self, node, label):
         """ Returns the child for a given node's label """
-        return self.tree[node][label]
+        return self.tree.get_child(node, label)
 
     def make_branch_label_from_path(self, path, target_label):
         label = ""
@@ -124,7 +298,7 @@ class BaseTrie(ABC):
         for p in path:
             if p != 'None':
                 new_node_label = self._get_node_label(curr, int(p))
-                label += new_node_label
+                label += self._label_text(new_node_label)
                 curr = self._get_node_by_label(curr, new_node_label)
         return label
 
@@ -136,14 +310,14 @@ class BaseTrie(ABC):
             for label in self._get_labels(curr_node):
                 next_node = self._get_node_by_label(curr_node, label)
                 if self._number_children(next_node) == 0:
-                    leaf_labels.append(label)
+                    leaf_labels.append(self._label_text(label))
                 else:
                     to_explore.append(next_node)
 
         return leaf_labels
 
     def _number_children(self, node):
-        return len(self.tree[node])
+        return self.tree.number_children(node)
 
     def get_leaf_labels_from_node(self, node):
         leaf_nodes = []
@@ -154,7 +328,7 @@ class BaseTrie(ABC):
             for label in self._get_labels(curr_node):
                 next_node = self._get_node_by_label(curr_node, label)
                 if self._number_children(next_node) == 0:
-                    leaf_nodes.append(label)
+                    leaf_nodes.append(self._label_text(label))
                 else:
                     to_explore.append(next_node)
 
@@ -168,28 +342,29 @@ class BaseTrie(ABC):
             for label in self._get_labels(curr_node):
                 next_node = self._get_node_by_label(curr_node, label)
                 if self._number_children(next_node) != 0:
-                    inner_labels.append(label)
+                    inner_labels.append(self._label_text(label))
                     to_explore.append(next_node)
         return inner_labels
 
     def _insert_new_node(self, node):
-        """ Creates a new int:{} entry in the trie """
-        self.tree[node] = dict()
+        """ Creates a new node without children in the trie """
+        self.tree.add_node(node)
 
     def _contains_node(self, node):
-        return node in self.tree
+        return self.tree.has_node(node)
 
     def _set_node_by_label(self, node, label, newchild):
         """ Sets the child for a node's label """
-        self.tree[node][label] = newchild
+        self.tree.set_child(node, label, newchild)
 
     def _remove_node(self, node):
-        del self.tree[node]
+        self.tree.remove_node(node)
+        self._free_ids.append(node)
 
     def _unlink(self, node, label):
         """ Removes the child of the node and its associated label """
-        del self.tree[node][label]
+        self.tree.unlink(node, label)
 
     def _link(self, parent, grandchild, new_label):
         """ Adds a new_label to a node and links it to another node """
-        self.tree[parent][new_label] = grandchild
+        self._set_node_by_label(parent, new_label, grandchild)
@@ -0,0 +1,79 @@
+"""
+Dict backed storage for the transitions of a trie, the default one. The
+storage is itself the dict of dicts node -> {label: child}, with the
+methods of DoubleArray so BaseTrie can use either without checking which
+"""
+
+from array import array
+
+class DictStorage(dict):
+
+    def nodes(self):
+        return self.keys()
+
+    def has_node(self, node):
+        return node in self
+
+    def add_node(self, node):
+        """ Adds a node without children, clearing it if it was there """
+        self[node] = {}
+
+    def remove_node(self, node):
+        del self[node]
+
+    def get_child(self, node, label):
+        return self[node][label]
+
+    def has_child(self, node, label):
+        return label in self[node]
+
+    def get_labels(self, node):
+        return list(self[node])
+
+    def number_children(self, node):
+        return len(self[node])
+
+    def set_child(self, node, label, child):
+        self[node][label] = child
+
+    def unlink(self, node, label):
+        del self[node][label]
+
+    def to_arrays(self, size):
+        """
+        Returns the labels and the named arrays BaseTrie.save writes for
+        nodes below size: present[node], then the edges of every node as
+        one run of label indices and one of children, starting at
+        offsets[node]
+        """
+        codes, labels = {}, []
+        present = array("B", [0]) * size
+        offsets = array("i", [0]) * (size + 1)
+        edge_labels, edge_children = array("i"), array("i")
+        for node in range(size):
+            if node in self:
+                present[node] = 1
+                for label, child in self[node].items():
+                    if label not in codes:
+                        codes[label] = len(labels)
+                        labels.append(label)
+                    edge_labels.append(codes[label])
+                    edge_children.append(child)
+            offsets[node + 1] = len(edge_children)
+        return labels, {"present": present, "offsets": offsets,
+                        "edge_labels": edge_labels,
+                        "edge_children": edge_children}
+
+    @classmethod
+    def from_arrays(cls, labels, arrays):
+        """ Rebuilds the storage from what to_arrays returned """
+        offsets = arrays["offsets"]
+        edge_labels = [labels[code] for code in arrays["edge_labels"]]
+        edge_children = arrays["edge_children"].tolist()
+        storage = cls()
+        for node in range(len(arrays["present"])):
+            if arrays["present"][node]:
+                start, end = offsets[node], offsets[node + 1]
+                storage[node] = dict(zip(edge_labels[start:end],
+                                         edge_children[start:end]))
+        return storage
@@ -0,0 +1,358 @@
+"""
+Array backed storage for the transitions of a trie. Instead of a dict
+per node, the transitions of all nodes are packed into flat integer
+arrays so following an edge is a couple of array lookups
+"""
+
+from array import array
+
+class DoubleArray(object):
+    """
+    Every label is given an integer code. The transition of node on the
+    label with code c is stored in slot base[node] + c, and is valid if
+    check[slot] == node, in which case child[slot] is the child node.
+    Bases are chosen so the slots of different nodes never collide.
+    Node ids are kept as given by the trie, so base and first are indexed
+    by node id and a node can be moved under another parent without
+    moving its own children. The slots of a node's children are chained
+    through first and sibling in insertion order, like the keys of a dict.
+    Free slots are chained in a doubly linked free list, through child
+    (next) and sibling (previous), so finding a base skips used slots.
+    Codes are given to the key of a label, the label itself unless key
+    maps it to something else, like its first character. The children
+    of a node must have labels with different keys, so setting a child
+    replaces the one whose label has the same key. A label other than
+    its key is kept in edge_labels, indexed by slot, which is only
+    created once there is such a label
+    """
+    FREE = -1
+    # Free slots _find_base tries before putting a base past the end
+    MAX_TRIES = 64
+
+    def __init__(self, key=None):
+        self.key = key
+        self.codes = {}
+        # The key of every code
+        self.labels = [None]
+        self.edge_labels = None
+        self.base = array("i")
+        self.first = array("i")
+        self.present = bytearray()
+        self.check = array("i")
+        self.child = array("i")
+        self.sibling = array("i")
+        self._free_head = self.FREE
+        # Free slot where the next _find_base starts, and a slot past
+        # every one used so far
+        self._cursor = self.FREE
+        self._top = 0
+
+    def __str__(self):
+        return str(self.to_dict())
+
+    def __iter__(self):
+        return self.nodes()
+
+    def __contains__(self, node):
+        return self.has_node(node)
+
+    def __len__(self):
+        return sum(self.present)
+
+    def to_dict(self):
+        """ Returns the trie as the dict of dicts BaseTrie uses """
+        return {node: {label: self.get_child(node, label)
+                       for label in self.get_labels(node)}
+                for node in self.nodes()}
+
+    def nodes(self):
+        for node in range(len(self.present)):
+            if self.present[node]:
+                yield node
+
+    def has_node(self, node):
+        return 0 <= node < len(self.present) and self.present[node] == 1
+
+    def add_node(self, node):
+        """ Adds a node without children, reusing it if it was removed """
+        if node >= len(self.present):
+            grow = node + 1 - len(self.present)
+            self.base.extend(array("i", [0]) * grow)
+            self.first.extend(array("i", [self.FREE]) * grow)
+            self.present.extend(bytes(grow))
+        self._clear_children(node)
+        self.present[node] = 1
+
+    def remove_node(self, node):
+        """ Removes a node and its transitions, its children are kept """
+        self._clear_children(node)
+        self.present[node] = 0
+
+    def get_child(self, node, label):
+        slot = self._slot(node, label)
+        if slot is None:
+            raise KeyError(label)
+        return self.child[slot]
+
+    def has_child(self, node, label):
+        return self._slot(node, label) is not None
+
+    def get_labels(self, node):
+        labels = []
+        slot = self.first[node]
+        while slot != self.FREE:
+            labels.append(self._label_at(slot, slot - self.base[node]))
+            slot = self.sibling[slot]
+        return labels
+
+    def number_children(self, node):
+        count = 0
+        slot = self.first[node]
+        while slot != self.FREE:
+            count += 1
+            slot = self.sibling[slot]
+        return count
+
+    def set_child(self, node, label, child):
+        """ Sets the child for a node's label, adding the transition if needed """
+        key = label if self.key is None else self.key(label)
+        slot = self._key_slot(node, key)
+        if slot is not None:
+            self.child[slot] = child
+            self._store_label(slot, slot - self.base[node], label)
+            return
+
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.labels)
+            self.codes[key] = code
+            self.labels.append(key)
+
+        if self.first[node] == self.FREE:
+            self.base[node] = self._find_base([code])
+        else:
+            slot = self.base[node] + code
+            if slot < 0 or (slot < len(self.check) and
+                            self.check[slot] != self.FREE):
+                self._relocate(node, code)
+
+        slot = self.base[node] + code
+        self._ensure_slots(slot + 1)
+        self._occupy(slot, node, child)
+        self._store_label(slot, code, label)
+        self.sibling[slot] = self.FREE
+        if self.first[node] == self.FREE:
+            self.first[node] = slot
+        else:
+            last = self.first[node]
+            while self.sibling[last] != self.FREE:
+                last = self.sibling[last]
+            self.sibling[last] = slot
+
+    def unlink(self, node, label):
+        """ Removes the transition of node on label """
+        slot = self._slot(node, label)
+        if slot is None:
+            raise KeyError(label)
+        if self.first[node] == slot:
+            self.first[node] = self.sibling[slot]
+        else:
+            prev = self.first[node]
+            while self.sibling[prev] != slot:
+                prev = self.sibling[prev]
+            self.sibling[prev] = self.sibling[slot]
+        self._release(slot)
+
+    def to_arrays(self, size):
+        """
+        Returns the labels and the arrays BaseTrie.save writes. The
+        labels are the key of every code, followed by those kept in
+        edge_labels, whose index edge_label gives by slot
+        """
+        labels = self.labels
+        arrays = {"base": self.base, "first": self.first,
+                  "present": array("B", self.present),
+                  "check": self.check, "child": self.child,
+                  "sibling": self.sibling,
+                  "free_head": array("i", [self._free_head])}
+        if self.edge_labels is not None:
+            labels = list(self.labels)
+            edge_label = array("i", [self.FREE]) * len(self.check)
+            for slot, label in enumerate(self.edge_labels):
+                if label is not None:
+                    edge_label[slot] = len(labels)
+                    labels.append(label)
+            arrays["keys"] = array("i", [len(self.labels)])
+            arrays["edge_label"] = edge_label
+        return labels, arrays
+
+    @classmethod
+    def from_arrays(cls, labels, arrays, key=None):
+        """
+        Rebuilds the double array from what to_arrays returned, key must
+        be the one it was built with
+        """
+        da = cls(key)
+        if "keys" in arrays:
+            da.edge_labels = [None if index == cls.FREE else labels[index]
+                              for index in arrays["edge_label"]]
+            labels = labels[:arrays["keys"][0]]
+        da.labels = labels
+        da.codes = {label: code for code, label in enumerate(labels)
+                    if code != 0}
+        da.base, da.first = arrays["base"], arrays["first"]
+        da.present = bytearray(arrays["present"])
+        da.check, da.child = arrays["check"], arrays["child"]
+        da.sibling = arrays["sibling"]
+        da._free_head = arrays["free_head"][0]
+        da._top = max((slot + 1 for slot, node in enumerate(da.check)
+                       if node != cls.FREE), default=0)
+        return da
+
+    def _slot(self, node, label):
+        if self.key is None:
+            return self._key_slot(node, label)
+        slot = self._key_slot(node, self.key(label))
+        if slot is None or \
+                self._label_at(slot, slot - self.base[node]) != label:
+            return None
+        return slot
+
+    def _key_slot(self, node, key):
+        """ Returns the slot of the child of node whose label has key """
+        code = self.codes.get(key)
+        if code is None or node >= len(self.first) \
+                or self.first[node] == self.FREE:
+            return None
+        slot = self.base[node] + code
+        if 0 <= slot < len(self.check) and self.check[slot] == node:
+            return slot
+        return None
+
+    def _label_at(self, slot, code):
+        """ Returns the label of the transition in slot, given its code """
+        if self.edge_labels is not None and \
+                self.edge_labels[slot] is not None:
+            return self.edge_labels[slot]
+        return self.labels[code]
+
+    def _store_label(self, slot, code, label):
+        """ Keeps the label of slot if it is not the key of its code """
+        if self.edge_labels is None:
+            if label == self.labels[code]:
+                return
+            self.edge_labels = [None] * len(self.check)
+        self.edge_labels[slot] = None if label == self.labels[code] else label
+
+    def _clear_children(self, node):
+        slot = self.first[node]
+        while slot != self.FREE:
+            next_slot = self.sibling[slot]
+            self._release(slot)
+            slot = next_slot
+        self.first[node] = self.FREE
+
+    def _occupy(self, slot, node, child):
+        """ Takes slot out of the free list and stores a transition in it """
+        next_free, prev_free = self.child[slot], self.sibling[slot]
+        if prev_free == self.FREE:
+            self._free_head = next_free
+        else:
+            self.child[prev_free] = next_free
+        if next_free != self.FREE:
+            self.sibling[next_free] = prev_free
+        self.check[slot] = node
+        self.child[slot] = child
+        self.sibling[slot] = self.FREE
+        if slot >= self._top:
+            self._top = slot + 1
+
+    def _release(self, slot):
+        """ Puts slot back at the head of the free list """
+        self.check[slot] = self.FREE
+        self.child[slot] = self._free_head
+        self.sibling[slot] = self.FREE
+        if self.edge_labels is not None:
+            self.edge_labels[slot] = None
+        if self._free_head != self.FREE:
+            self.sibling[self._free_head] = slot
+        self._free_head = slot
+
+    def _ensure_slots(self, size):
+        """ Grows the slot arrays, chaining the new slots as free """
+        if size > len(self.check):
+            start = len(self.check)
+            end = max(size, 2 * start)
+            self.check.extend(array("i", [self.FREE]) * (end - start))
+            if self.edge_labels is not None:
+                self.edge_labels.extend([None] * (end - start))
+            self.child.extend(array("i", range(start + 1, end + 1)))
+            self.sibling.extend(array("i", range(start - 1, end - 1)))
+            self.sibling[start] = self.FREE
+            self.child[end - 1] = self._free_head
+            if self._free_head != self.FREE:
+                self.sibling[self._free_head] = end - 1
+            self._free_head = start
+            self._cursor = start
+
+    def _find_base(self, codes):
+        """
+        Returns a base for which the slots of all codes are free, trying
+        free slots for the smallest code. The search starts where the
+        last one stopped instead of at the head of the free list, so the
+        dense slots it already went over are not tried again, and after
+        MAX_TRIES slots the base is put past every used slot. This keeps
+        every search O( MAX_TRIES * len(codes) ). Bases can be negative
+        as long as every slot they lead to is not
+        """
+        smallest = min(codes)
+        check = self.check
+        slot = self._cursor
+        if slot == self.FREE or slot >= len(check) or check[slot] != self.FREE:
+            slot = self._free_head
+        size, free = len(check), self.FREE
+        for _ in range(self.MAX_TRIES):
+            if slot == free:
+                break
+            base = slot - smallest
+            for c in codes:
+                if base + c < size and check[base + c] != free:
+                    break
+            else:
+                self._cursor = self.child[slot]
+                return base
+            slot = self.child[slot]
+        self._cursor = slot
+        return self._top - smallest
+
+    def _relocate(self, node, code):
+        """
+        Moves the children of node to a base where they and the new code
+        all fit, keeping their order
+        """
+        old_slots = []
+        slot = self.first[node]
+        while slot != self.FREE:
+            old_slots.append(slot)
+            slot = self.sibling[slot]
+        old_base = self.base[node]
+        codes = [s - old_base for s in old_slots]
+
+        new_base = self._find_base(codes + [code])
+        self._ensure_slots(new_base + max(codes + [code]) + 1)
+        children = [self.child[s] for s in old_slots]
+        labels = [self._label_at(s, c) for s, c in zip(old_slots, codes)]
+        for s in old_slots:
+            self._release(s)
+        prev = self.FREE
+        for c, child, label in zip(codes, children, labels):
+            slot = new_base + c
+            self._occupy(slot, node, child)
+            self._store_label(slot, c, label)
+            self.sibling[slot] = self.FREE
+            if prev == self.FREE:
+                self.first[node] = slot
+            else:
+                self.sibling[prev] = slot
+            prev = slot
+        self.base[node] = new_base
@@ -1,21 +1,42 @@
+"""
+Suffix trie of a text. Uses modules from suffixarray/, which must be on
+the import path, e.g. run from tries/ with PYTHONPATH=../suffixarray
+"""
+
 from BaseTrie import BaseTrie
 
+from ApproximateMatch import advance, first_state
+from SuffixTreeEfficient import SuffixTreeEfficient
+
 class SuffixTrie(BaseTrie):
 
-    def __init__(self, text):
+    def __init__(self, text, double_array=False, compressed=False):
+        """
+        With compressed the trie is built directly with merged edge
+        labels, as compress_edge_labels would leave it, from the suffix
+        array and LCP array of the text. This takes linear time in the
+        number of nodes instead of inserting every suffix one character
+        at a time. Its edge labels are then (start, end) offsets into
+        self.text, the label being self.text[start:end], so the trie takes
+        space linear in the length of the text. text can be a str or a
+        PackedDNA
+        """
         self.text = text
-        BaseTrie.__init__(self)
+        self.compressed = compressed
+        BaseTrie.__init__(self, double_array=double_array)
 
     def _build_trie(self):
         """ Builds a SuffixTree from the given text """
+        if self.compressed:
+            self._build_compressed_trie()
+            return
         self.text += self.terminal
-        while len(self.text) != 0:
-            self._add_branch(self.text)
-            self.text = self.text[1:]
+        for start in range(len(self.text)):
+            self._add_branch(self.text, start)
 
-    def _add_branch(self, text):
+    def _add_branch(self, text, start=0):
         curr_id = self.root
-        for i in range(0, len(text)):
+        for i in range(start, len(text)):
             letter = text[i]
             if self._contains_symbol(curr_id, letter):
                 curr_id = self._get_node_by_label(curr_id, letter)
@@ -27,6 +48,48 @@ class SuffixTrie(BaseTrie):
                 self._set_node_by_label(curr_id, letter, new_id)
                 curr_id = new_id
 
+    def _build_compressed_trie(self):
+        """
+        Adds the suffixes in sorted order, keeping the path to the last
+        leaf added as a stack of (node, string depth, label into node).
+        The lcp of each suffix with the previous one tells where on that
+        path the new leaf branches off, breaking an edge if it branches
+        off in the middle of one
+        """
+        alpha = self.terminal + ''.join(sorted(set(self.text) - {self.terminal}))
+        st = SuffixTreeEfficient(self.text, self.terminal, alpha=alpha)
+        text, order, lcp_arr = st.text, st.suffix_array, st.lcp_array
+        self.text = text
+
+        path = [(self.root, 0, None)]
+        lcp_prev = 0
+        for i in range(len(text)):
+            suffix = order[i]
+            last = None
+            while path[-1][1] > lcp_prev:
+                last = path.pop()
+            parent, depth, _ = path[-1]
+
+            if depth < lcp_prev:
+                # Break the edge into the last popped node
+                child, _, (start, end) = last
+                mid_node = self._new_id()
+                self._insert_new_node(mid_node)
+                middle = start + lcp_prev - depth
+                self._unlink(parent, (start, end))
+                self._link(parent, mid_node, (start, middle))
+                self._link(mid_node, child, (middle, end))
+                path.append((mid_node, lcp_prev, (start, middle)))
+                parent, depth = mid_node, lcp_prev
+
+            leaf = self._new_id()
+            self._insert_new_node(leaf)
+            label = (suffix + depth, len(text))
+            self._link(parent, leaf, label)
+            path.append((leaf, len(text) - suffix, label))
+            if i < len(text) - 1:
+                lcp_prev = lcp_arr[i]
+
     def compress_edge_labels(self):
         """
         Makes the compact copy of the trie by merging nodes with singular children
@@ -39,46 +102,59 @@ class SuffixTrie(BaseTrie):
         self.compressed_edges = []
         for node in self._get_nodes():
             for label in self._get_labels(node):
-                self.compressed_edges.append(label)
+                self.compressed_edges.append(self._label_text(label))
         return self.compressed_edges
 
     def _merge_non_branching(self):
         """
-        Helper function for getting edge labels. Performs the actual merging
+        Helper function for getting edge labels. Performs the actual merging.
+        Walks down from the root once, and for every edge follows the
+        chain of nodes with a single child below it, merging their labels
+        into the edge and removing them
         """
-        nodes = [0]
-        #print(self.tree)
+        nodes = [self.root]
         while len(nodes) != 0:
             curr = nodes.pop()
-            if curr == None:
-                continue
-            #print(curr, self._number_children(curr))
-            if self._number_children(curr) == 0:
-                continue
-
-            # If this node has only 1 child, find all its parents and
-            # update their children to be the children of this node,
-            # while keeping track of and merging edge labels
-            if self._number_children(curr) == 1:
-                child_label = self._get_labels(curr)[0]
-                child = self._get_node_by_label(curr, child_label)
-
-                # Find the current node's parents and update its children
-                for n in self.tree:
-                    for n_label in self._get_labels(n):
-                        if self._get_node_by_label(n, n_label) == curr:
-                            self._link(n, child, n_label + child_label)
-                            self._unlink(n, n_label)
-
-                # Add the child to nodes to explore, delete the current node
+            for label in self._get_labels(curr):
+                child = self._get_node_by_label(curr, label)
+                merged = label
+                while self._number_children(child) == 1:
+                    child_label = self._get_labels(child)[0]
+                    grandchild = self._get_node_by_label(child, child_label)
+                    merged += child_label
+                    self._remove_node(child)
+                    child = grandchild
+                if merged != label:
+                    self._unlink(curr, label)
+                    self._link(curr, child, merged)
                 nodes.append(child)
-                self._remove_node(curr)
 
-            # If curr has more than one child, it will still be in the tree. Add
-            # its children to nodes to explore
-            if self._contains_node(curr):
-                for l in self._get_labels(curr):
-                    nodes.append(self._get_node_by_label(curr, l))
+    def _label_text(self, label, length=None):
+        """
+        Returns the string of an edge label, or only its first length
+        characters, reading offsets from the text
+        """
+        if isinstance(label, tuple):
+            start, end = label
+            if length is not None:
+                end = min(end, start + length)
+            return self.text[start:end]
+        return label if length is None else label[:length]
+
+    def _label_key(self, label):
+        return self._label_text(label, 1)
+
+    def _label_length(self, label):
+        if isinstance(label, tuple):
+            return label[1] - label[0]
+        return len(label)
+
+    def _extra_state(self):
+        return {"text": str(self.text), "compressed": self.compressed}, {}
+
+    def _restore_extra_state(self, state, arrays):
+        self.text = state["text"]
+        self.compressed = state["compressed"]
 
     def match(self, patterns):
         """
@@ -92,28 +168,91 @@ class SuffixTrie(BaseTrie):
                 matches.append(p)
         return matches
 
+    def match_approximate(self, pattern, k, edits=False):
+        """
+        Returns (index, distance) for every index of the text where
+        pattern occurs with at most k mismatches, or with edits at most k
+        insertions, deletions and substitutions, sorted by index. An
+        index is reported once, with its smallest distance. Branches are
+        dropped as soon as their mismatches or band of edit distances
+        (see ApproximateMatch) are over k. Works whether edge labels have
+        been compressed or not
+        """
+        if k < 0:
+            raise ValueError("k must not be negative")
+        if len(pattern) == 0:
+            return []
+        best = {}
+        limit = len(pattern) + (k if edits else 0)
+        to_explore = [(self.root, 0, first_state(pattern, k, edits))]
+        while len(to_explore) != 0:
+            curr, depth, parent_state = to_explore.pop()
+            for label in self._get_labels(curr):
+                child = self._get_node_by_label(curr, label)
+                child_depth, state = depth, parent_state
+                for symbol in self._label_text(label, limit - depth):
+                    if symbol == self.terminal:
+                        break
+                    state, distance, pruned = advance(state, child_depth, symbol,
+                                                      pattern, k, edits)
+                    child_depth += 1
+                    if distance <= k:
+                        length = depth + self._label_length(label)
+                        for index in self._iter_leaf_indices(child, length):
+                            if distance < best.get(index, k + 1):
+                                best[index] = distance
+                    if pruned:
+                        break
+                else:
+                    if child_depth < limit:
+                        to_explore.append((child, child_depth, state))
+        return sorted(best.items())
+
+    def _iter_leaf_indices(self, node, depth):
+        """
+        Yields where the suffixes of the leaves below node start, node
+        being depth characters below the root
+        """
+        to_explore = [(node, depth)]
+        while len(to_explore) != 0:
+            curr, depth = to_explore.pop()
+            labels = self._get_labels(curr)
+            if len(labels) == 0:
+                yield len(self.text) - depth
+            for label in labels:
+                to_explore.append((self._get_node_by_label(curr, label),
+                                   depth + self._label_length(label)))
+
     def _match_pattern(self, p):
+        """
+        Checks if p is a prefix of a path from the root, which works
+        whether edge labels have been compressed or not
+        """
         text = p
         curr = self.root
 
         while len(text) > 0:
             symbol = text[0]
 
+            # Single character labels can be looked up directly, otherwise
+            # find the label starting with the next symbol
+            if self._contains_symbol(curr, symbol):
+                label = symbol
+            else:
+                for label in self._get_labels(curr):
+                    if self._label_text(label, 1) == symbol:
+                        break
+                else:
+                    return False
 
-            # Reached a leaf label, check if remained of text
-            # is a prefix of the leaf label
-            if  not self._contains_symbol(curr, symbol):
-                all_labels = self._get_labels(curr)
-                text_len = len(text)
-                for l in all_labels:
-                    if text == l[:text_len]:
-                        return True
+            # Reached the end of text inside the label
+            prefix = self._label_text(label, len(text))
+            if not text.startswith(prefix):
                 return False
-
-            # Matched symbol on a branch, update text and curr
-            if self._contains_symbol(curr, symbol):
-                curr = self._get_node_by_label(curr, symbol)
-                text = text[1:]
+            if len(text) == len(prefix):
+                return True
+            curr = self._get_node_by_label(curr, label)
+            text = text[len(prefix):]
 
         # Reached end of text while searching on a branch
         return True
@@ -1,71 +1,567 @@
+"""
+Trie of patterns with an Aho-Corasick automaton. Uses modules from
+suffixarray/, which must be on the import path, e.g. run from tries/
+with PYTHONPATH=../suffixarray
+"""
+
+import heapq
+from array import array
+from collections import deque
+from itertools import islice
+
 from BaseTrie import BaseTrie
 
+from ApproximateMatch import first_band, next_band
+
 class Trie(BaseTrie):
-    def __init__(self, patterns):
+    # Marks a node without a link in the automaton arrays
+    NONE = -1
+
+    def __init__(self, patterns, double_array=False, weights=None, top_k=10,
+                 cache=None):
+        """
+        weights, if given, holds the weight of every pattern, in the order
+        of patterns, and enables complete. Every node then keeps the top_k
+        heaviest patterns below it.
+        cache is an optional QueryCache keeping the results of match and
+        match_all, cleared whenever a pattern is inserted or removed
+        """
         self.patterns = patterns
-        BaseTrie.__init__(self)
+        self.cache = cache
+        # Length of the longest pattern, see _height
+        self._longest = None
+        BaseTrie.__init__(self, double_array=double_array)
+        self._build_automaton()
+        self.top_k = top_k
+        self.weights = None
+        self.completions = None
+        if weights is not None:
+            if len(weights) != len(patterns):
+                raise ValueError("Expected one weight per pattern")
+            self.weights = dict(zip(patterns, weights))
+            self._build_completions()
 
     def _build_trie(self):
         """ Builds a trie from a list of provided patterns """
         for p in self.patterns:
-            p += self.terminal
-            curr_id = self.root
-            for i in range(0, len(p)):
-                letter = p[i]
-                if letter in self._get_labels(curr_id):
-                    curr_id = self._get_node_by_label(curr_id, letter)
+            self._add_pattern(p)
+
+    def _add_pattern(self, p):
+        """
+        Adds the path for p and its terminal, returning the new edges as
+        (parent, label, child) from the root down, none if p was already
+        in the trie
+        """
+        p += self.terminal
+        curr_id = self.root
+        added = []
+        for i in range(0, len(p)):
+            letter = p[i]
+            if self._contains_symbol(curr_id, letter):
+                curr_id = self._get_node_by_label(curr_id, letter)
+            else:
+                new_id = self._new_id()
+                self._insert_new_node(new_id)
+                self._set_node_by_label(curr_id, letter, new_id)
+                added.append((curr_id, letter, new_id))
+                curr_id = new_id
+        return added
+
+    def insert(self, pattern, weight=None):
+        """
+        Adds pattern to the trie, returning False if it was already there.
+        self.patterns is left as given to the constructor. The automaton
+        is patched in place, see _patch_insert. If the trie has weights,
+        the weight of pattern is set to weight if given, otherwise a new
+        pattern weighs 0 and one already there keeps its weight
+        """
+        self._ensure_failure_tree()
+        added = self._add_pattern(pattern)
+        if len(added) != 0:
+            self._patch_insert(pattern, added)
+            self._invalidate()
+            if self._longest is not None:
+                self._longest = max(self._longest, len(pattern))
+        if self.weights is not None:
+            if weight is not None or pattern not in self.weights:
+                self.weights[pattern] = weight or 0
+            self._refresh_completions(pattern)
+        return len(added) != 0
+
+    def remove(self, pattern):
+        """
+        Removes pattern from the trie, returning False if it was not
+        there. Nodes left without children are removed from the end of
+        the path back up, and their ids reused by later inserts. The
+        automaton is patched in place, see _patch_remove
+        """
+        path = []
+        curr = self.root
+        for letter in pattern + self.terminal:
+            if not self._contains_symbol(curr, letter):
+                return False
+            path.append((curr, letter))
+            curr = self._get_node_by_label(curr, letter)
+
+        self._ensure_failure_tree()
+        end = path[-1][0]
+        if end != self.root:
+            self._set_pattern_end(end, self.NONE)
+        self._remove_trie_node(curr)
+        for parent, letter in reversed(path):
+            self._unlink(parent, letter)
+            if parent == self.root or self._number_children(parent) != 0:
+                break
+            self._patch_remove(parent)
+            self._remove_trie_node(parent)
+        self._invalidate()
+        if self._longest == len(pattern):
+            self._longest = None
+        if self.weights is not None:
+            del self.weights[pattern]
+            self._refresh_completions(pattern)
+        return True
+
+    def _remove_trie_node(self, node):
+        self._remove_node(node)
+        if self.completions is not None:
+            del self.completions[node]
+
+    def complete(self, prefix, k=None):
+        """
+        Returns the at most k heaviest patterns starting with prefix,
+        heaviest first and ties in alphabetical order. k defaults to and
+        can be at most top_k. Takes O( |prefix| + k ) as every node keeps
+        its top_k patterns
+        """
+        if self.completions is None:
+            raise ValueError("Trie was built without weights")
+        if k is None:
+            k = self.top_k
+        if k > self.top_k:
+            raise ValueError("k is larger than top_k: " + str(self.top_k))
+        curr = self.root
+        for letter in prefix:
+            if letter == self.terminal or not self._contains_symbol(curr, letter):
+                return []
+            curr = self._get_node_by_label(curr, letter)
+        return [pattern for _, pattern in self.completions[curr][:k]]
+
+    def _build_completions(self):
+        """
+        Fills self.completions, node -> up to top_k (-weight, pattern)
+        in sorted order, from the leaves up. The terminal node of a
+        pattern holds just that pattern
+        """
+        self.completions = {}
+        order = []
+        to_explore = [(self.root, "")]
+        while len(to_explore) != 0:
+            curr, path = to_explore.pop()
+            order.append(curr)
+            for label in self._get_labels(curr):
+                child = self._get_node_by_label(curr, label)
+                if label == self.terminal:
+                    self.completions[child] = [(-self.weights[path], path)]
+                else:
+                    to_explore.append((child, path + label))
+        for node in reversed(order):
+            self._merge_completions(node)
+
+    def _merge_completions(self, node):
+        """
+        Sets the completions of node from those of its children. Lists
+        are replaced and never changed in place, so a node with a single
+        child shares the child's list
+        """
+        children = [self.completions[self._get_node_by_label(node, label)]
+                    for label in self._get_labels(node)]
+        if len(children) == 1:
+            self.completions[node] = children[0]
+        else:
+            self.completions[node] = list(islice(heapq.merge(*children),
+                                                 self.top_k))
+
+    def _refresh_completions(self, pattern):
+        """
+        Updates the completions along the path of pattern after it was
+        inserted or removed, from the deepest node still in the trie up
+        """
+        path = [self.root]
+        for letter in pattern + self.terminal:
+            if not self._contains_symbol(path[-1], letter):
+                break
+            path.append(self._get_node_by_label(path[-1], letter))
+        else:
+            end = path.pop()
+            self.completions[end] = [(-self.weights[pattern], pattern)]
+        for node in reversed(path):
+            self._merge_completions(node)
+
+    def _invalidate(self):
+        """ Drops the cached results after the trie changed """
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _ensure_failure_tree(self):
+        """
+        Builds what patching the automaton needs on the first insert or
+        remove, so tries that are only matched do not pay for it
+        - self.depth[node] is the length of the node's string
+        - the failure links reversed, as a doubly linked list of the
+          nodes failing to each node: self.fail_first[node] is the first
+          of them, then self.fail_next and self.fail_prev link them
+        """
+        if self.depth is not None:
+            return
+        size = len(self.failure)
+        self.depth = array("i", [0]) * size
+        self.fail_first = array("i", [self.NONE]) * size
+        self.fail_next = array("i", [self.NONE]) * size
+        self.fail_prev = array("i", [self.NONE]) * size
+        to_explore = deque([self.root])
+        while len(to_explore) != 0:
+            curr = to_explore.popleft()
+            for label in self._get_labels(curr):
+                if label != self.terminal:
+                    child = self._get_node_by_label(curr, label)
+                    self.depth[child] = self.depth[curr] + 1
+                    self._attach_failure(child, self.failure[child])
+                    to_explore.append(child)
+
+    def _grow_automaton(self, size):
+        """ Extends every automaton array to hold size nodes """
+        for name in ("failure", "pattern_ends", "output", "depth",
+                     "fail_first", "fail_next", "fail_prev"):
+            values = getattr(self, name)
+            if len(values) < size:
+                values.extend([self.NONE] * (size - len(values)))
+
+    def _attach_failure(self, node, fail):
+        """ Sets the failure of node to fail, adding node to its list """
+        self.failure[node] = fail
+        first = self.fail_first[fail]
+        self.fail_next[node] = first
+        self.fail_prev[node] = self.NONE
+        if first != self.NONE:
+            self.fail_prev[first] = node
+        self.fail_first[fail] = node
+
+    def _detach_failure(self, node):
+        """ Takes node out of the list of nodes failing to its failure """
+        prev, following = self.fail_prev[node], self.fail_next[node]
+        if prev != self.NONE:
+            self.fail_next[prev] = following
+        else:
+            self.fail_first[self.failure[node]] = following
+        if following != self.NONE:
+            self.fail_prev[following] = prev
+
+    def _failing_to(self, node):
+        """ Returns the nodes whose failure is node """
+        nodes = []
+        curr = self.fail_first[node]
+        while curr != self.NONE:
+            nodes.append(curr)
+            curr = self.fail_next[curr]
+        return nodes
+
+    def _set_pattern_end(self, node, length):
+        """
+        Sets or, with NONE, clears the pattern ending at node and fixes
+        the output links of the nodes failing to it, directly or not. The
+        walk stops at pattern ends, whose output links stay as they are
+        """
+        self.pattern_ends[node] = length
+        output = node if length != self.NONE else self.output[node]
+        to_explore = self._failing_to(node)
+        while len(to_explore) != 0:
+            curr = to_explore.pop()
+            self.output[curr] = output
+            if self.pattern_ends[curr] == self.NONE:
+                to_explore.extend(self._failing_to(curr))
+
+    def _patch_insert(self, pattern, added):
+        """
+        Links the nodes added for pattern into the automaton instead of
+        rebuilding it. A new node v for string s + a fails as it would
+        in _build_automaton. The nodes that must now fail to v are the
+        children w + a of nodes w failing to the node for s, directly or
+        not. The walk below a node w stops once w + a exists, as the
+        nodes below already fail to w + a or deeper. This takes time in
+        the number of nodes whose failure changes and the nodes walked to
+        find them, instead of in the size of the trie
+        """
+        self._grow_automaton(self.id + 1)
+        for parent, label, node in added:
+            if label == self.terminal:
+                if parent != self.root:
+                    self._set_pattern_end(parent, len(pattern))
+                break
+            self.depth[node] = self.depth[parent] + 1
+            self.pattern_ends[node] = self.NONE
+            self.fail_first[node] = self.NONE
+            # Listed before node itself may fail to parent
+            to_explore = self._failing_to(parent)
+            fail = self.root
+            if parent != self.root:
+                fail = self.failure[parent]
+                while fail != self.root and not self._contains_symbol(fail, label):
+                    fail = self.failure[fail]
+                if self._contains_symbol(fail, label):
+                    fail = self._get_node_by_label(fail, label)
+            self._attach_failure(node, fail)
+            if self.pattern_ends[fail] != self.NONE:
+                self.output[node] = fail
+            else:
+                self.output[node] = self.output[fail]
+
+            # The output links of the nodes moved are unchanged, as node
+            # is not a pattern end yet and fails where they failed before
+            while len(to_explore) != 0:
+                curr = to_explore.pop()
+                if self._contains_symbol(curr, label):
+                    child = self._get_node_by_label(curr, label)
+                    self._detach_failure(child)
+                    self._attach_failure(child, node)
                 else:
-                    new_id = self._new_id()
-                    self._insert_new_node(new_id)
-                    self._set_node_by_label(curr_id, letter, new_id)
-                    curr_id = new_id
+                    to_explore.extend(self._failing_to(curr))
+
+    def _patch_remove(self, node):
+        """
+        Takes node, no longer a pattern end nor with children, out of the
+        automaton. The nodes failing to it now fail to its failure, the
+        next longest suffix of their string left in the trie
+        """
+        fail = self.failure[node]
+        for child in self._failing_to(node):
+            self._attach_failure(child, fail)
+        self._detach_failure(node)
+        self.failure[node] = self.NONE
+        self.output[node] = self.NONE
+        self.fail_first[node] = self.NONE
+
+    def _build_automaton(self):
+        """
+        Adds the Aho-Corasick links to the trie, visiting nodes breadth
+        first so a node's failure is always built before its children's.
+        The links are arrays indexed by node id, NONE where a node has
+        none, so they take a few bytes per node like a DoubleArray
+        - self.failure[node] is the node for the longest proper suffix of
+          the node's string that is also in the trie
+        - self.pattern_ends[node] is the length of the pattern ending at
+          node, for nodes with a terminal child
+        - self.output[node] is the closest node along the failure links
+          where a pattern ends
+        """
+        size = self.id + 1
+        self.depth = None
+        self.failure = array("i", [self.NONE]) * size
+        self.pattern_ends = array("i", [self.NONE]) * size
+        self.output = array("i", [self.NONE]) * size
+        self.failure[self.root] = self.root
+        depth = array("i", [0]) * size
+        order = [self.root]
+        to_explore = deque([self.root])
+        while len(to_explore) != 0:
+            curr = to_explore.popleft()
+            for label in self._get_labels(curr):
+                if label == self.terminal:
+                    if curr != self.root:
+                        self.pattern_ends[curr] = depth[curr]
+                    continue
+                child = self._get_node_by_label(curr, label)
+                depth[child] = depth[curr] + 1
+                to_explore.append(child)
+                order.append(child)
+
+                fail = self.failure[curr]
+                while fail != self.root and not self._contains_symbol(fail, label):
+                    fail = self.failure[fail]
+                if curr != self.root and self._contains_symbol(fail, label):
+                    fail = self._get_node_by_label(fail, label)
+                self.failure[child] = fail
+
+        # Output links need the pattern ends of all shallower nodes
+        for node in order:
+            fail = self.failure[node]
+            if self.pattern_ends[fail] != self.NONE:
+                self.output[node] = fail
+            else:
+                self.output[node] = self.output[fail]
+
+    def _extra_state(self):
+        """
+        Saves the automaton arrays, so a loaded Trie can match without
+        rebuilding them. The patterns themselves are not saved, a loaded
+        Trie has None
+        """
+        arrays = {name: getattr(self, name)
+                  for name in ("failure", "pattern_ends", "output")}
+        state = {"top_k": self.top_k, "weights": None}
+        if self.weights is not None:
+            state["weights"] = list(self.weights.items())
+        return state, arrays
+
+    @classmethod
+    def load(cls, path, cache=None):
+        """ Loads a trie written by save, with cache as in the constructor """
+        trie = super(Trie, cls).load(path)
+        trie.cache = cache
+        return trie
+
+    def _restore_extra_state(self, state, arrays):
+        self.patterns = None
+        self.cache = None
+        self._longest = None
+        for name in ("failure", "pattern_ends", "output"):
+            setattr(self, name, arrays[name])
+        self.depth = None
+        self.top_k = state["top_k"]
+        self.weights = None
+        self.completions = None
+        if state["weights"] is not None:
+            self.weights = dict(state["weights"])
+            self._build_completions()
 
     def match(self, text):
         """
         Will iterate through the text, trying to match it against any
         of the stores patterns. Returns a list containing the indices
         of the text where a match was found and a list of the patterns
-        which were successfully matched
-        """
-        p, points, patterns = 0, [], []
-        while len(text) != 0:
-            matched = self._match_pattern_prefix(text, patterns)
-            if matched:
-                points.append(p)
-            text = text[1:]
-            p += 1
-        return points, patterns
-
-    def _match_pattern_prefix(self, text, patterns):
-        pos = 0
-        curr = self.root
-        path = []
+        which were successfully matched. Only the shortest pattern
+        starting at each index is reported
+        """
+        if self.cache is None:
+            return self._match(text)
+        key = ("match", text)
+        points = self.cache.get(key)
+        if points is None:
+            points = tuple(map(tuple, self._match(text)))
+            self.cache.put(key, points)
+        return list(points[0]), list(points[1])
 
-        while True:
-            # Reached a leaf, indicating matched pattern
-            if self.terminal in self._get_labels(curr):
-                patterns.append( ''.join(path))
-                return True
+    def _match(self, text):
+        """ match without the cache """
+        if self._contains_symbol(self.root, self.terminal):
+            return list(range(len(text))), [""] * len(text)
 
-            # Check bounds before updating current symbol
-            if pos >= len(text):
-                return False
+        shortest = {}
+        for p, pattern in self._match_all(text):
+            if p not in shortest or len(pattern) < len(shortest[p]):
+                shortest[p] = pattern
+        points = sorted(shortest)
+        return points, [shortest[p] for p in points]
 
-            symbol = text[pos]
-            # Found a non-matching symbol
-            if not self._contains_symbol(curr, symbol):
-                return False
+    def match_approximate(self, text, k, edits=False):
+        """
+        Returns (index, pattern, distance) for every stored pattern
+        occurring at every index of the text with at most k mismatches,
+        or with edits at most k insertions, deletions and substitutions,
+        sorted by index and pattern. From every index the trie is walked
+        depth first, dropping a branch as soon as its mismatches or band
+        of edit distances (see ApproximateMatch) are over k
+        """
+        if k < 0:
+            raise ValueError("k must not be negative")
+        hits = []
+        height = self._height()
+        for i in range(len(text)):
+            window = text[i:i + height + k]
+            state = first_band(window, k) if edits else 0
+            to_explore = [(self.root, "", state)]
+            while len(to_explore) != 0:
+                curr, path, state = to_explore.pop()
+                for label in self._get_labels(curr):
+                    if label == self.terminal:
+                        distance = min(state) if edits else state
+                        if distance <= k:
+                            hits.append((i, path, distance))
+                        continue
+                    if edits:
+                        child_state = next_band(state, len(path), label, window, k)
+                        if min(child_state) > k:
+                            continue
+                    else:
+                        if len(path) >= len(window):
+                            continue
+                        child_state = state + (window[len(path)] != label)
+                        if child_state > k:
+                            continue
+                    child = self._get_node_by_label(curr, label)
+                    to_explore.append((child, path + label, child_state))
+        hits.sort()
+        return hits
 
+    def _height(self):
+        """
+        Returns the length of the longest pattern. It is found by walking
+        the trie once, then kept up to date by insert, and only found
+        again after a pattern that long is removed
+        """
+        if self._longest is not None:
+            return self._longest
+        height = 0
+        to_explore = [(self.root, 0)]
+        while len(to_explore) != 0:
+            curr, depth = to_explore.pop()
+            height = max(height, depth)
+            for label in self._get_labels(curr):
+                if label != self.terminal:
+                    to_explore.append((self._get_node_by_label(curr, label),
+                                       depth + 1))
+        self._longest = height
+        return height
+
+    def match_all(self, text):
+        """
+        Matches every stored pattern against the text in a single pass.
+        Returns a list of (index, pattern) for every occurrence of every
+        pattern, including overlapping ones, where index is where the
+        occurrence starts in the text. Occurrences are ordered by where
+        they end, longest first
+        """
+        if self.cache is None:
+            return self._match_all(text)
+        key = ("match_all", text)
+        hits = self.cache.get(key)
+        if hits is None:
+            hits = tuple(self._match_all(text))
+            self.cache.put(key, hits)
+        return list(hits)
+
+    def _match_all(self, text):
+        """ match_all without the cache """
+        hits = []
+        curr = self.root
+        for i in range(len(text)):
+            symbol = text[i]
+            if symbol == self.terminal:
+                curr = self.root
+                continue
+            while curr != self.root and not self._contains_symbol(curr, symbol):
+                curr = self.failure[curr]
             if self._contains_symbol(curr, symbol):
-                path.append(symbol)
                 curr = self._get_node_by_label(curr, symbol)
-                pos += 1
+
+            end = curr if self.pattern_ends[curr] != self.NONE \
+                else self.output[curr]
+            while end != self.NONE:
+                start = i + 1 - self.pattern_ends[end]
+                hits.append((start, text[start:i+1]))
+                end = self.output[end]
+        return hits
 
 def main():
     t = Trie(["AA"])
     print(t.tree)
     t.print_trie()
     print(t.match("AAA"))
+    print(t.match_all("AAA"))
+    t.insert("AAB")
+    t.remove("AA")
+    t.print_trie()
+    print(t.match_all("AAAB"))
 
 if __name__ == '__main__':
     main()
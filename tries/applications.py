@@ -1,19 +1,95 @@
+"""
+Applications of suffix tries and trees. Uses modules from suffixarray/,
+which must be on the import path, e.g. run from tries/ with
+PYTHONPATH=../suffixarray
+"""
+
 from Trie import Trie
 from SuffixTrie import SuffixTrie
+from SuffixTreeEfficient import SuffixTreeEfficient
 
 def shortest_unique_substring(s1, s2):
-    l_unique = unique_substrings_left(s1, s2)
-    r_unique = unique_substrings_left(s2, s1)
-
-    uniques = list(set(l_unique).union(set(r_unique)))
-    uniques.sort(key=lambda item: (len(item), item))
+    """
+    Finds the shortest substring of either string which does not occur
+    in the other one, the lexicographically smallest if there are several
+    """
+    text = s1 + '#' + s2
+    # The suffix array ranks of substrings of the same length are in
+    # the order of the substrings, so only the winner is sliced
+    candidates = _unique_substrings(s1, s2)
+    best = min(candidates, default=None)
 
     # Case that there are no unique substrings
-    if len(uniques) == 0:
-        print(uniques)
+    if best is None:
+        print([])
         return []
-    print(uniques[0])
-    return uniques[0]
+    length, _, start = best
+    shortest = text[start:start+length]
+    print(shortest)
+    return shortest
+
+def minimal_unique_substrings(l, r, sep='#', terminal='$'):
+    """
+    For every position of l, finds the shortest substring starting there
+    which does not occur in r, and the same for r against l. Returns two
+    lists of (start, length), one for each string, leaving out positions
+    from which every substring occurs in the other string.
+    Uses one suffix array of l + sep + r + terminal: the longest prefix a
+    suffix of l shares with any suffix of r is its lcp with the closest
+    suffix of r before or after it in the suffix array, which a scan in
+    each direction finds for all suffixes in linear time
+    """
+    r_start = len(l) + 1
+    l_unique, r_unique = [], []
+    for length, _, start in _unique_substrings(l, r, sep, terminal):
+        if start < len(l):
+            l_unique.append((start, length))
+        else:
+            r_unique.append((start - r_start, length))
+    l_unique.sort()
+    r_unique.sort()
+    return l_unique, r_unique
+
+def _unique_substrings(l, r, sep='#', terminal='$'):
+    """
+    Yields (length, rank, start) for the shortest unique substring at
+    every position of l + sep + r, see minimal_unique_substrings. rank
+    is that of the suffix at start in the suffix array
+    """
+    if sep in l or sep in r or terminal in l or terminal in r:
+        raise ValueError("Strings can not contain the separator or terminal")
+    text = l + sep + r
+    alpha = terminal + sep + ''.join(sorted(set(text) - {sep}))
+    st = SuffixTreeEfficient(text, terminal, alpha=alpha)
+    order, lcp_arr = st.suffix_array, st.lcp_array
+    r_start = len(l) + 1
+
+    # Longest common prefix of each suffix with a suffix from the
+    # other string, looking before and then after it in the suffix array
+    shared = [0] * len(order)
+    for indices in (range(len(order)), range(len(order)-1, -1, -1)):
+        lcp_l, lcp_r, prev = 0, 0, None
+        for i in indices:
+            if prev is not None:
+                lcp_between = lcp_arr[min(i, prev)]
+                lcp_l, lcp_r = min(lcp_l, lcp_between), min(lcp_r, lcp_between)
+            suffix = order[i]
+            if suffix < len(l):
+                shared[i] = max(shared[i], lcp_r)
+                lcp_l = len(order)
+            elif r_start <= suffix < len(text):
+                shared[i] = max(shared[i], lcp_l)
+                lcp_r = len(order)
+            prev = i
+
+    for i, suffix in enumerate(order):
+        length = shared[i] + 1
+        if suffix < len(l):
+            if suffix + length <= len(l):
+                yield length, i, suffix
+        elif r_start <= suffix < len(text):
+            if suffix + length <= len(text):
+                yield length, i, suffix
 
 def unique_substrings_left(l, r, sep='#'):
     """
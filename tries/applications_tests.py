@@ -0,0 +1,78 @@
+import contextlib
+import io
+import random
+
+from applications import minimal_unique_substrings, shortest_unique_substring
+
+def brute_force_minimal(a, b):
+    """ (start, length) of the shortest substring at each start not in b """
+    unique = []
+    for start in range(len(a)):
+        for end in range(start + 1, len(a) + 1):
+            if a[start:end] not in b:
+                unique.append((start, end - start))
+                break
+    return unique
+
+def brute_force_shortest(a, b):
+    candidates = [(length, a[start:start+length])
+                  for start, length in brute_force_minimal(a, b)] + \
+        [(length, b[start:start+length])
+         for start, length in brute_force_minimal(b, a)]
+    return min(candidates)[1] if candidates else []
+
+def shortest(a, b):
+    # shortest_unique_substring prints its result as well
+    with contextlib.redirect_stdout(io.StringIO()):
+        return shortest_unique_substring(a, b)
+
+def test_minimal_unique_substrings():
+    print("Testing minimal unique substrings against brute force... ", end='')
+
+    assert minimal_unique_substrings("GODGOD", "CAT") == \
+        ([(i, 1) for i in range(6)], [(i, 1) for i in range(3)])
+    assert minimal_unique_substrings("ABAB", "AB") == \
+        ([(0, 3), (1, 2)], [])
+
+    rng = random.Random(0)
+    for _ in range(300):
+        alpha = rng.choice(("AB", "ACGT", "GODCAT"))
+        a = "".join(rng.choices(alpha, k=rng.randint(0, 12)))
+        b = "".join(rng.choices(alpha, k=rng.randint(0, 12)))
+        assert minimal_unique_substrings(a, b) == \
+            (brute_force_minimal(a, b), brute_force_minimal(b, a))
+
+    try:
+        minimal_unique_substrings("A#B", "C")
+        assert False
+    except ValueError:
+        pass
+
+    print("Done")
+
+def test_shortest_unique_substring():
+    print("Testing the shortest unique substring against brute force... ",
+          end='')
+
+    # Every character is unique, the smallest one of either string wins
+    assert shortest("GODGOD", "CAT") == "A"
+    assert shortest("GATTACA", "GATTACA") == []
+    assert shortest("", "A") == "A"
+    assert shortest("ATGCGATGACCTGACTGA", "CTCAACGTATTGGCCAGA") == \
+        brute_force_shortest("ATGCGATGACCTGACTGA", "CTCAACGTATTGGCCAGA")
+
+    rng = random.Random(1)
+    for _ in range(300):
+        alpha = rng.choice(("AB", "ACGT", "GODCAT"))
+        a = "".join(rng.choices(alpha, k=rng.randint(0, 12)))
+        b = "".join(rng.choices(alpha, k=rng.randint(0, 12)))
+        assert shortest(a, b) == brute_force_shortest(a, b)
+
+    print("Done")
+
+def main():
+    test_minimal_unique_substrings()
+    test_shortest_unique_substring()
+
+if __name__ == "__main__":
+    main()
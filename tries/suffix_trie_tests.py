@@ -0,0 +1,155 @@
+import os
+import random
+import tempfile
+
+from ApproximateMatch import approximate_distance
+from PackedDNA import PackedDNA
+from SuffixTrie import SuffixTrie
+
+def substrings(text):
+    return {text[i:j] for i in range(len(text))
+            for j in range(i + 1, len(text) + 1)}
+
+def brute_force_approximate(text, pattern, k, edits):
+    hits = []
+    for i in range(len(text)):
+        distance = approximate_distance(pattern, text[i:], k, edits)
+        if distance is not None:
+            hits.append((i, distance))
+    return hits
+
+def test_match():
+    print("Testing match against brute force... ", end='')
+
+    t = SuffixTrie("GATTACA")
+    assert t.match(["TTA", "ACA", "GAT", "TAG", "CAT"]) == ["TTA", "ACA", "GAT"]
+
+    rng = random.Random(0)
+    for _ in range(30):
+        text = "".join(rng.choices("ACGT", k=rng.randint(1, 25)))
+        queries = list(substrings(text)) + \
+            ["".join(rng.choices("ACGT", k=3)) for _ in range(10)]
+        expected = [q for q in queries if q in text]
+        for double_array in (False, True):
+            for compressed in (False, True):
+                for source in (text, PackedDNA(text)):
+                    t = SuffixTrie(source, double_array=double_array,
+                                   compressed=compressed)
+                    assert t.match(queries) == expected
+            t.compress_edge_labels()
+            assert t.match(queries) == expected
+
+    print("Done")
+
+def test_compressed():
+    print("Testing a compressed build against merged labels... ", end='')
+
+    rng = random.Random(1)
+    for _ in range(30):
+        text = "".join(rng.choices(rng.choice(("AB", "ACGT")),
+                                   k=rng.randint(1, 30)))
+        for double_array in (False, True):
+            merged = SuffixTrie(text, double_array=double_array)
+            compressed = SuffixTrie(text, double_array=double_array,
+                                    compressed=True)
+            assert sorted(compressed.compress_edge_labels()) == \
+                sorted(merged.compress_edge_labels())
+
+    # Offset labels are coded by their first character, so the slots of
+    # the double array grow with the nodes, not with the distinct labels
+    text = "".join(rng.choices("ACGT", k=3000))
+    t = SuffixTrie(text, double_array=True, compressed=True)
+    assert len(t.tree.labels) == 6
+    assert len(t.tree.check) <= 4 * t.id
+
+    print("Done")
+
+def branch_labels(trie, label):
+    return sorted(trie.make_branch_label_from_path(path.split(","), label)
+                  for path in trie.all_paths_to_label(label))
+
+def test_label_helpers():
+    print("Testing the label helpers on compressed tries... ", end='')
+
+    t = SuffixTrie("GATTACA", compressed=True)
+    assert sorted(t.get_leaf_labels()) == ["$", "$", "ACA$", "CA$", "CA$",
+                                           "GATTACA$", "TACA$", "TTACA$"]
+    assert sorted(t.get_inner_labels()) == ["A", "T"]
+    assert len(t.get_all_nodes_with_label("$")) == 2
+    assert branch_labels(t, "$") == ["$", "A$"]
+
+    rng = random.Random(3)
+    for _ in range(30):
+        text = "".join(rng.choices(rng.choice(("AB", "ACGT")),
+                                   k=rng.randint(1, 20)))
+        for double_array in (False, True):
+            merged = SuffixTrie(text, double_array=double_array)
+            merged.compress_edge_labels()
+            compressed = SuffixTrie(text, double_array=double_array,
+                                    compressed=True)
+            for method in ("get_leaf_labels", "get_inner_labels"):
+                assert sorted(getattr(compressed, method)()) == \
+                    sorted(getattr(merged, method)())
+            for label in set(merged.get_leaf_labels() +
+                             merged.get_inner_labels()):
+                assert len(compressed.get_all_nodes_with_label(label)) == \
+                    len(merged.get_all_nodes_with_label(label))
+                assert branch_labels(compressed, label) == \
+                    branch_labels(merged, label)
+            leaves = compressed.get_leaf_labels_from_node(compressed.root)
+            assert sorted(leaves) == sorted(compressed.get_leaf_labels())
+
+    print("Done")
+
+def test_match_approximate():
+    print("Testing approximate matches against brute force... ", end='')
+
+    t = SuffixTrie("GATTACA")
+    assert t.match_approximate("TAC", 0) == [(3, 0)]
+    assert t.match_approximate("TTC", 1) == [(2, 1), (3, 1)]
+
+    rng = random.Random(2)
+    for _ in range(20):
+        text = "".join(rng.choices("ACGT", k=rng.randint(1, 25)))
+        tries = [SuffixTrie(text), SuffixTrie(text, compressed=True),
+                 SuffixTrie(text, double_array=True, compressed=True)]
+        for _ in range(5):
+            pattern = "".join(rng.choices("ACGT", k=rng.randint(1, 5)))
+            for k in range(3):
+                for edits in (False, True):
+                    expected = brute_force_approximate(text, pattern, k, edits)
+                    for t in tries:
+                        assert t.match_approximate(pattern, k, edits) == expected
+
+    print("Done")
+
+def test_save_load():
+    print("Testing saving and loading suffix tries... ", end='')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trie.bin")
+        for double_array in (False, True):
+            for compressed in (False, True):
+                text = "GATTACAGATTACA"
+                t = SuffixTrie(text, double_array=double_array,
+                               compressed=compressed)
+                t.save(path)
+                loaded = SuffixTrie.load(path)
+                queries = list(substrings(text)) + ["TTT", "GAC"]
+                assert loaded.match(queries) == t.match(queries)
+                assert loaded.match_approximate("TAGA", 1, True) == \
+                    t.match_approximate("TAGA", 1, True)
+                assert sorted(loaded.compress_edge_labels()) == \
+                    sorted(t.compress_edge_labels())
+
+    print("Done")
+
+def main():
+    test_match()
+    test_compressed()
+    test_label_helpers()
+    test_match_approximate()
+    test_save_load()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import io
+import os
+import random
+import tempfile
+
+from QueryCache import QueryCache
+from Trie import Trie
+
+def random_patterns(rng, alpha, count, longest=5):
+    return list({"".join(rng.choices(alpha, k=rng.randint(1, longest)))
+                 for _ in range(count)})
+
+def edges(trie):
+    out = io.StringIO()
+    trie.export(out, "jsonl")
+    return out.getvalue()
+
+def brute_force_all(text, patterns):
+    return sorted((i, p) for p in set(patterns)
+                  for i in range(len(text)) if text.startswith(p, i))
+
+def brute_force_shortest(text, patterns):
+    shortest = {}
+    for i, p in brute_force_all(text, patterns):
+        if i not in shortest or len(p) < len(shortest[i]):
+            shortest[i] = p
+    points = sorted(shortest)
+    return points, [shortest[i] for i in points]
+
+def edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a):
+        prev, row[0] = row[0], i + 1
+        for j, y in enumerate(b):
+            prev, row[j+1] = row[j+1], min(row[j+1] + 1, row[j] + 1,
+                                           prev + (x != y))
+    return row[-1]
+
+def brute_force_approximate(text, patterns, k, edits):
+    hits = []
+    for i in range(len(text)):
+        for p in set(patterns):
+            if edits:
+                # Best alignment of p with any string starting at i
+                distance = min(edit_distance(p, text[i:end])
+                               for end in range(i, len(text) + 1))
+            elif i + len(p) <= len(text):
+                distance = sum(a != b for a, b in zip(p, text[i:]))
+            else:
+                continue
+            if distance <= k:
+                hits.append((i, p, distance))
+    return sorted(hits)
+
+def test_match():
+    print("Testing match and match_all against brute force... ", end='')
+
+    t = Trie(["A", "AG", "GT", "TAG"])
+    assert t.match_all("GTAG") == [(0, "GT"), (2, "A"), (1, "TAG"), (2, "AG")]
+    assert t.match("GTAG") == ([0, 1, 2], ["GT", "TAG", "A"])
+    assert t.match("CCC") == ([], [])
+
+    rng = random.Random(0)
+    for double_array in (False, True):
+        for _ in range(50):
+            alpha = rng.choice(("AB", "ACGT"))
+            patterns = random_patterns(rng, alpha, rng.randint(1, 10))
+            text = "".join(rng.choices(alpha, k=rng.randint(0, 40)))
+            t = Trie(patterns, double_array=double_array)
+            assert sorted(t.match_all(text)) == brute_force_all(text, patterns)
+            assert t.match(text) == brute_force_shortest(text, patterns)
+
+    print("Done")
+
+def test_double_array():
+    print("Testing the double array against dicts... ", end='')
+
+    rng = random.Random(1)
+    for _ in range(30):
+        patterns = random_patterns(rng, "abcdefgh", 30, longest=8)
+        dicts = Trie(patterns)
+        double_array = Trie(patterns, double_array=True)
+        assert double_array.tree.to_dict() == dicts.tree
+        for _ in range(20):
+            p = "".join(rng.choices("abcdefgh", k=rng.randint(1, 8)))
+            method = rng.choice(("insert", "remove"))
+            assert getattr(dicts, method)(p) == getattr(double_array, method)(p)
+        assert double_array.tree.to_dict() == dicts.tree
+        text = "".join(rng.choices("abcdefgh", k=100))
+        assert double_array.match_all(text) == dicts.match_all(text)
+
+    print("Done")
+
+def test_save_load():
+    print("Testing saving and loading tries... ", end='')
+
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trie.bin")
+        for double_array in (False, True):
+            patterns = random_patterns(rng, "ACGT", 40)
+            weights = [rng.randint(0, 100) for _ in patterns]
+            t = Trie(patterns, double_array=double_array, weights=weights)
+            t.remove(patterns[0])
+            t.save(path)
+
+            cache = QueryCache()
+            loaded = Trie.load(path, cache=cache)
+            assert loaded.cache is cache and loaded.patterns is None
+            text = "".join(rng.choices("ACGT", k=200))
+            assert loaded.match_all(text) == t.match_all(text)
+            assert loaded.match(text) == t.match(text)
+            for prefix in ("", "A", "CG", "TTT"):
+                assert loaded.complete(prefix) == t.complete(prefix)
+
+            # Freed ids are reused after loading as before saving
+            assert loaded.insert("GATTACA") and t.insert("GATTACA")
+            assert edges(loaded) == edges(t)
+            assert loaded.match_all(text) == t.match_all(text)
+
+        try:
+            with open(path, "wb") as f:
+                f.write(b"not a saved trie")
+            Trie.load(path)
+            assert False
+        except ValueError:
+            pass
+
+    print("Done")
+
+def test_insert_remove():
+    print("Testing inserting and removing patterns... ", end='')
+
+    t = Trie(["AB", "ABC"])
+    assert not t.insert("AB")
+    assert t.insert("B")
+    assert not t.remove("A")
+    assert t.remove("ABC")
+    assert t.match_all("ABC") == [(0, "AB"), (1, "B")]
+
+    # Ids of removed nodes are reused
+    size = t.id
+    assert t.remove("B") and t.insert("BCA")
+    assert t.id == size
+
+    rng = random.Random(3)
+    for double_array in (False, True):
+        for _ in range(40):
+            alpha = rng.choice(("AB", "ABC"))
+            patterns = set(random_patterns(rng, alpha, rng.randint(0, 8)))
+            t = Trie(list(patterns), double_array=double_array)
+            for _ in range(30):
+                p = "".join(rng.choices(alpha, k=rng.randint(1, 5)))
+                if rng.random() < 0.5:
+                    assert t.insert(p) == (p not in patterns)
+                    patterns.add(p)
+                else:
+                    assert t.remove(p) == (p in patterns)
+                    patterns.discard(p)
+                text = "".join(rng.choices(alpha, k=30))
+                assert sorted(t.match_all(text)) == brute_force_all(text, patterns)
+
+    print("Done")
+
+def test_complete():
+    print("Testing top k completions against brute force... ", end='')
+
+    t = Trie(["car", "cat", "cart", "dog"], weights=[5, 9, 5, 1], top_k=2)
+    assert t.complete("ca") == ["cat", "car"]
+    assert t.complete("car", 1) == ["car"]
+    assert t.complete("x") == []
+    t.insert("car")
+    assert t.complete("car") == ["car", "cart"]
+    t.insert("cart", 7)
+    assert t.complete("ca") == ["cat", "cart"]
+    try:
+        t.complete("c", 3)
+        assert False
+    except ValueError:
+        pass
+
+    rng = random.Random(4)
+    for double_array in (False, True):
+        patterns = random_patterns(rng, "abc", 60)
+        weights = dict((p, rng.randint(0, 5)) for p in patterns)
+        t = Trie(patterns, double_array=double_array,
+                 weights=[weights[p] for p in patterns], top_k=4)
+        for _ in range(40):
+            p = "".join(rng.choices("abc", k=rng.randint(1, 5)))
+            if rng.random() < 0.5:
+                weights[p] = rng.randint(0, 5)
+                t.insert(p, weights[p])
+            elif p in weights:
+                del weights[p]
+                t.remove(p)
+            prefix = "".join(rng.choices("abc", k=rng.randint(0, 2)))
+            expected = sorted((-w, p) for p, w in weights.items()
+                              if p.startswith(prefix))
+            assert t.complete(prefix) == [p for _, p in expected[:4]]
+
+    print("Done")
+
+def test_match_approximate():
+    print("Testing approximate matches against brute force... ", end='')
+
+    t = Trie(["GAT", "TACA"])
+    assert t.match_approximate("GATTACA", 0) == [(0, "GAT", 0), (3, "TACA", 0)]
+    assert t.match_approximate("GCT", 1) == [(0, "GAT", 1)]
+    assert t.match_approximate("GTACA", 1, edits=True) == \
+        [(0, "GAT", 1), (0, "TACA", 1), (1, "TACA", 0), (2, "TACA", 1)]
+    try:
+        t.match_approximate("GAT", -1)
+        assert False
+    except ValueError:
+        pass
+
+    rng = random.Random(5)
+    for double_array in (False, True):
+        for _ in range(15):
+            patterns = set(random_patterns(rng, "ACG", rng.randint(1, 6)))
+            t = Trie(list(patterns), double_array=double_array)
+            for _ in range(4):
+                text = "".join(rng.choices("ACG", k=rng.randint(0, 12)))
+                for k in range(3):
+                    for edits in (False, True):
+                        assert t.match_approximate(text, k, edits) == \
+                            brute_force_approximate(text, patterns, k, edits)
+                # The longest pattern changes with inserts and removes
+                p = "".join(rng.choices("ACG", k=rng.randint(1, 7)))
+                if p in patterns:
+                    t.remove(p)
+                    patterns.discard(p)
+                else:
+                    t.insert(p)
+                    patterns.add(p)
+
+    print("Done")
+
+def main():
+    test_match()
+    test_double_array()
+    test_save_load()
+    test_insert_remove()
+    test_complete()
+    test_match_approximate()
+
+if __name__ == "__main__":
+    main()